@@ -1,3 +1,19 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from products.testing import QueryBudgetMixin, View
+from . import urls
+
+
+@override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = urls
+    views = {
+        'login': View(4, login=None),
+        'register': View(4, login=None),
+        'logout': View(4),
+        'profile': View(10),
+        'wishlist': View(9, scales=True),
+        'add_to_wishlist': View(8, 'post', args=lambda shop: [shop.products[4].pk]),
+        'remove_from_wishlist': View(6, 'post', args=lambda shop: [shop.product.pk]),
+        'toggle_wishlist': View(6, 'post', args=lambda shop: [shop.product.pk]),
+    }
@@ -2,6 +2,10 @@
 ASGI config for golden_fragrance project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Checkout and payment confirmation are async views, so under an ASGI server
+a worker keeps serving other requests while Stripe answers, e.g.
+
+    gunicorn golden_fragrance.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
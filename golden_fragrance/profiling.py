@@ -0,0 +1,284 @@
+# golden_fragrance/profiling.py
+"""
+Request profiling.
+
+With REQUEST_PROFILING on, `ProfilingMiddleware` times every request and
+reports it in a Server-Timing header (browser dev tools show it under
+Timing) to staff users and INTERNAL_IPS, or to everyone with
+REQUEST_PROFILING_HEADER on:
+
+    Server-Timing: db;desc="7 queries";dur=3.1, tpl;dur=12.4, view;dur=18.0, total;dur=21.7
+
+SQL is timed by a wrapper around the cursor's execute (every connection,
+every thread) and templates by one around Template.render; both look up
+the current request through a context variable, so queries and renders run
+through sync_to_async count too. `view` runs from the view middleware to the response, `tpl` counts
+only outermost renders, not includes.
+
+Requests are also profiled to REQUEST_PROFILE_DIR: a REQUEST_PROFILE_RATE
+fraction under cProfile (`.prof`, open with pstats or snakeviz), and any
+request slower than REQUEST_PROFILE_SLOW_MS as stack samples taken every
+SAMPLE_INTERVAL seconds by one background thread (`.stacks`, one
+"frame;frame;frame count" line per stack, the input of flamegraph.pl and
+speedscope). The file name is added to the header, and beyond
+REQUEST_PROFILE_MAX_FILES files the oldest are deleted. Profiles are only taken
+for requests handled synchronously: under ASGI the event loop thread is
+shared by concurrent requests, so a profile of it would mix them.
+
+With REQUEST_PROFILING off the middleware removes itself at startup and
+nothing is wrapped.
+"""
+import cProfile
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.utils import CursorWrapper
+from django.template.base import Template
+
+SAMPLE_INTERVAL = 0.005
+
+_current = ContextVar('request_timings', default=None)
+_install_lock = threading.Lock()
+_installed = False
+_sampler = None
+
+
+class Timings:
+    """What one request spent, in seconds."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.view = None
+        self.view_started = None
+        self._depth = 0
+
+    def header(self, total, profile=None):
+        metrics = [
+            f'db;desc="{self.queries} queries";dur={self.sql * 1000:.1f}',
+            f'tpl;dur={self.template * 1000:.1f}',
+        ]
+        if self.view is not None:
+            metrics.append(f'view;dur={self.view * 1000:.1f}')
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        if profile:
+            metrics.append(f'profile;desc="{profile}"')
+        return ', '.join(metrics)
+
+
+_execute = CursorWrapper._execute_with_wrappers
+
+
+def _timed_execute(cursor, sql, params, many, executor):
+    timings = _current.get()
+    if timings is None:
+        return _execute(cursor, sql, params, many, executor)
+    start = time.perf_counter()
+    try:
+        return _execute(cursor, sql, params, many, executor)
+    finally:
+        timings.queries += 1
+        timings.sql += time.perf_counter() - start
+
+
+_render = Template.render
+
+
+def _timed_render(template, context):
+    timings = _current.get()
+    if timings is None:
+        return _render(template, context)
+    # Includes render inside their parent, count the outermost only
+    timings._depth += 1
+    start = time.perf_counter()
+    try:
+        return _render(template, context)
+    finally:
+        timings._depth -= 1
+        if not timings._depth:
+            timings.template += time.perf_counter() - start
+
+
+def install():
+    """Wrap query execution and template rendering, once per process."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        CursorWrapper._execute_with_wrappers = _timed_execute
+        Template.render = _timed_render
+        _installed = True
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of the threads being watched; idle while there are none."""
+
+    def __init__(self, interval=None):
+        super().__init__(name='request-stack-sampler', daemon=True)
+        self.interval = interval
+        self._watched = {}  # thread id -> Counter of collapsed stacks
+        self._changed = threading.Condition()
+
+    def watch(self, ident):
+        stacks = Counter()
+        with self._changed:
+            self._watched[ident] = stacks
+            self._changed.notify()
+        return stacks
+
+    def unwatch(self, ident):
+        with self._changed:
+            self._watched.pop(ident, None)
+
+    def run(self):
+        while True:
+            with self._changed:
+                while not self._watched:
+                    self._changed.wait()
+                watched = list(self._watched.items())
+            frames = sys._current_frames()
+            for ident, stacks in watched:
+                frame = frames.get(ident)
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                if names:
+                    stacks[';'.join(reversed(names))] += 1
+            del frames
+            time.sleep(self.interval or SAMPLE_INTERVAL)
+
+
+def sampler():
+    global _sampler
+    with _install_lock:
+        if _sampler is None:
+            _sampler = StackSampler()
+            _sampler.start()
+        return _sampler
+
+
+def prune(directory, keep):
+    """Delete all but the newest `keep` profiles; names start with their time."""
+    profiles = sorted(path for path in directory.iterdir() if path.suffix in ('.prof', '.stacks'))
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def profile_path(request, total, suffix):
+    directory = Path(settings.REQUEST_PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    prune(directory, getattr(settings, 'REQUEST_PROFILE_MAX_FILES', 500) - 1)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_')[:60] or 'root'
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{total * 1000:.0f}ms-{request.method}-{slug}-{uuid.uuid4().hex[:6]}{suffix}"
+    return directory / name
+
+
+def write_stacks(path, stacks):
+    path.write_text(''.join(f'{stack} {count}\n' for stack, count in stacks.most_common()))
+
+
+def _header_allowed(request):
+    if getattr(settings, 'REQUEST_PROFILING_HEADER', False):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+class ProfilingMiddleware:
+    """Server-Timing on every response and sampled profiles on disk; list it first in MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = Timings()
+        token = _current.set(timings)
+        profiler = stacks = None
+        rate = getattr(settings, 'REQUEST_PROFILE_RATE', 0)
+        slow_ms = getattr(settings, 'REQUEST_PROFILE_SLOW_MS', None)
+        ident = threading.get_ident()
+        if rate and random.random() < rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active (Python 3.12+ allows one per process)
+                profiler = None
+        if profiler is None and slow_ms is not None:
+            stacks = sampler().watch(ident)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if stacks is not None:
+                sampler().unwatch(ident)
+            _current.reset(token)
+        end = time.perf_counter()
+        total = end - start
+        path = None
+        if profiler is not None:
+            path = profile_path(request, total, '.prof')
+            profiler.dump_stats(path)
+        elif stacks is not None and total * 1000 >= slow_ms:
+            path = profile_path(request, total, '.stacks')
+            write_stacks(path, stacks)
+        if not _header_allowed(request):
+            user = getattr(request, 'user', None)
+            if not (user and user.is_staff):
+                return response
+        return self._finish(response, timings, start, end, path)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        end = time.perf_counter()
+        if not _header_allowed(request):
+            user = await request.auser() if hasattr(request, 'auser') else None
+            if not (user and user.is_staff):
+                return response
+        return self._finish(response, timings, start, end)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def _finish(self, response, timings, start, end, path=None):
+        if timings.view_started is not None:
+            timings.view = end - timings.view_started
+        response.headers['Server-Timing'] = timings.header(end - start, path.name if path else None)
+        return response
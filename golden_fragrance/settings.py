@@ -24,6 +24,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'golden_fragrance.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +79,72 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL')
+# Mail is queued in the outbox and sent by the deliver_emails worker over
+# one connection per batch (see orders/outbox.py)
+EMAIL_TIMEOUT = 30
 
 # For development/testing, you can use console backend
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Seconds a worker trusts its in-memory catalog caches (facet index,
+# navigation) before re-checking their shared version stamps
+# (see products/versions.py)
+CACHE_VERSION_CHECK_INTERVAL = 1.0
+
+# Seconds an anonymous catalog page stays in the full-page cache
+# (see products/page_cache.py)
+PAGE_CACHE_TIMEOUT = 600
+
+# Background threads that resize uploaded images; 0 builds them inline
+# during the save (see products/images.py)
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Hand static/media bodies to the front proxy instead of streaming them from
+# Python: None, 'x-accel-redirect' (nginx, internal location at
+# FILE_SERVING_ACCEL_PREFIX + the request path) or 'x-sendfile' (Apache,
+# lighttpd). See products/serving.py
+FILE_SERVING_OFFLOAD = None
+FILE_SERVING_ACCEL_PREFIX = '/internal'
+
+# Where carts live: a table for logged-in users (atomic per-line writes),
+# the session for guests. See orders/cart.py
+CART_USER_STORE = 'orders.cart.DatabaseCartStore'
+CART_GUEST_STORE = 'orders.cart.SessionCartStore'
+
+# Minutes a checkout holds its stock while the customer pays; unpaid
+# reservations are released after that. Stripe sessions expire at the same
+# moment, so keep it at 30 or more (see orders/inventory.py)
+STOCK_RESERVATION_MINUTES = 35
+
+# Order numbers each process takes from the daily counter at once
+# (see orders/numbers.py); unused ones are skipped when it restarts
+ORDER_NUMBER_BLOCK_SIZE = 50
+
+# Stripe API access for the async checkout views (see orders/payments.py).
+# STRIPE_API_BASE points the client elsewhere, e.g. at orders.fake_stripe
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')
+STRIPE_TIMEOUT = 10  # seconds per request
+STRIPE_MAX_RETRIES = 1
+# Signing secret of the webhook endpoint; events are queued and fulfilled by
+# the process_webhooks command (see orders/webhooks.py)
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+
+# Per-request timings in a Server-Timing header (SQL queries and time,
+# templates, view) and sampled profiles written to REQUEST_PROFILE_DIR:
+# cProfile for a REQUEST_PROFILE_RATE fraction of requests, stack samples
+# for any request slower than REQUEST_PROFILE_SLOW_MS (None: never).
+# Off, the middleware drops out at startup (see golden_fragrance/profiling.py)
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == '1'
+REQUEST_PROFILE_RATE = float(os.environ.get('REQUEST_PROFILE_RATE', 0))
+REQUEST_PROFILE_SLOW_MS = os.environ.get('REQUEST_PROFILE_SLOW_MS')
+REQUEST_PROFILE_SLOW_MS = float(REQUEST_PROFILE_SLOW_MS) if REQUEST_PROFILE_SLOW_MS else None
+REQUEST_PROFILE_DIR = BASE_DIR / 'profiles'
+# The oldest profiles are deleted beyond this many files
+REQUEST_PROFILE_MAX_FILES = int(os.environ.get('REQUEST_PROFILE_MAX_FILES', 500))
+# Server-Timing tells how long the queries take, so it only goes to staff
+# users and INTERNAL_IPS unless this is on (e.g. for a load test)
+REQUEST_PROFILING_HEADER = os.environ.get('REQUEST_PROFILING_HEADER') == '1'
+
+# Public host name used in links inside emails
+SITE_DOMAIN = 'nasma-perfume-e-shop.onrender.com'
@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
-from products.views import home
+from products.serving import serve_media, serve_static
+from products.views import home, serve_asset
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +10,9 @@ urlpatterns = [
     path('products/', include('products.urls')),
     path('accounts/', include('accounts.urls')),
     path('orders/', include('orders.urls')),
+    path('assets/<path:path>', serve_asset, name='asset'),
+    path(settings.STATIC_URL.lstrip('/') + '<path:path>', serve_static, name='static'),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
      
     
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
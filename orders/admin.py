@@ -1,25 +1,38 @@
 # orders/admin.py
 from django.contrib import admin
-from .models import Order, OrderItem, Review
+from django.utils import timezone
+from products.ratings import rebuild_rating_aggregates
+from .models import Order, OrderItem, OrderStatusChange, OutgoingEmail, Review, StockMovement, WebhookEvent
+from .transitions import bulk_transition
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ['product', 'quantity', 'price']
 
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    extra = 0
+    can_delete = False
+    fields = readonly_fields = ['old_status', 'new_status', 'changed_by', 'changed_at']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'full_name', 'total_amount', 'status', 'created_at', 'has_tracking']
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'full_name', 'email', 'id']
-    readonly_fields = ['created_at', 'updated_at']
-    inlines = [OrderItemInline]
+    readonly_fields = ['created_at', 'updated_at', 'stock_state', 'stock_reserved_until']
+    inlines = [OrderItemInline, OrderStatusChangeInline]
     
     fieldsets = [
         ('Order Information', {
             'fields': [
                 'user', 'order_number', 'status',
-                'total_amount', 'shipping_cost', 'tax_amount'
+                'total_amount', 'shipping_cost', 'tax_amount',
+                'stock_state', 'stock_reserved_until'
             ]
         }),
         ('Customer Information', {
@@ -42,37 +55,30 @@ class OrderAdmin(admin.ModelAdmin):
     
     actions = ['mark_as_processing', 'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled']
 
+    def save_model(self, request, obj, form, change):
+        # Recorded in the status history by the post_save signal
+        obj._changed_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def _transition(self, request, queryset, status):
+        changed = bulk_transition(queryset, status, user=request.user)
+        label = dict(Order.STATUS_CHOICES)[status]
+        self.message_user(request, f"{changed} orders marked as {label}")
+
     def mark_as_processing(self, request, queryset):
-        for order in queryset:
-            old_status = order.status
-            order.status = 'processing'
-            order.save()
-            # Email will be sent automatically via the save method
-        self.message_user(request, f"Selected orders marked as Processing")
+        self._transition(request, queryset, 'processing')
     mark_as_processing.short_description = "Mark selected orders as Processing"
 
     def mark_as_shipped(self, request, queryset):
-        for order in queryset:
-            old_status = order.status
-            order.status = 'shipped'
-            order.save()
-        self.message_user(request, f"Selected orders marked as Shipped")
+        self._transition(request, queryset, 'shipped')
     mark_as_shipped.short_description = "Mark selected orders as Shipped"
 
     def mark_as_delivered(self, request, queryset):
-        for order in queryset:
-            old_status = order.status
-            order.status = 'delivered'
-            order.save()
-        self.message_user(request, f"Selected orders marked as Delivered")
+        self._transition(request, queryset, 'delivered')
     mark_as_delivered.short_description = "Mark selected orders as Delivered"
 
     def mark_as_cancelled(self, request, queryset):
-        for order in queryset:
-            old_status = order.status
-            order.status = 'cancelled'
-            order.save()
-        self.message_user(request, f"Selected orders marked as Cancelled")
+        self._transition(request, queryset, 'cancelled')
     mark_as_cancelled.short_description = "Mark selected orders as Cancelled"
     
     def has_tracking(self, obj):
@@ -85,4 +91,62 @@ class ReviewAdmin(admin.ModelAdmin):
     list_display = ['user', 'product', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
     search_fields = ['user__username', 'product__name', 'comment']
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+    actions = ['recalculate_product_ratings']
+
+    def recalculate_product_ratings(self, request, queryset):
+        product_ids = set(queryset.values_list('product_id', flat=True))
+        rebuild_rating_aggregates(product_ids=product_ids)
+        self.message_user(request, f"Rating aggregates rebuilt for {len(product_ids)} products")
+    recalculate_product_ratings.short_description = "Recalculate ratings of the selected reviews' products"
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'product', 'kind', 'quantity', 'order']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['product__name', 'order__order_number']
+    list_select_related = ['product', 'order']
+
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'type', 'status', 'attempts', 'received_at', 'processed_at', 'next_attempt_at']
+    list_filter = ['status', 'type']
+    search_fields = ['event_id']
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
+    actions = ['retry_now']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='done').update(status='pending', lease='', next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} events queued for the next process_webhooks run")
+    retry_now.short_description = "Retry the selected events now"
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'created_at', 'sent_at', 'next_attempt_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to']
+    readonly_fields = [field.name for field in OutgoingEmail._meta.fields]
+    actions = ['requeue']
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status='sent').update(status='pending', attempts=0, lease='', next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} emails queued for the next deliver_emails run")
+    requeue.short_description = "Requeue the selected emails"
@@ -0,0 +1,178 @@
+# orders/cart.py
+"""
+Cart storage.
+
+Logged-in users keep their cart in the CartItem table, where every change
+is a single-row UPDATE/INSERT/DELETE, so two AJAX calls from the same
+browser can no longer overwrite each other's quantities the way two
+writes of the whole session row did. Guests keep a dict in the session;
+it is merged into the table when they log in.
+
+The classes are picked by CART_USER_STORE and CART_GUEST_STORE (dotted
+paths), so another backend only needs the same five methods.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils.module_loading import import_string
+
+from products.models import Product
+
+SESSION_KEY = 'cart'
+
+
+class SessionCartStore:
+    """The guest cart: {product_id: {'quantity': n}} in the session."""
+
+    def __init__(self, request):
+        self.session = request.session
+
+    def _cart(self):
+        return self.session.setdefault(SESSION_KEY, {})
+
+    def _save(self):
+        self.session.modified = True
+
+    def quantities(self):
+        """{product_id: quantity} for every line."""
+        cart = self.session.get(SESSION_KEY, {})
+        return {int(key): line['quantity'] for key, line in cart.items() if str(key).isdigit()}
+
+    def add(self, product_id, quantity):
+        if quantity < 1:
+            raise ValueError('Quantity must be at least 1')
+        cart = self._cart()
+        line = cart.setdefault(str(product_id), {'quantity': 0})
+        line['quantity'] += quantity
+        self._save()
+
+    def set(self, product_id, quantity):
+        """Set a line's quantity; returns False if the product was not in the cart."""
+        cart = self._cart()
+        if str(product_id) not in cart:
+            return False
+        if quantity <= 0:
+            del cart[str(product_id)]
+        else:
+            cart[str(product_id)]['quantity'] = quantity
+        self._save()
+        return True
+
+    def remove(self, product_id):
+        removed = self._cart().pop(str(product_id), None) is not None
+        if removed:
+            self._save()
+        return removed
+
+    def clear(self):
+        self.session[SESSION_KEY] = {}
+        self._save()
+
+    def count(self):
+        return sum(self.quantities().values())
+
+
+class DatabaseCartStore:
+    """A logged-in user's cart, one CartItem row per line."""
+
+    def __init__(self, request=None, user=None):
+        self.user = user if user is not None else request.user
+
+    def _lines(self):
+        from .models import CartItem
+        return CartItem.objects.filter(user=self.user)
+
+    def quantities(self):
+        return dict(self._lines().order_by('id').values_list('product_id', 'quantity'))
+
+    def add(self, product_id, quantity):
+        from .models import CartItem
+
+        if quantity < 1:
+            raise ValueError('Quantity must be at least 1')
+        if self._lines().filter(product_id=product_id).update(quantity=F('quantity') + quantity):
+            return
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(user=self.user, product_id=product_id, quantity=quantity)
+        except IntegrityError:
+            # Another request created the line first, add to it
+            self._lines().filter(product_id=product_id).update(quantity=F('quantity') + quantity)
+
+    def set(self, product_id, quantity):
+        lines = self._lines().filter(product_id=product_id)
+        if quantity <= 0:
+            return bool(lines.delete()[0])
+        return bool(lines.update(quantity=quantity))
+
+    def remove(self, product_id):
+        return bool(self._lines().filter(product_id=product_id).delete()[0])
+
+    def clear(self):
+        self._lines().delete()
+
+    def count(self):
+        return self._lines().aggregate(count=Sum('quantity'))['count'] or 0
+
+
+def get_cart_store(request):
+    if request.user.is_authenticated:
+        path = getattr(settings, 'CART_USER_STORE', 'orders.cart.DatabaseCartStore')
+    else:
+        path = getattr(settings, 'CART_GUEST_STORE', 'orders.cart.SessionCartStore')
+    return import_string(path)(request)
+
+
+def merge_session_cart(request, user):
+    """Move the guest cart into the user's stored cart after login."""
+    guest = SessionCartStore(request)
+    quantities = guest.quantities()
+    if not quantities:
+        return
+    store = DatabaseCartStore(user=user)
+    existing = set(Product.objects.filter(id__in=quantities).values_list('id', flat=True))
+    for product_id, quantity in quantities.items():
+        if product_id in existing:
+            store.add(product_id, quantity)
+    guest.clear()
+
+
+def get_cart_data(request):
+    """
+    (cart_items, total, cart_count) for the current cart.
+
+    Every line is resolved with one query and the result is kept on the
+    request, so the cart page, checkout and the context processors share it.
+    Lines whose product no longer exists are skipped.
+    """
+    cached = getattr(request, '_cart_data', None)
+    if cached is not None:
+        return cached
+
+    quantities = get_cart_store(request).quantities()
+    products = Product.objects.select_related('category').in_bulk(list(quantities))
+
+    cart_items = []
+    total = 0
+    cart_count = 0
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        item_total = product.price * quantity
+        cart_items.append({
+            'product': product,
+            'quantity': quantity,
+            'total': item_total
+        })
+        total += item_total
+        cart_count += quantity
+
+    request._cart_data = cart_items, total, cart_count
+    return request._cart_data
+
+
+def cart_changed(request):
+    """Forget the memoized cart after the cart was modified."""
+    request.__dict__.pop('_cart_data', None)
+    request.__dict__.pop('_cart_count', None)
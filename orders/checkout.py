@@ -0,0 +1,66 @@
+# orders/checkout.py
+"""
+Order placement.
+
+`place_order` writes the order, all of its lines, the stock reservation
+and the sales counters in one transaction: one INSERT for the order, one
+multi-row INSERT for the lines, one conditional UPDATE per 100 lines for
+the stock and one UPDATE for `units_sold`, whatever the size of the cart.
+"""
+from django.db import transaction
+
+from products.sales import apply_sales_change
+from .inventory import InsufficientStock, release_expired, reserve_stock
+from .models import Order, OrderItem
+
+SHIPPING_COST = 250  # CZK
+TAX_AMOUNT = 0
+
+
+def order_totals(total):
+    """(shipping_cost, tax_amount, final_total) for a cart total."""
+    return SHIPPING_COST, TAX_AMOUNT, total + SHIPPING_COST + TAX_AMOUNT
+
+
+def _quantities(cart_items):
+    quantities = {}
+    for item in cart_items:
+        quantities[item['product'].id] = quantities.get(item['product'].id, 0) + item['quantity']
+    return quantities
+
+
+def place_order(user, cart_items, total, details):
+    """
+    Create a pending order for the resolved cart (see orders.cart.get_cart_data)
+    and reserve its stock. Raises InsufficientStock, after releasing expired
+    reservations and trying once more, when a product has run out.
+    """
+    try:
+        return _place_order(user, cart_items, total, details)
+    except InsufficientStock:
+        # Abandoned checkouts may be holding the units
+        if not release_expired():
+            raise
+    return _place_order(user, cart_items, total, details)
+
+
+def _place_order(user, cart_items, total, details):
+    shipping_cost, tax_amount, _ = order_totals(total)
+    quantities = _quantities(cart_items)
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            total_amount=total,
+            shipping_cost=shipping_cost,
+            tax_amount=tax_amount,
+            status='pending',  # Will be confirmed after payment
+            **details,
+        )
+        # bulk_create sends no post_save, so the sales counters move here
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item['product'], quantity=item['quantity'], price=item['product'].price)
+            for item in cart_items
+        ])
+        reserve_stock(order, quantities)
+        apply_sales_change(quantities)
+    return order
@@ -0,0 +1,146 @@
+# orders/fake_stripe.py
+"""
+A local stand-in for the part of the Stripe API that checkout uses.
+
+It answers POST /v1/checkout/sessions and GET /v1/checkout/sessions/<id>
+with Stripe-shaped JSON after an optional delay, so tests and
+bench_payments can run the real Stripe client against it (point
+STRIPE_API_BASE at `server.url`) without network access or keys.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+def _nest(pairs):
+    """Undo Stripe's form encoding: `metadata[order_id]=5` -> {'metadata': {'order_id': '5'}}."""
+    data = {}
+    for key, value in pairs:
+        parts = key.replace(']', '').split('[')
+        target = data
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return data
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so client connection reuse is visible
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Request-Id', f'req_{next(self.server.ids)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, {'error': {'type': 'invalid_request_error', 'message': message}})
+
+    def _handle(self):
+        """Answer a failure or a missing key; returns True if the request was answered."""
+        stripe = self.server.stripe
+        stripe.requests += 1
+        if stripe.latency:
+            time.sleep(stripe.latency)
+        if stripe.fail_with:
+            self._error(stripe.fail_with, 'Simulated failure')
+            return True
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._error(401, 'No API key provided')
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = _nest(parse_qsl(self.rfile.read(length).decode(), keep_blank_values=True))
+        if self._handle():
+            return
+        if self.path != '/v1/checkout/sessions':
+            return self._error(404, f'Unrecognized request URL (POST: {self.path})')
+        self._send(200, self.server.stripe.create_session(params))
+
+    def do_GET(self):
+        if self._handle():
+            return
+        prefix = '/v1/checkout/sessions/'
+        session = self.server.stripe.sessions.get(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+        if session is None:
+            return self._error(404, f'No such checkout.session: {self.path}')
+        self._send(200, session)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # A client that timed out has hung up; that is expected here
+        pass
+
+
+class FakeStripeServer:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.fail_with = None  # an HTTP status to answer every request with
+        self.requests = 0
+        self.sessions = {}
+        self._counter = itertools.count(1)
+        self._httpd = _Server(('127.0.0.1', 0), _Handler)
+        self._httpd.stripe = self
+        self._httpd.ids = itertools.count(1)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def create_session(self, params):
+        session_id = f'cs_test_{next(self._counter)}'
+        line = params.get('line_items', {}).get('0', {})
+        amount = int(line.get('price_data', {}).get('unit_amount', 0)) * int(line.get('quantity', 1))
+        self.sessions[session_id] = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.url}/pay/{session_id}',
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'payment_intent': None,
+            'amount_total': amount,
+            'currency': line.get('price_data', {}).get('currency'),
+            'customer_email': params.get('customer_email'),
+            'expires_at': int(params['expires_at']) if params.get('expires_at') else None,
+            'success_url': params.get('success_url'),
+            'cancel_url': params.get('cancel_url'),
+            'metadata': params.get('metadata', {}),
+        }
+        return self.sessions[session_id]
+
+    def pay(self, session_id):
+        """Mark a session as paid, as if the customer finished on Stripe's page."""
+        session = self.sessions[session_id]
+        session.update(status='complete', payment_status='paid', payment_intent=f'pi_{session_id}')
+        return session
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,252 @@
+# orders/inventory.py
+"""
+Stock reservation.
+
+Placing an order takes its units out of Product.stock_quantity straight
+away with a conditional UPDATE (`stock_quantity = stock_quantity - n WHERE
+stock_quantity >= n`), one statement per batch of lines. The database
+applies it atomically, so however many checkouts race for the last bottle
+only as many succeed as there are units; a short batch rolls the whole
+order back.
+
+The reservation then either becomes a sale when the order is confirmed
+(`commit_stock`) or goes back on the shelf when it is cancelled, deleted or
+left unpaid past STOCK_RESERVATION_MINUTES (`release_stock`,
+`release_expired`). Each transition is claimed with a conditional UPDATE on
+the order, so it happens once even when the webhook and the redirect both
+report the payment. Every change is written to the StockMovement ledger.
+`release_orders` and `commit_orders` do the same for many orders at once
+(bulk status changes, expired reservations).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from products import facets, page_cache
+from products.models import Product
+from .models import Order, OrderItem, StockMovement
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+
+class InsufficientStock(Exception):
+    def __init__(self, products):
+        self.products = products
+        super().__init__('Not enough stock for ' + ', '.join(product.name for product in products))
+
+
+def reservation_minutes():
+    return getattr(settings, 'STOCK_RESERVATION_MINUTES', 35)
+
+
+def order_quantities(order_id):
+    return dict(
+        OrderItem.objects.filter(order_id=order_id)
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+
+
+def orders_quantities(order_ids):
+    """{order_id: {product_id: quantity}} for many orders in one query."""
+    lines = {}
+    rows = (
+        OrderItem.objects.filter(order_id__in=list(order_ids))
+        .values('order_id', 'product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('order_id', 'product_id', 'total')
+    )
+    for order_id, product_id, total in rows:
+        lines.setdefault(order_id, {})[product_id] = total
+    return lines
+
+
+def combined(lines):
+    """Add up orders_quantities() into one {product_id: quantity}."""
+    totals = {}
+    for quantities in lines.values():
+        for product_id, quantity in quantities.items():
+            totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def _delta(quantities, sign):
+    return Case(
+        *[When(pk=product_id, then=Value(sign * quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _availability_changed(quantities, sign):
+    """Invalidate the in-stock facet and cached pages if a product ran out or came back."""
+    # After a reservation a product that hit 0 ran out; after a release one
+    # holding exactly the returned units was out before
+    threshold = Case(*[When(pk=p, then=Value(0 if sign < 0 else q)) for p, q in quantities.items()],
+                     output_field=IntegerField())
+    if Product.objects.filter(pk__in=list(quantities), stock_quantity=threshold).exists():
+        # robust: the stock change is committed by then, a failed bump must not look like a failed order
+        transaction.on_commit(facets.invalidate, robust=True)
+        transaction.on_commit(page_cache.invalidate, robust=True)
+
+
+def _record(order_id, quantities, kind, sign):
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, order_id=order_id, kind=kind, quantity=sign * quantity)
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def _record_many(lines, kind, sign):
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, order_id=order_id, kind=kind, quantity=sign * quantity)
+        for order_id, quantities in lines.items()
+        for product_id, quantity in quantities.items()
+    ], batch_size=500)
+
+
+def _take(quantities):
+    """Decrement stock for {product_id: quantity} or raise InsufficientStock."""
+    items = sorted(quantities.items())
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = dict(items[start:start + BATCH_SIZE])
+        enough = Q()
+        for product_id, quantity in batch.items():
+            enough |= Q(pk=product_id, stock_quantity__gte=quantity)
+        try:
+            with transaction.atomic():
+                taken = Product.objects.filter(enough).update(stock_quantity=F('stock_quantity') + _delta(batch, -1))
+                if taken < len(batch):
+                    raise InsufficientStock([])
+        except InsufficientStock:
+            # The savepoint undid the rows that did have enough, so this reads the real stock
+            raise InsufficientStock([
+                product for product in Product.objects.filter(pk__in=list(batch))
+                if product.stock_quantity < batch[product.pk]
+            ])
+    _availability_changed(quantities, -1)
+
+
+def _put_back(quantities):
+    items = sorted(quantities.items())
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = dict(items[start:start + BATCH_SIZE])
+        Product.objects.filter(pk__in=list(batch)).update(stock_quantity=F('stock_quantity') + _delta(batch, 1))
+    _availability_changed(quantities, 1)
+
+
+def reserve_stock(order, quantities):
+    """Hold stock for a new order's lines; raises InsufficientStock (inside the caller's transaction)."""
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    with transaction.atomic():
+        _take(quantities)
+        _record(order.pk, quantities, 'reserve', -1)
+        order.stock_state = 'reserved'
+        order.stock_reserved_until = timezone.now() + timedelta(minutes=reservation_minutes())
+        Order.objects.filter(pk=order.pk).update(
+            stock_state=order.stock_state, stock_reserved_until=order.stock_reserved_until,
+        )
+
+
+def _claim(order_id, states, new_state):
+    return Order.objects.filter(pk=order_id, stock_state__in=states).update(stock_state=new_state)
+
+
+def release_stock(order_id):
+    """Put a reserved order's units back; returns False if it held none."""
+    with transaction.atomic():
+        if not _claim(order_id, ['reserved'], 'released'):
+            return False
+        quantities = order_quantities(order_id)
+        _put_back(quantities)
+        _record(order_id, quantities, 'release', 1)
+    return True
+
+
+def commit_stock(order_id):
+    """
+    Turn a reservation into a sale. A reservation that already expired is
+    taken again if the stock is still there; otherwise the order stays
+    'released' and is logged for someone to sort out by hand.
+    """
+    with transaction.atomic():
+        if _claim(order_id, ['reserved'], 'committed'):
+            _record(order_id, order_quantities(order_id), 'commit', -1)
+            return True
+        if not _claim(order_id, ['released'], 'committed'):
+            return False
+        quantities = order_quantities(order_id)
+        try:
+            with transaction.atomic():
+                _take(quantities)
+        except InsufficientStock as error:
+            _claim(order_id, ['committed'], 'released')
+            logger.warning('Paid order %s has no stock left to commit: %s', order_id, error)
+            return False
+        _record(order_id, quantities, 'reserve', -1)
+        _record(order_id, quantities, 'commit', -1)
+    return True
+
+
+def _claim_many(order_ids, state, new_state):
+    """Claim the orders in `state` for `new_state`; returns the ids claimed."""
+    claimed = list(Order.objects.filter(pk__in=list(order_ids), stock_state=state).values_list('pk', flat=True))
+    if claimed:
+        Order.objects.filter(pk__in=claimed, stock_state=state).update(stock_state=new_state)
+    return claimed
+
+
+def release_orders(order_ids, lines=None):
+    """
+    release_stock for many orders: one UPDATE per batch of products and one
+    ledger insert. Call it inside the transaction that changed their status
+    (which holds the write lock, so the claim cannot race). Returns how many
+    orders held stock.
+    """
+    with transaction.atomic():
+        released = _claim_many(order_ids, 'reserved', 'released')
+        if not released:
+            return 0
+        if lines is None:
+            lines = orders_quantities(released)
+        lines = {order_id: lines[order_id] for order_id in released if order_id in lines}
+        _put_back(combined(lines))
+        _record_many(lines, 'release', 1)
+    return len(released)
+
+
+def commit_orders(order_ids, lines=None):
+    """commit_stock for many orders; expired reservations go through commit_stock one by one."""
+    with transaction.atomic():
+        committed = _claim_many(order_ids, 'reserved', 'committed')
+        if committed:
+            if lines is None:
+                lines = orders_quantities(committed)
+            _record_many({order_id: lines[order_id] for order_id in committed if order_id in lines}, 'commit', -1)
+        released = Order.objects.filter(pk__in=list(order_ids), stock_state='released').values_list('pk', flat=True)
+        for order_id in released:
+            commit_stock(order_id)
+    return len(committed)
+
+
+def release_expired(now=None):
+    """Cancel pending orders whose reservation ran out and release their stock. Returns how many."""
+    from .transitions import bulk_transition
+
+    now = now or timezone.now()
+    expired = Order.objects.filter(status='pending', stock_state='reserved', stock_reserved_until__lt=now)
+    # Nobody is told: the customer just didn't pay
+    return bulk_transition(expired, 'cancelled', notify=False)
+
+
+def adjust_stock(product_id, change):
+    """Record a stock change made outside orders (admin restock, stock count)."""
+    if change:
+        StockMovement.objects.create(product_id=product_id, kind='adjust', quantity=change)
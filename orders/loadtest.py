@@ -0,0 +1,309 @@
+# orders/loadtest.py
+"""
+Shopper journeys replayed against the deployed entry points.
+
+`run_wsgi` and `run_asgi` call `golden_fragrance.wsgi.application` and
+`golden_fragrance.asgi.application` directly with hand-built WSGI environs
+and ASGI scopes, so every request goes through the same middleware,
+sessions and CSRF checks as under gunicorn/uvicorn, without a socket. Each
+`Shopper` keeps its own cookies and walks one `Journey`; `summarize` turns
+the timings into throughput and p50/p95/p99 per URL name, and `compare`
+checks a run against an earlier one. bench_journeys is the entry point.
+"""
+import asyncio
+import io
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+HOST = 'testserver'
+
+CHECKOUT_DETAILS = {
+    'full_name': 'Journey Shopper', 'email': 'shopper@example.com', 'address': 'Main 1',
+    'city': 'Praha', 'postal_code': '11000', 'country': 'CZ',
+}
+
+
+class Step:
+    """One request: a URL name, its args and an optional form or JSON body."""
+
+    def __init__(self, name, method='GET', args=(), form=None, json=None):
+        self.name = name
+        self.method = method
+        self.args = args
+        self.form = form
+        self.json = json
+
+    @property
+    def key(self):
+        return f'{self.method} {self.name}'
+
+
+class Journey:
+    """`steps(rng, catalog)` builds the requests; `login` journeys start signed in."""
+
+    def __init__(self, steps, login=False):
+        self.steps = steps
+        self.login = login
+
+
+class Catalog:
+    """Product and category ids the journeys pick from."""
+
+    def __init__(self, products, categories):
+        self.products = products
+        self.categories = categories
+
+
+def _browse(rng, catalog):
+    product = rng.choice(catalog.products)
+    return [
+        Step('home'),
+        Step('products:product_list'),
+        Step('products:search_by_category', args=(rng.choice(catalog.categories),)),
+        Step('products:product_detail', args=(product,)),
+    ]
+
+
+def _buy(rng, catalog):
+    product = rng.choice(catalog.products)
+    return [
+        Step('home'),
+        Step('products:product_list'),
+        Step('products:product_detail', args=(product,)),
+        Step('orders:add_to_cart', 'POST', args=(product,), json={'quantity': 1}),
+        Step('orders:cart'),
+        Step('orders:checkout'),
+        Step('orders:checkout', 'POST', form=CHECKOUT_DETAILS),
+    ]
+
+
+JOURNEYS = {
+    'browse': Journey(_browse),
+    'buy': Journey(_buy, login=True),
+}
+
+
+def signed_in_session(user):
+    """A saved session for `user`, as the login view would leave it; returns the session key."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class Shopper:
+    """A browser: a cookie jar, a CSRF token and the steps of one journey."""
+
+    def __init__(self, steps, session_key=None):
+        self.steps = steps
+        self.csrf_token = get_random_string(32)
+        self.cookies = {settings.CSRF_COOKIE_NAME: self.csrf_token}
+        if session_key:
+            self.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        self.timings = []  # (step key, milliseconds, status)
+
+    def request(self, step):
+        """(method, path, headers, body) for a step; header names are lower case."""
+        headers = {'host': HOST, 'x-csrftoken': self.csrf_token}
+        body = b''
+        if step.json is not None:
+            body = json.dumps(step.json).encode()
+            headers['content-type'] = 'application/json'
+        elif step.form is not None:
+            body = urlencode({**step.form, 'csrfmiddlewaretoken': self.csrf_token}).encode()
+            headers['content-type'] = 'application/x-www-form-urlencoded'
+        if body:
+            headers['content-length'] = str(len(body))
+        headers['cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        return step.method, reverse(step.name, args=step.args), headers, body
+
+    def receive(self, step, milliseconds, status, set_cookies):
+        self.timings.append((step.key, milliseconds, status))
+        for header in set_cookies:
+            for name, morsel in SimpleCookie(header).items():
+                if morsel['max-age'] == '0' or not morsel.value:
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+
+
+def _wsgi_call(application, method, path, headers, body):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        if name in ('content-type', 'content-length'):
+            environ[name.upper().replace('-', '_')] = value
+        else:
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+    started = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = response_headers
+
+    result = application(environ, start_response)
+    try:
+        for _chunk in result:
+            pass
+    finally:
+        # Sends request_finished, which closes the thread's database connection
+        if hasattr(result, 'close'):
+            result.close()
+    cookies = [value for name, value in started['headers'] if name.lower() == 'set-cookie']
+    return started['status'], cookies
+
+
+async def _asgi_call(application, method, path, headers, body):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(name.encode(), value.encode()) for name, value in headers.items()],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    disconnected = asyncio.Event()
+    started = {}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Django listens for a disconnect while the view runs; the client never leaves
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            started['status'] = message['status']
+            started['headers'] = message.get('headers', [])
+
+    await application(scope, receive, send)
+    cookies = [value.decode('latin-1') for name, value in started['headers'] if name.lower() == b'set-cookie']
+    return started['status'], cookies
+
+
+def _walk(shopper, call):
+    for step in shopper.steps:
+        request = shopper.request(step)
+        start = time.perf_counter()
+        status, cookies = call(*request)
+        shopper.receive(step, (time.perf_counter() - start) * 1000, status, cookies)
+
+
+def run_wsgi(application, shoppers, concurrency):
+    """Walk every shopper through `application` on `concurrency` threads; returns elapsed seconds."""
+    def walk(shopper):
+        _walk(shopper, lambda *request: _wsgi_call(application, *request))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(walk, shoppers))
+    return time.perf_counter() - start
+
+
+async def run_asgi(application, shoppers, concurrency):
+    """Walk every shopper through `application` with at most `concurrency` in flight; returns elapsed seconds."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def walk(shopper):
+        async with slots:
+            for step in shopper.steps:
+                request = shopper.request(step)
+                start = time.perf_counter()
+                status, cookies = await _asgi_call(application, *request)
+                shopper.receive(step, (time.perf_counter() - start) * 1000, status, cookies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(walk(shopper) for shopper in shoppers))
+    return time.perf_counter() - start
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def _stats(timings, errors, elapsed):
+    ordered = sorted(timings)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 2),
+        'p50_ms': round(percentile(ordered, 50), 2),
+        'p95_ms': round(percentile(ordered, 95), 2),
+        'p99_ms': round(percentile(ordered, 99), 2),
+        'max_ms': round(ordered[-1], 2),
+    }
+
+
+def summarize(shoppers, elapsed):
+    """Totals and per-URL stats of one run; any 4xx/5xx counts as an error."""
+    timings, errors = defaultdict(list), defaultdict(int)
+    for shopper in shoppers:
+        for key, milliseconds, status in shopper.timings:
+            timings[key].append(milliseconds)
+            errors[key] += status >= 400
+    summary = _stats([ms for values in timings.values() for ms in values], sum(errors.values()), elapsed)
+    summary['elapsed_s'] = round(elapsed, 3)
+    summary['journeys_per_s'] = round(len(shoppers) / elapsed, 2)
+    summary['urls'] = {key: _stats(timings[key], errors[key], elapsed) for key in sorted(timings)}
+    return summary
+
+
+def compare(previous, current, threshold):
+    """
+    Lines of (server, url, metric, before, after, regressed) for two results
+    files. A p95 more than `threshold` percent slower, or a throughput more
+    than `threshold` percent lower, is a regression.
+    """
+    rows = []
+    for server, run in current['servers'].items():
+        before_run = previous.get('servers', {}).get(server)
+        if not before_run:
+            continue
+        for url, after in [('all', run), *run['urls'].items()]:
+            before = before_run if url == 'all' else before_run['urls'].get(url)
+            if not before:
+                continue
+            slower = after['p95_ms'] > before['p95_ms'] * (1 + threshold / 100)
+            rows.append((server, url, 'p95_ms', before['p95_ms'], after['p95_ms'], slower))
+            if url == 'all':
+                fewer = after['throughput_rps'] < before['throughput_rps'] * (1 - threshold / 100)
+                rows.append((server, url, 'throughput_rps', before['throughput_rps'], after['throughput_rps'], fewer))
+    return rows
@@ -0,0 +1,60 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from orders.checkout import place_order
+from orders.models import Order
+from orders.transitions import bulk_transition
+from products.models import Category, Product
+
+from .bench_checkout import DETAILS, _Rollback
+
+
+def legacy_transition(queryset, status):
+    """The previous admin action: one save (and its signals) per order."""
+    for order in queryset:
+        order.status = status
+        order.save()
+
+
+class Command(BaseCommand):
+    help = 'Time the admin bulk status actions on N orders, row by row and set-based (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        for name, transition in (('before', legacy_transition), ('after', bulk_transition)):
+            try:
+                with transaction.atomic():
+                    self._run(name, transition, options['orders'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, name, transition, count):
+        user = User.objects.create_user('bulk-status-benchmark')
+        category = Category.objects.create(name='Benchmark')
+        product = Product.objects.create(
+            name='Bench', description='x', price=100, image='products/b.jpg', category=category,
+            stock_quantity=count,
+        )
+        cart_items = [{'product': product, 'quantity': 1, 'total': product.price}]
+        for _ in range(count):
+            place_order(user, cart_items, product.price, DETAILS)
+        orders = Order.objects.filter(user=user)
+        for status in ('processing', 'cancelled'):
+            # Counted by hand: CaptureQueriesContext keeps only the last 9000
+            queries = []
+
+            def count_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                start = time.perf_counter()
+                transition(orders, status)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(f'{name:>7} {status:>11} {count:>6} orders {elapsed:>8.2f} s {len(queries):>7} queries')
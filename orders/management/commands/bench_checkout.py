@@ -0,0 +1,74 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from orders.checkout import place_order
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+DETAILS = {
+    'full_name': 'Bench Mark', 'email': 'bench@example.com', 'address': 'Main 1',
+    'city': 'Praha', 'postal_code': '11000', 'country': 'CZ',
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_checkout(user, cart_items, total):
+    """The previous checkout: order, one INSERT per line, then a second save."""
+    order = Order.objects.create(user=user, total_amount=total, shipping_cost=250, tax_amount=0, **DETAILS)
+    for item in cart_items:
+        OrderItem.objects.create(
+            order=order, product=item['product'], quantity=item['quantity'], price=item['product'].price,
+        )
+    order.save()
+    return order
+
+
+class Command(BaseCommand):
+    help = 'Measure checkout latency and DB round trips for carts of several sizes (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Rolled back, outbox rows included
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        user = User.objects.create_user('checkout-benchmark')
+        category = Category.objects.create(name='Benchmark')
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench {i}', description='x', price=100 + i, image='products/b.jpg', category=category)
+            for i in range(max(options['lines']))
+        ])
+        self.stdout.write(f"{'lines':>6} {'pipeline':>10} {'ms':>8} {'queries':>8}")
+        for lines in options['lines']:
+            cart_items = [
+                {'product': product, 'quantity': 2, 'total': product.price * 2} for product in products[:lines]
+            ]
+            total = sum(item['total'] for item in cart_items)
+            for name, checkout in (('before', lambda: legacy_checkout(user, cart_items, total)),
+                                   ('after', lambda: place_order(user, cart_items, total, DETAILS))):
+                timings = []
+                for _ in range(options['repeat']):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        checkout()
+                        timings.append((time.perf_counter() - start) * 1000)
+                # SAVEPOINT/RELEASE stand in for BEGIN/COMMIT inside the rollback wrapper
+                self.stdout.write(
+                    f'{lines:>6} {name:>10} {statistics.median(timings):>8.2f} {len(queries):>8}'
+                )
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import random
+import subprocess
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from orders import loadtest, payments
+from orders.fake_stripe import FakeStripeServer
+from products.models import Category, Product
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay shopper journeys (browse, buy up to the Stripe redirect) in-process against the WSGI and '
+        'ASGI applications and write throughput and p50/p95/p99 per URL name to a JSON file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shoppers', type=int, default=100, help='Journeys per server')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Sync workers for WSGI, requests in flight for ASGI')
+        parser.add_argument('--journeys', nargs='+', choices=sorted(loadtest.JOURNEYS), default=['browse', 'buy'],
+                            help='Shoppers take these in turn')
+        parser.add_argument('--servers', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds the Stripe stand-in takes per call')
+        parser.add_argument('--output', default='bench_journeys.json')
+        parser.add_argument('--compare', help='An earlier results file; regressions fail the command')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Percent slower p95 (or lower throughput) that counts as a regression')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                previous = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read {options['compare']}: {error}")
+        catalog = loadtest.Catalog(
+            list(Product.objects.filter(stock_quantity__gt=0).order_by('-units_sold', '-id')
+                 .values_list('id', flat=True)[:200]),
+            list(Category.objects.values_list('id', flat=True)),
+        )
+        if not catalog.products:
+            raise CommandError('No products in stock; load some with generate_dataset.')
+
+        result = {
+            'commit': current_commit(),
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'options': {name: options[name] for name in (
+                'shoppers', 'concurrency', 'journeys', 'seed', 'latency')},
+            'servers': {},
+        }
+        # With no admin address the outbox queues no new-order notices, so the
+        # cleanup below leaves no mail for deliver_emails to send
+        with FakeStripeServer(latency=options['latency']) as stripe, override_settings(
+            STRIPE_API_BASE=stripe.url, STRIPE_SECRET_KEY='sk_test_bench', ALLOWED_HOSTS=['*'], ADMIN_EMAIL=None,
+        ):
+            payments.reset()
+            users = []
+            try:
+                for server in options['servers']:
+                    # Warm-up: one unmeasured shopper per journey loads templates and caches
+                    self._run(server, self._shoppers(options, catalog, users, len(options['journeys'])), 1)
+                    shoppers = self._shoppers(options, catalog, users, options['shoppers'])
+                    elapsed = self._run(server, shoppers, options['concurrency'])
+                    result['servers'][server] = loadtest.summarize(shoppers, elapsed)
+            finally:
+                # Cascades to their orders, which puts the reserved stock back
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+                store = import_module(settings.SESSION_ENGINE).SessionStore
+                for user in users:
+                    store(user.bench_session).delete()
+                payments.reset()
+
+        Path(options['output']).write_text(json.dumps(result, indent=2) + '\n')
+        self._report(result)
+        self.stdout.write(f"Wrote {options['output']}")
+        if previous is not None:
+            self._compare(previous, result, options['threshold'])
+
+    def _shoppers(self, options, catalog, users, count):
+        rng = random.Random(options['seed'])
+        shoppers = []
+        for n in range(count):
+            journey = loadtest.JOURNEYS[options['journeys'][n % len(options['journeys'])]]
+            session_key = None
+            if journey.login:
+                user = User.objects.create_user(f'journey-bench-{len(users)}', 'shopper@example.com')
+                users.append(user)
+                session_key = user.bench_session = loadtest.signed_in_session(user)
+            shoppers.append(loadtest.Shopper(journey.steps(rng, catalog), session_key))
+        return shoppers
+
+    def _run(self, server, shoppers, concurrency):
+        if server == 'wsgi':
+            from golden_fragrance.wsgi import application
+            return loadtest.run_wsgi(application, shoppers, concurrency)
+        from golden_fragrance.asgi import application
+        return asyncio.run(loadtest.run_asgi(application, shoppers, concurrency))
+
+    def _report(self, result):
+        self.stdout.write(
+            f"{'server':>6} {'url':<40} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for server, run in result['servers'].items():
+            for url, stats in [('all', run), *run['urls'].items()]:
+                self.stdout.write(
+                    f"{server:>6} {url:<40} {stats['requests']:>6} {stats['errors']:>5} "
+                    f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+                    f"{stats['p99_ms']:>8.1f}"
+                )
+            if run['errors']:
+                self.stderr.write(f"{server}: {run['errors']} requests answered 4xx/5xx")
+
+    def _compare(self, previous, result, threshold):
+        rows = loadtest.compare(previous, result, threshold)
+        self.stdout.write(f"Against {previous.get('commit') or 'the earlier run'}:")
+        if previous.get('options') != result['options']:
+            self.stderr.write('The runs used different options, so the numbers are not comparable.')
+        for server, url, metric, before, after, regressed in rows:
+            change = (after - before) / before * 100 if before else 0.0
+            flag = '  REGRESSION' if regressed else ''
+            self.stdout.write(f'{server:>6} {url:<40} {metric:<15} {before:>9.1f} -> {after:>9.1f} {change:>+7.1f}%{flag}')
+        regressions = sum(row[-1] for row in rows)
+        if regressions:
+            raise CommandError(f'{regressions} regressions beyond {threshold:g}%')
@@ -0,0 +1,105 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from orders import payments
+from orders.fake_stripe import FakeStripeServer
+from orders.models import CartItem
+from products.models import Category, Product
+
+DETAILS = {
+    'full_name': 'Bench Mark', 'email': 'bench@example.com', 'address': 'Main 1',
+    'city': 'Praha', 'postal_code': '11000', 'country': 'CZ',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Checkout throughput with a slow payment provider: blocking workers (WSGI) '
+        'against one event loop (ASGI), both against the local Stripe stand-in'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds the stand-in takes per call')
+        parser.add_argument('--workers', type=int, default=4, help='Sync workers for the WSGI run')
+
+    def handle(self, *args, **options):
+        # Mail goes through the outbox now; with no admin address the new-order
+        # notices are never queued, so nothing outlives the cleanup below
+        with FakeStripeServer(latency=options['latency']) as stripe, override_settings(
+            STRIPE_API_BASE=stripe.url, STRIPE_SECRET_KEY='sk_test_bench', ALLOWED_HOSTS=['*'], ADMIN_EMAIL=None,
+        ):
+            payments.reset()
+            users, category = self._setup(options['requests'])
+            try:
+                self.stdout.write(f"{'server':>24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+                self._report(f"WSGI, {options['workers']} sync workers", *self._wsgi(users, options['workers']))
+                self._report('ASGI, 1 event loop', *asyncio.run(self._asgi(users)))
+            finally:
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+                category.delete()
+                payments.reset()
+
+    def _setup(self, count):
+        category = Category.objects.create(name='Payment benchmark')
+        product = Product.objects.create(
+            name='Bench', description='x', price=500, image='products/b.jpg', category=category,
+            stock_quantity=10 * count,
+        )
+        users = [User.objects.create_user(f'payment-bench-{n}') for n in range(count)]
+        CartItem.objects.bulk_create([CartItem(user=user, product=product, quantity=1) for user in users])
+        return users, category
+
+    def _report(self, name, elapsed, timings, statuses):
+        timings = sorted(timings)
+        if set(statuses) != {302}:
+            self.stderr.write(f'{name}: unexpected statuses {sorted(set(statuses))}')
+        self.stdout.write(
+            f'{name:>24} {len(timings) / elapsed:>8.1f} {statistics.median(timings):>8.0f} '
+            f'{timings[int(len(timings) * 0.95) - 1]:>8.0f}'
+        )
+
+    def _wsgi(self, users, workers):
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def checkout(client):
+            try:
+                start = time.perf_counter()
+                response = client.post(reverse('orders:checkout'), DETAILS)
+                return (time.perf_counter() - start) * 1000, response.status_code
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(checkout, clients))
+        return time.perf_counter() - start, [r[0] for r in results], [r[1] for r in results]
+
+    async def _asgi(self, users):
+        clients = []
+        for user in users:
+            client = AsyncClient()
+            await client.aforce_login(user)
+            clients.append(client)
+
+        async def checkout(client):
+            start = time.perf_counter()
+            response = await client.post(reverse('orders:checkout'), DETAILS)
+            return (time.perf_counter() - start) * 1000, response.status_code
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(checkout(client) for client in clients))
+        return time.perf_counter() - start, [r[0] for r in results], [r[1] for r in results]
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import BATCH_SIZE, deliver_all
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox, one SMTP connection per batch (cron, or --loop as a worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when idle')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, retried, dead = deliver_all(options['batch_size'])
+            if sent or retried or dead or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails ({retried} to retry, {dead} undeliverable)'))
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
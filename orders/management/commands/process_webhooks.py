@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.webhooks import BATCH_SIZE, process_all
+
+
+class Command(BaseCommand):
+    help = 'Process the Stripe webhook inbox in batches (run from cron, or with --loop as a worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when idle')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            done, retried, failed = process_all(options['batch_size'])
+            if done or retried or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Processed {done} events ({retried} to retry, {failed} failed)'))
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
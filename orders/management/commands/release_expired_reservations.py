@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid orders whose stock reservation has expired and put their stock back'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations'))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_cartitem'),
+        ('products', '0008_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reserve', 'Reserved'), ('release', 'Released'), ('commit', 'Committed'), ('adjust', 'Adjusted')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_state',
+            field=models.CharField(blank=True, choices=[('reserved', 'Reserved'), ('committed', 'Committed'), ('released', 'Released')], default='', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['stock_state', 'stock_reserved_until'], name='orders_orde_stock_s_a1d121_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='orders.order'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'created_at'], name='orders_stoc_product_bd8bb5_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+def renumber_duplicates(apps, schema_editor):
+    # Random numbers could collide; keep the first, suffix the others
+    Order = apps.get_model('orders', 'Order')
+    seen = set()
+    for order in Order.objects.exclude(order_number=None).order_by('pk').only('pk', 'order_number'):
+        if order.order_number in seen:
+            Order.objects.filter(pk=order.pk).update(order_number=f'{order.order_number}-{order.pk}')
+        seen.add(order.order_number)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_status_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('last', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(renumber_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
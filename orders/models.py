@@ -1,12 +1,8 @@
 # orders/models.py
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-import random
-import string
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.conf import settings
 
 class Order(models.Model):
@@ -21,8 +17,14 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
+    STOCK_STATE_CHOICES = [
+        ('reserved', 'Reserved'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    order_number = models.CharField(max_length=100, null=True, blank=True )
+    order_number = models.CharField(max_length=100, null=True, blank=True, unique=True)
     full_name = models.CharField(max_length=200)
     email = models.EmailField()
     address = models.TextField()
@@ -38,50 +40,81 @@ class Order(models.Model):
     tracking_company = models.CharField(max_length=100, blank=True, null=True)
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
     tracking_url = models.URLField(blank=True, null=True)
+    # Stock held for this order (see orders/inventory.py); blank for orders
+    # placed before reservations existed
+    stock_state = models.CharField(max_length=10, choices=STOCK_STATE_CHOICES, blank=True, default='')
+    stock_reserved_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock_state', 'stock_reserved_until']),
+            # Order history pages (see orders.views.order_history)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_newest_idx'),
+        ]
+
+    # Tries at a fresh number when the allocated one is already taken
+    NUMBER_ATTEMPTS = 3
+
     def save(self, *args, **kwargs):
-        if not self.order_number:
-            self.order_number = self.generate_order_number()
-        super().save(*args, **kwargs)
+        from .numbers import allocator
+
+        allocated = not self.order_number
+        for attempt in range(1, self.NUMBER_ATTEMPTS + 1):
+            if allocated:
+                self.order_number = self.generate_order_number()
+            try:
+                # One transaction with what the signals write (stock, outbox emails)
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # Only a reissued block is worth another try (see orders/numbers.py)
+                if (not allocated or attempt == self.NUMBER_ATTEMPTS
+                        or not Order.objects.filter(order_number=self.order_number).exists()):
+                    raise
+                allocator.discard()
 
     def generate_order_number(self):
-        date_part = timezone.now().strftime('%Y%m%d')
-        random_part = ''.join(random.choices(string.digits, k=6))
-        return f'GF{date_part}{random_part}'
+        from .numbers import next_order_number
+
+        return next_order_number()
 
     def __str__(self):
         return f"Order #{self.order_number} - {self.user.username}"
     
     
-    def send_status_email(self, old_status):
-        """Send email notification when order status changes"""
+    def status_email(self, old_status, tracking_added=False):
+        """The customer's status/tracking update as an unsaved OutgoingEmail, rendered by deliver_emails"""
+        from .outbox import build
+
         subject = f"Order Update - #{self.order_number}"
-        
+        data = {'old_status': old_status, 'new_status': self.status, 'tracking_added': tracking_added}
+        return build(subject, '', [self.email], kind='order_status', order=self, data=data)
+
+    def render_status_email(self, old_status, new_status, tracking_added=False):
+        """(plain, html) bodies of the status/tracking update"""
         context = {
             'order': self,
             'old_status': old_status,
-            'new_status': self.status,
-            'status_changed': old_status != self.status,
-            'tracking_added': self.tracking_number and not Order.objects.get(pk=self.pk).tracking_number,
+            'new_status': new_status,
+            'status_changed': old_status != new_status,
+            'tracking_added': tracking_added,
+            'protocol': 'https',
+            'domain': settings.SITE_DOMAIN,
         }
-        
-        html_message = render_to_string('orders/email/order_status_update.html', context)
-        plain_message = strip_tags(html_message)
-        
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[self.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-        except Exception as e:
-            # Log the error but don't break the save process
-            print(f"Failed to send email: {e}")
+
+        html_message = render_to_string('orders/order_status_update.html', context)
+        plain_message = render_to_string('orders/order_status_update.txt', context)
+        return plain_message, html_message
+
+    def send_status_email(self, old_status, tracking_added=False):
+        """Queue the customer's status/tracking update (sent by deliver_emails)"""
+        email = self.status_email(old_status, tracking_added)
+        if email is not None:
+            email.save()
+        return email
 
     def __str__(self):
         return f"Order #{self.order_number} - {self.user.username}"
@@ -103,6 +136,30 @@ class Order(models.Model):
     def shipping_cost_formatted(self):
         return f"{self.shipping_cost} Kč"
 
+class OrderNumberCounter(models.Model):
+    """The last order number sequence handed out on a day (see orders/numbers.py)."""
+    day = models.DateField(primary_key=True)
+    last = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.last}"
+
+
+class OrderStatusChange(models.Model):
+    """One status transition of an order, from the admin, a payment or a bulk action."""
+    order = models.ForeignKey(Order, related_name='status_history', on_delete=models.CASCADE)
+    old_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    new_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [models.Index(fields=['order', 'changed_at'])]
+
+    def __str__(self):
+        return f"#{self.order_id}: {self.old_status} -> {self.new_status}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey('products.Product', on_delete=models.CASCADE)
@@ -136,4 +193,113 @@ class Review(models.Model):
         unique_together = ['user', 'product']
 
     def __str__(self):
-        return f"{self.user.username} - {self.product.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.product.name}"
+
+class CartItem(models.Model):
+    """A line of a logged-in user's cart (guests keep theirs in the session)."""
+    user = models.ForeignKey(User, related_name='cart_items', on_delete=models.CASCADE)
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'product']
+
+    def __str__(self):
+        return f"{self.user.username}: {self.quantity} x {self.product_id}"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only inventory ledger: one row per product per stock change.
+
+    `quantity` is the change applied to Product.stock_quantity (negative for
+    a reservation, positive for a release or a restock). Commit rows mark a
+    reservation that became a sale and carry the sold units as a negative
+    quantity without touching stock again, so a product's stock is the sum
+    of its rows excluding commits.
+    """
+    KIND_CHOICES = [
+        ('reserve', 'Reserved'),
+        ('release', 'Released'),
+        ('commit', 'Committed'),
+        ('adjust', 'Adjusted'),
+    ]
+
+    product = models.ForeignKey('products.Product', related_name='stock_movements', on_delete=models.CASCADE)
+    # Kept when the order is deleted, the ledger is never rewritten
+    order = models.ForeignKey(Order, related_name='stock_movements', null=True, blank=True, on_delete=models.SET_NULL)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'created_at'])]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Stock movements are append-only')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} x {self.product_id}"
+
+
+class WebhookEvent(models.Model):
+    """A Stripe webhook delivery waiting for, or done with, processing (see orders/webhooks.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Stripe retries deliver the same id, the unique key drops them
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # Earliest next try; a claimed event is leased by pushing it forward
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    lease = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
+
+
+class OutgoingEmail(models.Model):
+    """A message waiting in the email outbox (see orders/outbox.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Undeliverable'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255, blank=True, default='')
+    to = models.JSONField()
+    # Set for messages rendered at delivery, see outbox.RENDERERS
+    kind = models.CharField(max_length=30, blank=True, default='')
+    order = models.ForeignKey(Order, null=True, blank=True, related_name='emails', on_delete=models.CASCADE)
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    lease = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,75 @@
+# orders/numbers.py
+"""
+Order numbers.
+
+Numbers look like GF20261017000042: the date and that day's sequence
+number. The sequence comes from one OrderNumberCounter row per day, but
+each process takes a block of ORDER_NUMBER_BLOCK_SIZE numbers at a time
+(hi/lo), so most orders get their number without a database round trip.
+Numbers left in a block when the process stops are never used, so the
+sequence has gaps.
+
+The unique index on Order.order_number is the guarantee. A block can be
+handed out twice when the transaction that took it rolls back; Order.save
+then hits the index, drops the block (`discard`) and tries a new number.
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderNumberCounter
+
+PREFIX = 'GF'
+
+
+def block_size():
+    return getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 50)
+
+
+def reserve_block(day, size):
+    """Take the next `size` numbers of `day` from the counter; returns (first, end)."""
+    with transaction.atomic():
+        OrderNumberCounter.objects.bulk_create([OrderNumberCounter(day=day)], ignore_conflicts=True)
+        # The UPDATE locks the row (the database, on SQLite) until commit, so the read is ours
+        OrderNumberCounter.objects.filter(day=day).update(last=F('last') + size)
+        last = OrderNumberCounter.objects.filter(day=day).values_list('last', flat=True).get()
+    return last - size + 1, last + 1
+
+
+def format_number(day, sequence):
+    return f"{PREFIX}{day.strftime('%Y%m%d')}{sequence:06d}"
+
+
+class Allocator:
+    """Hands out a process's block of numbers to its threads."""
+
+    def __init__(self, size=None):
+        self.size = size
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = self._end = 0
+
+    def next(self):
+        day = timezone.now().date()
+        with self._lock:
+            if day != self._day or self._next >= self._end:
+                self._next, self._end = reserve_block(day, self.size or block_size())
+                self._day = day
+            sequence = self._next
+            self._next += 1
+        return format_number(day, sequence)
+
+    def discard(self):
+        """Forget the current block, e.g. after one of its numbers turned out to be taken."""
+        with self._lock:
+            self._next = self._end = 0
+
+
+allocator = Allocator()
+
+
+def next_order_number():
+    return allocator.next()
@@ -0,0 +1,155 @@
+# orders/outbox.py
+"""
+Transactional email outbox.
+
+Code that changes an order calls `enqueue` instead of send_mail: the
+message becomes an OutgoingEmail row in the same transaction as the
+change, so it is sent if and only if the change commits, and the request
+never waits on the mail server. Messages that need templates (the
+customer's status update) are queued as a `kind` plus the order and a few
+values, and rendered by the worker right before the first send, so bulk
+admin actions only write rows.
+
+The deliver_emails command sends due messages in batches over one SMTP
+connection per batch (`deliver_batch`). A failed message is retried with
+exponential backoff; after MAX_ATTEMPTS it is dead-lettered ('dead') and
+can be requeued from the admin. Batches are leased as in orders/queues.py.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from . import queues
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=2)
+
+
+# kind -> function(email) returning the (plain, html) bodies
+RENDERERS = {
+    'order_status': lambda email: email.order.render_status_email(**email.data),
+}
+
+
+def build(subject, body, to, html_body='', from_email=None, kind='', order=None, data=None):
+    """
+    An unsaved OutgoingEmail, or None when there is nobody to send it to.
+    With a `kind`, the bodies are left empty and rendered at delivery.
+    """
+    recipients = [address for address in to if address]
+    if not recipients:
+        return None
+    return OutgoingEmail(
+        subject=subject,
+        body=body,
+        html_body=html_body or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        to=recipients,
+        kind=kind,
+        order=order,
+        data=data or {},
+    )
+
+
+def enqueue(subject, body, to, html_body='', from_email=None, kind='', order=None, data=None):
+    """Queue a message; it is delivered once the surrounding transaction commits."""
+    email = build(subject, body, to, html_body, from_email, kind, order, data)
+    if email is not None:
+        email.save()
+    return email
+
+
+def enqueue_many(emails):
+    """Queue built messages with one multi-row INSERT."""
+    return OutgoingEmail.objects.bulk_create([email for email in emails if email is not None], batch_size=500)
+
+
+def render(email):
+    """Fill in the bodies of a `kind` message, once; retries reuse them."""
+    if not email.kind or email.body:
+        return
+    email.body, email.html_body = RENDERERS[email.kind](email)
+    OutgoingEmail.objects.filter(pk=email.pk).update(body=email.body, html_body=email.html_body)
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _connection_lost(error):
+    # SMTPException subclasses OSError, but most of them (a refused
+    # recipient, say) leave the connection usable
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def deliver_batch(batch_size=BATCH_SIZE, now=None, connection=None):
+    """Send one batch of due messages over a single connection. Returns (sent, retried, dead)."""
+    emails = queues.claim(OutgoingEmail.objects.select_related('order'), batch_size, LEASE, now)
+    if not emails:
+        return 0, 0, 0
+    connection = connection or get_connection(fail_silently=False)
+    sent = retried = dead = 0
+    try:
+        connection.open()
+        for email in emails:
+            attempts = email.attempts + 1
+            try:
+                render(email)
+                _message(email, connection).send()
+            except Exception as error:
+                logger.warning('Could not send email %s (attempt %s): %s', email.pk, attempts, error)
+                if queues.reschedule(email, attempts, error, MAX_ATTEMPTS, BACKOFF_BASE, BACKOFF_MAX, 'dead'):
+                    dead += 1
+                else:
+                    retried += 1
+                if _connection_lost(error):
+                    # Start the rest of the batch on a fresh connection
+                    connection.close()
+                    connection.open()
+                continue
+            queues.finish(email, attempts, status='sent', sent_at=timezone.now())
+            sent += 1
+    except Exception as error:
+        # The server could not be reached at all: the whole batch waits
+        logger.warning('Could not connect to the mail server: %s', error)
+        for email in emails:
+            # Messages already sent or rescheduled no longer hold the lease
+            if OutgoingEmail.objects.filter(pk=email.pk, lease=email.lease).exists():
+                if queues.reschedule(email, email.attempts + 1, error, MAX_ATTEMPTS, BACKOFF_BASE, BACKOFF_MAX, 'dead'):
+                    dead += 1
+                else:
+                    retried += 1
+    finally:
+        connection.close()
+    return sent, retried, dead
+
+
+def deliver_all(batch_size=BATCH_SIZE):
+    """Deliver batches until nothing is due. Returns the (sent, retried, dead) totals."""
+    totals = [0, 0, 0]
+    while True:
+        counts = deliver_batch(batch_size)
+        if not any(counts):
+            return tuple(totals)
+        totals = [total + count for total, count in zip(totals, counts)]
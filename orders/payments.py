@@ -0,0 +1,115 @@
+# orders/payments.py
+"""
+Stripe calls for the async checkout views.
+
+The views await these instead of blocking a worker for the Stripe round
+trip. Each call has an explicit timeout (STRIPE_TIMEOUT) and goes through
+a long-lived client, so connections to Stripe are kept alive and reused:
+with httpx installed it is Stripe's native async client (one per event
+loop, closed when the loop shuts down); without it the blocking client
+runs in a worker thread, off the event loop, with a keep-alive session per
+thread.
+"""
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+try:
+    import httpx
+except ImportError:  # optional, calls run in a thread without it
+    httpx = None
+
+# Calls that may be in flight at once per process without httpx
+FALLBACK_THREADS = 32
+
+_lock = threading.Lock()
+_sync_client = None
+_executor = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def timeout():
+    return getattr(settings, 'STRIPE_TIMEOUT', 10)
+
+
+def _client(http_client):
+    base = getattr(settings, 'STRIPE_API_BASE', None)
+    return stripe.StripeClient(
+        getattr(settings, 'STRIPE_SECRET_KEY', None) or stripe.api_key,
+        http_client=http_client,
+        base_addresses={'api': base} if base else None,
+        max_network_retries=getattr(settings, 'STRIPE_MAX_RETRIES', 1),
+    )
+
+
+def get_client():
+    """The process-wide blocking client."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = _client(stripe.RequestsClient(timeout=timeout()))
+        return _sync_client
+
+
+def _in_thread(func):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FALLBACK_THREADS, thread_name_prefix='stripe')
+    return sync_to_async(func, thread_sensitive=False, executor=_executor)
+
+
+async def _close_with_loop(http_client):
+    # Left suspended at the yield; loop.shutdown_asyncgens(), which
+    # asyncio.run() calls before closing the loop, resumes it. Under WSGI
+    # async_to_sync runs each request on a fresh loop, so this is what keeps
+    # every request from leaking its client
+    try:
+        yield
+    finally:
+        await http_client.close_async()
+
+
+async def get_async_client():
+    """The native async client for the running loop, or None without httpx."""
+    if httpx is None:
+        return None
+    # httpx pools belong to the loop they were opened on
+    loop = asyncio.get_running_loop()
+    with _lock:
+        entry = _async_clients.get(loop)
+        created = entry is None
+        if created:
+            http_client = stripe.HTTPXClient(timeout=timeout())
+            entry = _async_clients[loop] = (_client(http_client), _close_with_loop(http_client))
+    if created:
+        # Runs to the yield without suspending; the loop now tracks the generator
+        await entry[1].__anext__()
+    return entry[0]
+
+
+def reset():
+    """Forget the clients, e.g. after changing the Stripe settings."""
+    global _sync_client
+    with _lock:
+        _sync_client = None
+        _async_clients.clear()
+
+
+async def create_checkout_session(params):
+    client = await get_async_client()
+    if client is None:
+        return await _in_thread(get_client().v1.checkout.sessions.create)(params)
+    return await client.v1.checkout.sessions.create_async(params)
+
+
+async def retrieve_checkout_session(session_id):
+    client = await get_async_client()
+    if client is None:
+        return await _in_thread(get_client().v1.checkout.sessions.retrieve)(session_id)
+    return await client.v1.checkout.sessions.retrieve_async(session_id)
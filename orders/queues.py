@@ -0,0 +1,56 @@
+# orders/queues.py
+"""
+What the database-backed queues (webhook inbox, email outbox) share.
+
+A queue row has `status` ('pending' while it still has to run),
+`attempts`, `next_attempt_at`, `lease` and `last_error`. A worker claims
+due rows by writing a fresh lease token on them and pushing
+`next_attempt_at` forward, so concurrent workers never take the same row
+and the rows of a worker that died become due again when the lease runs
+out.
+"""
+import uuid
+
+from django.utils import timezone
+
+
+def claim(queryset, batch_size, lease_for, now=None):
+    """Lease up to `batch_size` due rows of `queryset` to this worker and return them."""
+    now = now or timezone.now()
+    due = list(
+        queryset.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    lease = uuid.uuid4().hex
+    # Conditional, so rows another worker leased meanwhile are skipped
+    queryset.filter(id__in=due, status='pending', next_attempt_at__lte=now).update(
+        lease=lease, next_attempt_at=now + lease_for,
+    )
+    return list(queryset.filter(lease=lease).order_by('id'))
+
+
+def backoff(attempts, base, cap):
+    return min(base * 2 ** (attempts - 1), cap)
+
+
+def finish(row, attempts, **changes):
+    """Mark a leased row done; False if its lease was lost to another worker."""
+    return bool(type(row).objects.filter(pk=row.pk, lease=row.lease).update(
+        attempts=attempts, lease='', last_error='', **changes,
+    ))
+
+
+def reschedule(row, attempts, error, max_attempts, base, cap, give_up_status='failed'):
+    """Record a failed attempt and retry later, or give up; returns True when given up."""
+    give_up = attempts >= max_attempts
+    type(row).objects.filter(pk=row.pk, lease=row.lease).update(
+        status=give_up_status if give_up else 'pending',
+        attempts=attempts,
+        lease='',
+        last_error=f'{type(error).__name__}: {error}',
+        next_attempt_at=timezone.now() + backoff(attempts, base, cap),
+    )
+    return give_up
@@ -1,13 +1,22 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
+from django.db import transaction
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import Order
+from django.db.models import Sum
+from products import page_cache
+from products.models import Product
+from products.ratings import apply_rating_change
+from products.sales import apply_sales_change
+from . import outbox
+from .cart import merge_session_cart
+from .inventory import adjust_stock, commit_stock, release_stock
+from .models import Order, OrderItem, OrderStatusChange, Review
 
 @receiver(post_save, sender=Order)
-def notify_admin_new_order(sender, instance, created, **kwargs):
+def notify_admin_new_order(sender, instance, created, raw=False, **kwargs):
     # Only trigger when a new order is created and status is pending
-    if created and instance.status.lower() == 'pending':
+    if created and not raw and instance.status.lower() == 'pending':
         subject = f"🛍️ New Pending Order #{instance.order_number}"
         message = (
             f"A new order has been placed and is pending.\n\n"
@@ -18,13 +27,147 @@ def notify_admin_new_order(sender, instance, created, **kwargs):
             f"Created At: {instance.created_at.strftime('%Y-%m-%d %H:%M')}\n"
             f"Status: {instance.status}"
         )
-        try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[settings.ADMIN_EMAIL],
-                fail_silently=False
-            )
-        except Exception as e:
-            print(f"Failed to send admin notification: {e}")
+        # Queued with the order, delivered by deliver_emails
+        outbox.enqueue(subject, message, [settings.ADMIN_EMAIL])
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    # Stash what the row looked like before this save so post_save can move
+    # the product aggregates by the difference instead of recounting.
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    previous = Review.objects.filter(pk=instance.pk).values('product_id', 'rating').first()
+    if previous:
+        instance._previous_rating = (previous['product_id'], previous['rating'])
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        apply_rating_change(instance.product_id, added=instance.rating)
+    elif previous[0] != instance.product_id:
+        apply_rating_change(previous[0], removed=previous[1])
+        apply_rating_change(instance.product_id, added=instance.rating)
+    else:
+        apply_rating_change(instance.product_id, removed=previous[1], added=instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    apply_rating_change(instance.product_id, removed=instance.rating)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_page_cache_on_review(sender, raw=False, **kwargs):
+    if not raw:
+        # Ratings are shown on cards and on the detail page
+        transaction.on_commit(page_cache.invalidate)
+
+
+def _order_quantities(order_id):
+    return dict(
+        OrderItem.objects.filter(order_id=order_id)
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = instance._previous_tracking_number = None
+    if raw or instance.pk is None:
+        return
+    previous = Order.objects.filter(pk=instance.pk).values_list('status', 'tracking_number').first()
+    if previous:
+        instance._previous_status, instance._previous_tracking_number = previous
+
+
+@receiver(post_save, sender=Order)
+def update_units_sold_on_cancel(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None:
+        return
+    was_cancelled = previous == 'cancelled'
+    is_cancelled = instance.status == 'cancelled'
+    if was_cancelled != is_cancelled:
+        apply_sales_change(_order_quantities(instance.pk), sign=-1 if is_cancelled else 1)
+
+
+@receiver(post_save, sender=Order)
+def update_stock_on_status_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None or previous == instance.status:
+        return
+    if instance.status == 'cancelled':
+        release_stock(instance.pk)
+    elif instance.status != 'pending':
+        commit_stock(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def record_status_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None or previous == instance.status:
+        return
+    OrderStatusChange.objects.create(
+        order=instance, old_status=previous, new_status=instance.status,
+        changed_by=getattr(instance, '_changed_by', None),
+    )
+
+
+@receiver(post_save, sender=Order)
+def email_status_update(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None:
+        return
+    tracking_added = bool(instance.tracking_number) and not instance._previous_tracking_number
+    if previous != instance.status or tracking_added:
+        instance.send_status_email(previous, tracking_added)
+
+
+@receiver(pre_delete, sender=Order)
+def release_stock_on_delete(sender, instance, **kwargs):
+    release_stock(instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_stock(sender, instance, raw=False, **kwargs):
+    instance._previous_stock = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_stock = Product.objects.filter(pk=instance.pk).values_list('stock_quantity', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def record_stock_adjustment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = 0 if created else getattr(instance, '_previous_stock', None)
+    if previous is not None:
+        adjust_stock(instance.pk, instance.stock_quantity - previous)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_units_sold_on_item_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.order.status != 'cancelled':
+        apply_sales_change({instance.product_id: instance.quantity})
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_units_sold_on_item_delete(sender, instance, **kwargs):
+    status = Order.objects.filter(pk=instance.order_id).values_list('status', flat=True).first()
+    if status is not None and status != 'cancelled':
+        apply_sales_change({instance.product_id: instance.quantity}, sign=-1)
+
+
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        merge_session_cart(request, user)
@@ -1,3 +1,992 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import stripe
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, close_old_connections, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Category, Product
+from products.testing import QueryBudgetMixin, View
+from .cart import DatabaseCartStore
+from . import loadtest, numbers, outbox, payments, urls, webhooks
+from .checkout import place_order
+from .fake_stripe import FakeStripeServer
+from .inventory import InsufficientStock, release_expired
+from .models import CartItem, Order, OrderItem, OrderNumberCounter, OrderStatusChange, OutgoingEmail, StockMovement, WebhookEvent
+from .smtp_sink import SMTPSink
+from .transitions import bulk_transition
+from .views import fulfill_order
+
+
+class CartResolutionTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Oud')
+        self.products = [
+            Product.objects.create(
+                name=f'Oud {n}', description='Smoky', price=100 * (n + 1), image='products/o.jpg',
+                category=self.category, stock_quantity=10,
+            )
+            for n in range(12)
+        ]
+
+    def add(self, product, quantity=1):
+        self.client.post(
+            reverse('orders:add_to_cart', args=[product.id]),
+            data=json.dumps({'quantity': quantity}), content_type='application/json',
+        )
+
+    def cart_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:cart'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        self.add(self.products[0])
+        response, baseline = self.cart_queries()
+        self.assertEqual(response.context['total'], 100)
+
+        for product in self.products[1:]:
+            self.add(product, quantity=2)
+        response, queries = self.cart_queries()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(response.context['cart_items']), 12)
+        self.assertEqual(response.context['cart_count'], 1 + 2 * 11)
+        self.assertEqual(response.context['total'], 100 + 2 * sum(100 * (n + 1) for n in range(1, 12)))
+
+    def test_deleted_products_are_skipped(self):
+        self.add(self.products[0], quantity=3)
+        self.add(self.products[1])
+        self.products[1].delete()
+        response, queries = self.cart_queries()
+        self.assertEqual([item['product'] for item in response.context['cart_items']], [self.products[0]])
+        self.assertEqual(response.context['total'], 300)
+
+    def test_checkout_shares_the_resolved_cart(self):
+        self.client.force_login(User.objects.create_user('ivan', password='pw'))
+        self.add(self.products[0])
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('orders:checkout'))
+        for product in self.products[1:]:
+            self.add(product)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('orders:checkout'))
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(response.context['final_total'], sum(p.price for p in self.products) + 250)
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Amber')
+        self.rose, self.musk = [
+            Product.objects.create(name=name, description='x', price=500, image='products/a.jpg', category=category)
+            for name in ('Rose', 'Musk')
+        ]
+        self.user = User.objects.create_user('jana', password='pw')
+
+    def post(self, client, name, product, quantity=None):
+        body = json.dumps({'quantity': quantity}) if quantity is not None else '{}'
+        return client.post(reverse(f'orders:{name}', args=[product.id]), data=body, content_type='application/json').json()
+
+    def test_logged_in_cart_is_stored_per_line(self):
+        # Two browsers of the same user write to the same rows, nothing is lost
+        phone, laptop = self.client_class(), self.client_class()
+        phone.force_login(self.user)
+        laptop.force_login(self.user)
+        self.post(phone, 'add_to_cart', self.rose, 2)
+        self.post(laptop, 'add_to_cart', self.rose, 1)
+        self.assertEqual(self.post(phone, 'add_to_cart', self.musk, 1)['cart_count'], 4)
+        self.assertEqual(DatabaseCartStore(user=self.user).quantities(), {self.rose.id: 3, self.musk.id: 1})
+
+        self.assertEqual(self.post(laptop, 'update_cart', self.rose, 5)['cart_count'], 6)
+        self.assertTrue(self.post(phone, 'remove_from_cart', self.musk)['success'])
+        self.assertFalse(self.post(phone, 'remove_from_cart', self.musk)['success'])
+        self.assertEqual(list(CartItem.objects.values_list('product_id', 'quantity')), [(self.rose.id, 5)])
+        self.assertNotIn('cart', phone.session)
+
+    def test_guest_cart_merges_at_login(self):
+        self.post(self.client, 'add_to_cart', self.rose, 2)
+        DatabaseCartStore(user=self.user).add(self.rose.id, 1)
+        self.client.post(reverse('accounts:login'), {'username': 'jana', 'password': 'pw'})
+        self.assertEqual(DatabaseCartStore(user=self.user).quantities(), {self.rose.id: 3})
+        self.assertEqual(self.client.session.get('cart'), {})
+        self.assertEqual(self.client.get(reverse('orders:cart')).context['cart_count'], 3)
+
+    def test_add_rejects_quantities_below_one(self):
+        self.client.force_login(self.user)
+        for quantity in (0, -3, 'two'):
+            with self.subTest(quantity=quantity):
+                response = self.post(self.client, 'add_to_cart', self.rose, quantity)
+                self.assertEqual(response, {'success': False, 'message': 'Quantity must be at least 1'})
+        self.assertFalse(CartItem.objects.exists())
+        with self.assertRaises(ValueError):
+            DatabaseCartStore(user=self.user).add(self.rose.id, 0)
+
+    def test_single_row_writes(self):
+        self.client.force_login(self.user)
+        self.post(self.client, 'add_to_cart', self.rose, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.client, 'add_to_cart', self.rose, 1)
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('orders_cartitem', writes[0])
+
+
+class PlaceOrderTests(TestCase):
+    details = {
+        'full_name': 'Ivan Novak', 'email': 'ivan@example.com', 'address': 'Main 1',
+        'city': 'Praha', 'postal_code': '11000', 'country': 'CZ',
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('ivan', password='pw', email='ivan@example.com')
+        category = Category.objects.create(name='Musk')
+        self.products = [
+            Product.objects.create(
+                name=f'Musk {n}', description='Soft', price=50 * (n + 1), image='products/m.jpg',
+                category=category, stock_quantity=10,
+            )
+            for n in range(10)
+        ]
+
+    def cart(self, products, quantity=2):
+        items = [{'product': p, 'quantity': quantity, 'total': p.price * quantity} for p in products]
+        return items, sum(item['total'] for item in items)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        with CaptureQueriesContext(connection) as small:
+            place_order(self.user, *self.cart(self.products[:1]), self.details)
+        with CaptureQueriesContext(connection) as large:
+            order = place_order(self.user, *self.cart(self.products), self.details)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(order.items.count(), 10)
+        self.assertEqual(order.total_amount, 2 * sum(p.price for p in self.products))
+        self.assertEqual(order.shipping_cost, 250)
+
+    def test_units_sold_are_updated(self):
+        place_order(self.user, *self.cart(self.products[:3], quantity=3), self.details)
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[p.pk for p in self.products[:4]]).order_by('pk').values_list('units_sold', flat=True)),
+            [3, 3, 3, 0],
+        )
+
+    def test_failure_rolls_everything_back(self):
+        with mock.patch('orders.checkout.apply_sales_change', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                place_order(self.user, *self.cart(self.products), self.details)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class StockReservationTests(TestCase):
+    details = PlaceOrderTests.details
+
+    def setUp(self):
+        self.user = User.objects.create_user('vera', password='pw', email='vera@example.com')
+        category = Category.objects.create(name='Amber')
+        self.rose = Product.objects.create(
+            name='Rose', description='Fresh', price=300, image='products/r.jpg', category=category, stock_quantity=5,
+        )
+        self.amber = Product.objects.create(
+            name='Amber', description='Warm', price=500, image='products/a.jpg', category=category, stock_quantity=2,
+        )
+
+    def order(self, *lines):
+        items = [{'product': product, 'quantity': quantity, 'total': product.price * quantity} for product, quantity in lines]
+        return place_order(self.user, items, sum(item['total'] for item in items), self.details)
+
+    def stock(self):
+        return list(Product.objects.order_by('pk').values_list('stock_quantity', flat=True))
+
+    def ledger_stock(self, product):
+        return StockMovement.objects.filter(product=product).exclude(kind='commit').aggregate(total=Sum('quantity'))['total']
+
+    def test_reservation_takes_stock_and_is_recorded(self):
+        order = self.order((self.rose, 2), (self.amber, 1))
+        self.assertEqual(self.stock(), [3, 1])
+        self.assertEqual(order.stock_state, 'reserved')
+        self.assertEqual(
+            sorted(order.stock_movements.values_list('product__name', 'kind', 'quantity')),
+            [('Amber', 'reserve', -1), ('Rose', 'reserve', -2)],
+        )
+        self.assertEqual(self.ledger_stock(self.rose), 3)
+
+    def test_short_line_rolls_the_whole_order_back(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            self.order((self.rose, 2), (self.amber, 3))
+        self.assertEqual(raised.exception.products, [self.amber])
+        self.assertEqual(self.stock(), [5, 2])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockMovement.objects.filter(kind='reserve').exists())
+
+    def test_payment_cancel_releases(self):
+        order = self.order((self.amber, 2))
+        self.client.force_login(self.user)
+        self.client.get(reverse('orders:payment_cancel', args=[order.id]))
+        self.assertEqual(self.stock(), [5, 2])
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.stock_state), ('cancelled', 'released'))
+        # A second cancel changes nothing
+        self.client.get(reverse('orders:payment_cancel', args=[order.id]))
+        self.assertEqual(StockMovement.objects.filter(kind='release').count(), 1)
+
+    def test_fulfill_order_commits(self):
+        order = self.order((self.rose, 1))
+        session = {'id': 'cs_1', 'metadata': {'order_id': str(order.id)}, 'payment_intent': 'pi_1'}
+        fulfill_order(session)
+        fulfill_order(session)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.stock_state), ('confirmed', 'committed'))
+        self.assertEqual(self.stock(), [4, 2])
+        self.assertEqual(list(order.stock_movements.filter(kind='commit').values_list('quantity', flat=True)), [-1])
+
+    def test_abandoned_reservations_expire(self):
+        order = self.order((self.amber, 2))
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(hours=1)), 1)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.stock_state), ('cancelled', 'released'))
+        self.assertEqual(self.stock(), [5, 2])
+        self.amber.refresh_from_db()
+        self.assertEqual(self.amber.units_sold, 0)
+
+    def test_expired_reservations_are_released_when_stock_runs_out(self):
+        stale = self.order((self.amber, 2))
+        Order.objects.filter(pk=stale.pk).update(stock_reserved_until=timezone.now() - timedelta(minutes=1))
+        order = self.order((self.amber, 2))
+        self.assertEqual(order.stock_state, 'reserved')
+        self.assertEqual(Order.objects.get(pk=stale.pk).status, 'cancelled')
+
+    def test_late_payment_takes_the_stock_again(self):
+        order = self.order((self.rose, 2))
+        release_expired(now=timezone.now() + timedelta(hours=1))
+        fulfill_order({'id': 'cs_2', 'metadata': {'order_id': str(order.id)}, 'payment_intent': 'pi_2'})
+        order.refresh_from_db()
+        self.assertEqual(order.stock_state, 'committed')
+        self.assertEqual(self.stock(), [3, 2])
+        self.assertEqual(self.ledger_stock(self.rose), 3)
+
+    def test_deleted_order_releases(self):
+        order = self.order((self.rose, 4))
+        order.delete()
+        self.assertEqual(self.stock(), [5, 2])
+        self.assertEqual(StockMovement.objects.filter(kind='release', order=None).count(), 1)
+
+    def test_admin_edits_are_recorded(self):
+        self.rose.stock_quantity = 9
+        self.rose.save()
+        self.assertEqual(self.ledger_stock(self.rose), 9)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def setUp(self):
+        category = Category.objects.create(name='Rare')
+        self.product = Product.objects.create(
+            name='Last bottles', description='Rare', price=900, image='products/l.jpg',
+            category=category, stock_quantity=self.stock,
+        )
+        self.users = [User.objects.create_user(f'buyer{n}') for n in range(self.buyers)]
+
+    def checkout(self, user, barrier, results):
+        product = Product.objects.get(pk=self.product.pk)
+        items = [{'product': product, 'quantity': 1, 'total': product.price}]
+        barrier.wait()
+        try:
+            while True:
+                try:
+                    place_order(user, items, product.price, PlaceOrderTests.details)
+                    results.append('ok')
+                    return
+                except InsufficientStock:
+                    results.append('sold out')
+                    return
+                except OperationalError:
+                    # The shared in-memory test database refuses concurrent writers instead of waiting
+                    continue
+        finally:
+            close_old_connections()
+
+    def test_parallel_checkouts_never_oversell(self):
+        barrier = threading.Barrier(self.buyers)
+        results = []
+        threads = [threading.Thread(target=self.checkout, args=(user, barrier, results)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('ok'), self.stock, results)
+        self.assertEqual(results.count('sold out'), self.buyers - self.stock)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(StockMovement.objects.filter(kind='reserve').count(), self.stock)
+        self.assertEqual(self.product.units_sold, self.stock)
+
+
+class StripeCheckoutTests(TestCase):
+    """The async checkout views against the local Stripe stand-in, on the thread pool client."""
+    details = PlaceOrderTests.details
+    httpx = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = FakeStripeServer().start()
+        cls.addClassCleanup(cls.stripe.stop)
+        settings = override_settings(STRIPE_API_BASE=cls.stripe.url, STRIPE_SECRET_KEY='sk_test_local', STRIPE_TIMEOUT=2)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        cls.addClassCleanup(payments.reset)
+        payments.reset()
+
+    def setUp(self):
+        patcher = mock.patch.object(payments, 'httpx', self.httpx)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stripe.latency, self.stripe.fail_with = 0, None
+        self.user = User.objects.create_user('ivan', password='pw', email='ivan@example.com')
+        category = Category.objects.create(name='Musk')
+        self.products = [
+            Product.objects.create(
+                name=f'Musk {n}', description='Soft', price=50 * (n + 1), image='products/m.jpg',
+                category=category, stock_quantity=10,
+            )
+            for n in range(2)
+        ]
+        for product in self.products:
+            DatabaseCartStore(user=self.user).add(product.id, 1)
+        self.client.force_login(self.user)
+
+    def checkout(self):
+        response = self.client.post(reverse('orders:checkout'), self.details)
+        session = self.stripe.sessions.get(response.url.rpartition('/')[2])
+        return response, session
+
+    def test_checkout_redirects_to_stripe(self):
+        response, session = self.checkout()
+        self.assertRedirects(response, session['url'], fetch_redirect_response=False)
+        order = Order.objects.get()
+        self.assertEqual((order.full_name, order.city, order.status), ('Ivan Novak', 'Praha', 'pending'))
+        self.assertEqual(session['amount_total'], (50 + 100 + 250) * 100)
+        self.assertEqual(session['metadata'], {'order_id': str(order.id), 'user_id': str(self.user.id)})
+        self.assertEqual(session['expires_at'], int(order.stock_reserved_until.timestamp()))
+
+    def test_stripe_failure_removes_the_order(self):
+        self.stripe.fail_with = 500
+        response = self.client.post(reverse('orders:checkout'), self.details)
+        self.assertRedirects(response, reverse('orders:checkout'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(list(Product.objects.values_list('units_sold', 'stock_quantity')), [(0, 10), (0, 10)])
+
+    @override_settings(STRIPE_TIMEOUT=0.2, STRIPE_MAX_RETRIES=0)
+    def test_slow_stripe_times_out(self):
+        payments.reset()
+        self.addCleanup(payments.reset)
+        self.stripe.latency = 1
+        response = self.client.post(reverse('orders:checkout'), self.details)
+        self.assertRedirects(response, reverse('orders:checkout'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+    async def test_payment_confirmation_over_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('orders:checkout'), self.details)
+        session = self.stripe.sessions[response.url.rpartition('/')[2]]
+        order = await Order.objects.aget()
+        success = reverse('orders:payment_success', args=[order.id])
+
+        response = await self.async_client.get(success, {'session_id': session['id']})
+        self.assertRedirects(response, reverse('orders:checkout'), fetch_redirect_response=False)
+
+        self.stripe.pay(session['id'])
+        response = await self.async_client.get(success, {'session_id': session['id']})
+        self.assertRedirects(response, reverse('orders:order_detail', args=[order.id]), fetch_redirect_response=False)
+        await order.arefresh_from_db()
+        self.assertEqual((order.status, order.stock_state), ('confirmed', 'committed'))
+        self.assertFalse(await CartItem.objects.filter(user=self.user).aexists())
+
+    def test_session_of_another_order_is_refused(self):
+        response, session = self.checkout()
+        self.stripe.pay(session['id'])
+        other = place_order(self.user, [{'product': self.products[0], 'quantity': 1, 'total': 50}], 50, self.details)
+        self.client.get(reverse('orders:payment_success', args=[other.id]), {'session_id': session['id']})
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'pending')
+
+
+@skipUnless(payments.httpx, 'httpx is not installed')
+class HTTPXStripeCheckoutTests(StripeCheckoutTests):
+    """The same views on Stripe's native async client."""
+    httpx = payments.httpx
+
+    def test_each_request_loop_closes_its_client(self):
+        closed = []
+        close_async = stripe.HTTPXClient.close_async
+
+        async def tracked_close(http_client):
+            closed.append(http_client)
+            await close_async(http_client)
+
+        # Under WSGI every request runs the async view on a loop of its own
+        with mock.patch.object(stripe.HTTPXClient, 'close_async', tracked_close):
+            for _ in range(2):
+                response, session = self.checkout()
+                self.assertRedirects(response, session['url'], fetch_redirect_response=False)
+        self.assertEqual(len(closed), 2)
+        self.assertTrue(all(http_client._client_async.is_closed for http_client in closed))
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('olga', email='olga@example.com')
+        category = Category.objects.create(name='Vetiver')
+        self.product = Product.objects.create(
+            name='Vetiver', description='Green', price=700, image='products/v.jpg', category=category, stock_quantity=3,
+        )
+        items = [{'product': self.product, 'quantity': 1, 'total': 700}]
+        self.order = place_order(self.user, items, 700, PlaceOrderTests.details)
+
+    def event(self, event_id='evt_1', order_id=None, type='checkout.session.completed'):
+        return json.dumps({
+            'id': event_id,
+            'object': 'event',
+            'type': type,
+            'data': {'object': {
+                'id': 'cs_1', 'object': 'checkout.session', 'payment_intent': 'pi_1',
+                'metadata': {'order_id': str(order_id or self.order.id)},
+            }},
+        })
+
+    def deliver(self, payload, secret='whsec_test'):
+        timestamp = int(time.time())
+        signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('orders:stripe_webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}',
+        )
+
+    def test_webhook_only_enqueues(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.deliver(self.event())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'pending')
+        self.assertEqual(WebhookEvent.objects.get().status, 'pending')
+
+    def test_bad_signature_is_refused(self):
+        self.assertEqual(self.deliver(self.event(), secret='whsec_other').status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_redeliveries_are_fulfilled_once(self):
+        for _ in range(3):
+            self.deliver(self.event())
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(webhooks.process_all(), (1, 0, 0))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.stock_state), ('confirmed', 'committed'))
+        # Stripe retrying after processing changes nothing
+        self.deliver(self.event())
+        self.assertEqual(webhooks.process_all(), (0, 0, 0))
+        self.assertEqual(StockMovement.objects.filter(kind='commit').count(), 1)
+
+    def test_replay_does_not_undo_later_statuses(self):
+        self.deliver(self.event('evt_1'))
+        webhooks.process_all()
+        Order.objects.filter(pk=self.order.pk).update(status='shipped')
+        self.deliver(self.event('evt_2'))
+        webhooks.process_all()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'shipped')
+
+    def test_batches_share_one_order_lookup(self):
+        orders = [self.order] + [
+            place_order(self.user, [{'product': self.product, 'quantity': 1, 'total': 700}], 700, PlaceOrderTests.details)
+            for _ in range(2)
+        ]
+        self.deliver(self.event('evt_a', orders[0].id))
+        with CaptureQueriesContext(connection) as one:
+            webhooks.process_batch()
+        for n, order in enumerate(orders[1:]):
+            self.deliver(self.event(f'evt_{n}', order.id))
+        self.deliver(self.event('evt_other', type='charge.refunded'))
+        with CaptureQueriesContext(connection) as three:
+            self.assertEqual(webhooks.process_batch(), (3, 0, 0))
+        self.assertEqual(Order.objects.filter(status='confirmed').count(), 3)
+        # The order SELECT is shared; each event still saves its own order
+        self.assertLess(len(three), 3 * len(one))
+
+    def test_failures_back_off_and_give_up(self):
+        self.deliver(self.event())
+        with mock.patch('orders.webhooks.handle', side_effect=RuntimeError('db down')), \
+                self.assertLogs('orders.webhooks', 'ERROR'):
+            self.assertEqual(webhooks.process_batch(), (0, 1, 0))
+            event = WebhookEvent.objects.get()
+            self.assertEqual((event.status, event.attempts), ('pending', 1))
+            self.assertIn('db down', event.last_error)
+            # Not due again before the backoff has passed
+            self.assertEqual(webhooks.process_batch(), (0, 0, 0))
+            for attempt in range(2, webhooks.MAX_ATTEMPTS + 1):
+                webhooks.process_batch(now=timezone.now() + timedelta(days=1))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', webhooks.MAX_ATTEMPTS))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'pending')
+
+    def test_expired_lease_is_taken_over(self):
+        self.deliver(self.event())
+        stale = webhooks.claim()
+        self.assertEqual(len(stale), 1)
+        # A second worker sees nothing while the lease holds...
+        self.assertEqual(webhooks.claim(), [])
+        # ...and takes the event once it has run out
+        later = timezone.now() + webhooks.LEASE + timedelta(seconds=1)
+        self.assertEqual(webhooks.process_batch(now=later), (1, 0, 0))
+
+
+@override_settings(ADMIN_EMAIL='shop@example.com', DEFAULT_FROM_EMAIL='noreply@example.com')
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('petra', email='petra@example.com')
+        category = Category.objects.create(name='Citrus')
+        self.product = Product.objects.create(
+            name='Neroli', description='Bright', price=400, image='products/n.jpg', category=category, stock_quantity=5,
+        )
+
+    def order(self, email='petra@example.com'):
+        details = dict(PlaceOrderTests.details, email=email)
+        return place_order(self.user, [{'product': self.product, 'quantity': 1, 'total': 400}], 400, details)
+
+    def sink(self):
+        sink = SMTPSink().start()
+        self.addCleanup(sink.stop)
+        settings = override_settings(**sink.settings())
+        settings.enable()
+        self.addCleanup(settings.disable)
+        return sink
+
+    def test_checkout_queues_instead_of_sending(self):
+        order = self.order()
+        self.assertEqual(mail.outbox, [])
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual((queued.to, queued.status), (['shop@example.com'], 'pending'))
+        self.assertIn(order.order_number, queued.subject)
+
+    def test_rolled_back_orders_queue_nothing(self):
+        self.product.stock_quantity = 0
+        self.product.save()
+        with self.assertRaises(InsufficientStock):
+            self.order()
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_status_changes_email_the_customer(self):
+        order = self.order()
+        order.status = 'shipped'
+        order.tracking_number = 'CZ123'
+        order.save()
+        order.save()  # nothing changed, nothing sent
+        update = OutgoingEmail.objects.get(to=['petra@example.com'])
+        self.assertEqual((update.kind, update.order, update.body), ('order_status', order, ''))
+        outbox.deliver_all()
+        update.refresh_from_db()
+        self.assertIn('Shipped', update.body)
+        self.assertIn('CZ123', update.body)
+        self.assertIn('<html>', update.html_body)
+        self.assertEqual(mail.outbox[-1].body, update.body)
+
+    def test_batch_shares_one_smtp_connection(self):
+        sink = self.sink()
+        for n in range(5):
+            self.order(email=f'buyer{n}@example.com')
+        for order in Order.objects.all():
+            order.status = 'confirmed'
+            order.save()
+        self.assertEqual(outbox.deliver_all(), (10, 0, 0))
+        self.assertEqual(sink.connections, 1)
+        self.assertEqual(len(sink.messages), 10)
+        sender, recipients, message = sink.messages[-1]
+        self.assertEqual((sender, recipients), ('noreply@example.com', ['buyer4@example.com']))
+        self.assertTrue(message.is_multipart())
+        self.assertEqual(OutgoingEmail.objects.filter(status='sent').count(), 10)
+        self.assertEqual(outbox.deliver_all(), (0, 0, 0))
+
+    def test_refused_recipients_retry_then_dead_letter(self):
+        sink = self.sink()
+        sink.refuse.add('nobody@example.com')
+        outbox.enqueue('Hello', 'Body', ['nobody@example.com'])
+        outbox.enqueue('Hello', 'Body', ['petra@example.com'])
+        with self.assertLogs('orders.outbox', 'WARNING'):
+            self.assertEqual(outbox.deliver_batch(), (1, 1, 0))
+            self.assertEqual(outbox.deliver_batch(), (0, 0, 0))  # backing off
+            for _ in range(outbox.MAX_ATTEMPTS - 1):
+                outbox.deliver_batch(now=timezone.now() + timedelta(days=1))
+        refused = OutgoingEmail.objects.get(to=['nobody@example.com'])
+        self.assertEqual((refused.status, refused.attempts), ('dead', outbox.MAX_ATTEMPTS))
+        self.assertIn('nobody@example.com', refused.last_error)
+
+    def test_unreachable_server_keeps_the_batch(self):
+        self.order()
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=1, EMAIL_USE_TLS=False), \
+                self.assertLogs('orders.outbox', 'WARNING'):
+            self.assertEqual(outbox.deliver_batch(), (0, 1, 0))
+        self.assertEqual(OutgoingEmail.objects.get().status, 'pending')
+
+
+@override_settings(ADMIN_EMAIL='shop@example.com')
+class PaymentBenchmarkTests(TransactionTestCase):
+    def test_benchmark_leaves_no_mail_behind(self):
+        out = StringIO()
+        call_command('bench_payments', '--requests', '2', '--latency', '0', '--workers', '1', stdout=out, stderr=out)
+        self.assertNotIn('unexpected statuses', out.getvalue())
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('nadia', 'nadia@example.com', 'pw')
+        self.user = User.objects.create_user('jana', email='jana@example.com')
+        category = Category.objects.create(name='Woody')
+        self.cedar = Product.objects.create(
+            name='Cedar', description='Dry', price=350, image='products/c.jpg', category=category, stock_quantity=50,
+        )
+        self.orders = [
+            place_order(self.user, [{'product': self.cedar, 'quantity': 2, 'total': 700}], 700, PlaceOrderTests.details)
+            for _ in range(5)
+        ]
+        OutgoingEmail.objects.all().delete()
+
+    def stock_and_sales(self):
+        self.cedar.refresh_from_db()
+        return self.cedar.stock_quantity, self.cedar.units_sold
+
+    def test_queries_do_not_grow_with_the_selection(self):
+        with CaptureQueriesContext(connection) as few:
+            bulk_transition(Order.objects.filter(pk=self.orders[0].pk), 'processing')
+        with CaptureQueriesContext(connection) as many:
+            bulk_transition(Order.objects.filter(status='pending'), 'processing')
+        self.assertEqual(len(few), len(many))
+
+    def test_status_history_stock_and_emails(self):
+        # The admin request only writes rows, the worker renders the emails
+        with self.assertTemplateNotUsed('orders/order_status_update.txt'):
+            self.assertEqual(bulk_transition(Order.objects.all(), 'processing', user=self.admin), 5)
+        self.assertEqual(set(Order.objects.values_list('status', 'stock_state')), {('processing', 'committed')})
+        self.assertEqual(StockMovement.objects.filter(kind='commit').count(), 5)
+        self.assertEqual(self.stock_and_sales(), (40, 10))
+        history = OrderStatusChange.objects.filter(order=self.orders[0]).get()
+        self.assertEqual((history.old_status, history.new_status, history.changed_by), ('pending', 'processing', self.admin))
+        emails = OutgoingEmail.objects.all()
+        self.assertEqual(len(emails), 5)
+        self.assertEqual(emails[0].to, [PlaceOrderTests.details['email']])
+        self.assertEqual(outbox.deliver_all(), (5, 0, 0))
+        self.assertIn('Processing', mail.outbox[0].body)
+        # Already there: nothing happens
+        self.assertEqual(bulk_transition(Order.objects.all(), 'processing'), 0)
+        self.assertEqual(OutgoingEmail.objects.count(), 5)
+
+    def test_cancel_and_restore_match_single_saves(self):
+        bulk_transition(Order.objects.filter(pk=self.orders[0].pk), 'confirmed')
+        self.assertEqual(bulk_transition(Order.objects.all(), 'cancelled', chunk_size=2), 5)
+        # Four reservations released, the confirmed order's stock stays sold
+        self.assertEqual(self.stock_and_sales(), (48, 0))
+        self.assertEqual(StockMovement.objects.filter(kind='release').count(), 4)
+        bulk_transition(Order.objects.all(), 'delivered')
+        # Released orders take their stock again, the counters come back
+        self.assertEqual(self.stock_and_sales(), (40, 10))
+        self.assertEqual(set(Order.objects.values_list('stock_state', flat=True)), {'committed'})
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'mark_as_shipped', '_selected_action': [o.pk for o in self.orders[:3]],
+        }, follow=True)
+        self.assertContains(response, '3 orders marked as Shipped')
+        self.assertEqual(OrderStatusChange.objects.filter(new_status='shipped', changed_by=self.admin).count(), 3)
+
+    def test_single_saves_are_recorded_too(self):
+        order = self.orders[0]
+        order.status = 'confirmed'
+        order.save()
+        self.assertEqual(list(order.status_history.values_list('old_status', 'new_status')), [('pending', 'confirmed')])
+
+
+@override_settings(ORDER_NUMBER_BLOCK_SIZE=10)
+class OrderNumberTests(TestCase):
+    def setUp(self):
+        numbers.allocator.discard()
+        self.user = User.objects.create_user('olga')
+
+    def create(self):
+        return Order.objects.create(user=self.user, total_amount=100, **PlaceOrderTests.details)
+
+    def test_numbers_follow_the_daily_counter(self):
+        today = timezone.now().date()
+        first, second = self.create(), self.create()
+        self.assertEqual(first.order_number, f"GF{today:%Y%m%d}000001")
+        self.assertEqual(second.order_number, f"GF{today:%Y%m%d}000002")
+        self.assertEqual(OrderNumberCounter.objects.get(day=today).last, 10)
+
+    def test_one_counter_round_trip_per_block(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(25):
+                self.create()
+        counter_updates = [q for q in queries if q['sql'].startswith('UPDATE "orders_ordernumbercounter"')]
+        self.assertEqual(len(counter_updates), 3)
+
+    def test_reissued_block_moves_on(self):
+        taken = self.create()
+        # As if the transaction that took the block had rolled back
+        OrderNumberCounter.objects.all().delete()
+        numbers.allocator.discard()
+        order = self.create()
+        self.assertNotEqual(order.order_number, taken.order_number)
+        self.assertEqual(Order.objects.values('order_number').distinct().count(), 2)
+
+    def test_explicit_duplicates_are_rejected(self):
+        taken = self.create()
+        with self.assertRaises(IntegrityError):
+            Order.objects.create(user=self.user, total_amount=100, order_number=taken.order_number,
+                                 **PlaceOrderTests.details)
+
+
+class OrderNumberStressTests(TransactionTestCase):
+    threads = 8
+    per_thread = 15
+
+    def run_threads(self, target):
+        barrier = threading.Barrier(self.threads)
+        results = []
+        threads = [threading.Thread(target=target, args=(barrier, results)) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def retrying(self, func):
+        while True:
+            try:
+                return func()
+            except OperationalError:
+                # The shared in-memory test database refuses concurrent writers instead of waiting
+                continue
+
+    def test_workers_never_share_a_number(self):
+        def worker(barrier, results):
+            # One allocator per simulated process
+            allocator = numbers.Allocator(size=4)
+            barrier.wait()
+            try:
+                for _ in range(self.per_thread):
+                    results.append(self.retrying(allocator.next))
+            finally:
+                close_old_connections()
+
+        results = self.run_threads(worker)
+        self.assertEqual(len(results), self.threads * self.per_thread)
+        self.assertEqual(len(set(results)), len(results))
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=3)
+    def test_concurrent_orders_get_unique_numbers(self):
+        numbers.allocator.discard()
+        user = User.objects.create_user('rush')
+
+        def buyer(barrier, results):
+            barrier.wait()
+            try:
+                for _ in range(self.per_thread):
+                    order = self.retrying(lambda: Order.objects.create(
+                        user=user, total_amount=100, **PlaceOrderTests.details,
+                    ))
+                    results.append(order.order_number)
+            finally:
+                close_old_connections()
+
+        results = self.run_threads(buyer)
+        self.assertEqual(len(set(results)), self.threads * self.per_thread)
+        self.assertEqual(Order.objects.values('order_number').distinct().count(), self.threads * self.per_thread)
+
+
+@override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('lena', password='pw')
+        category = Category.objects.create(name='Oud')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Oud {n}', description='Deep', price=800, image='products/o.jpg', category=category)
+            for n in range(3)
+        ])
+        self.client.force_login(self.user)
+        # Fill the navigation cache so only the page's own queries are compared
+        self.client.get(reverse('orders:order_history'))
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_amount=2400, **PlaceOrderTests.details)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=2, price=800) for product in self.products
+            ])
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_queries_stay_flat_as_orders_grow(self):
+        url = reverse('orders:order_history')
+        self.add_orders(2)
+        few, _ = self.queries(url)
+        few_summary, _ = self.queries(url + '?view=summary')
+        self.add_orders(30)
+        many, response = self.queries(url)
+        many_summary, _ = self.queries(url + '?view=summary')
+        self.assertEqual((few, few_summary), (many, many_summary))
+        self.assertEqual(len(response.context['orders']), 10)
+        self.assertContains(response, 'Oud 2')
+
+    def test_pages_follow_the_cursor(self):
+        self.add_orders(12)
+        first = self.client.get(reverse('orders:order_history'), {'view': 'summary'})
+        self.assertContains(first, '6 items')
+        self.assertNotContains(first, 'Oud 1')
+        second = self.client.get(reverse('orders:order_history'),
+                                 {'view': 'summary', 'cursor': first.context['page'].next_cursor})
+        seen = [o.pk for o in first.context['orders']] + [o.pk for o in second.context['orders']]
+        self.assertEqual(seen, list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True)))
+        self.assertFalse(second.context['page'].has_next)
+
+    def test_detail_loads_lines_in_one_query(self):
+        self.add_orders(1)
+        order = Order.objects.get()
+        few, _ = self.queries(reverse('orders:order_detail', args=[order.pk]))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=800) for product in self.products
+        ])
+        many, response = self.queries(reverse('orders:order_detail', args=[order.pk]))
+        self.assertEqual(few, many)
+        self.assertContains(response, 'Oud 0')
+
+
+@override_settings(ADMIN_EMAIL='shop@example.com')
+class JourneyBenchmarkTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Amber')
+        self.product = Product.objects.create(
+            name='Amber 1', description='Warm', price=900, image='products/a.jpg', category=category,
+            stock_quantity=20,
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = Path(directory.name) / 'journeys.json'
+
+    def bench(self, *args):
+        # One at a time: the shared in-memory test database refuses concurrent writers
+        call_command('bench_journeys', '--shoppers', '4', '--concurrency', '1', '--output', str(self.output),
+                     *args, stdout=StringIO(), stderr=StringIO())
+        return json.loads(self.output.read_text())
+
+    def test_journeys_run_through_both_applications(self):
+        emails = OutgoingEmail.objects.count()
+        result = self.bench()
+        self.assertEqual(set(result['servers']), {'wsgi', 'asgi'})
+        for run in result['servers'].values():
+            self.assertEqual(run['errors'], 0)
+            self.assertEqual(run['urls']['POST orders:checkout']['requests'], 2)
+            self.assertEqual(run['urls']['GET home']['requests'], 4)
+            self.assertLessEqual(run['p50_ms'], run['p95_ms'])
+            self.assertLessEqual(run['p95_ms'], run['p99_ms'])
+        # The shoppers and their orders are gone and the reserved stock is back
+        self.assertFalse(User.objects.filter(username__startswith='journey-bench-').exists())
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(OutgoingEmail.objects.count(), emails)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 20)
+
+    def test_compare_fails_on_a_slower_p95(self):
+        result = self.bench('--servers', 'wsgi')
+        self.assertFalse(any(row[-1] for row in loadtest.compare(result, result, threshold=20)))
+        faster = json.loads(json.dumps(result))
+        faster['servers']['wsgi']['urls']['GET home']['p95_ms'] /= 1000
+        rows = loadtest.compare(faster, result, threshold=20)
+        self.assertEqual([row[:3] for row in rows if row[-1]], [('wsgi', 'GET home', 'p95_ms')])
+        previous = self.output.with_name('previous.json')
+        previous.write_text(json.dumps(faster))
+        with self.assertRaisesMessage(CommandError, 'regressions beyond 20%'):
+            self.bench('--servers', 'wsgi', '--compare', str(previous))
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([loadtest.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(loadtest.percentile([7], 99), 7)
+
+
+def _paid_session(test, shop):
+    session = test.stripe.create_session({'metadata': {'order_id': str(shop.order.pk)}})
+    shop.session_id = test.stripe.pay(session['id'])['id']
+
+
+def _webhook_payload(shop):
+    return json.dumps({
+        'id': 'evt_budget', 'object': 'event', 'type': 'checkout.session.completed',
+        'data': {'object': {'id': 'cs_budget', 'object': 'checkout.session', 'metadata': {'order_id': str(shop.order.pk)}}},
+    })
+
+
+def _webhook_signature(shop):
+    timestamp = int(time.time())
+    signed = f'{timestamp}.{_webhook_payload(shop)}'.encode()
+    signature = hmac.new(b'whsec_budget', signed, hashlib.sha256).hexdigest()
+    return {'Stripe-Signature': f't={timestamp},v1={signature}'}
+
+
+@override_settings(CACHE_VERSION_CHECK_INTERVAL=0, STRIPE_WEBHOOK_SECRET='whsec_budget')
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = urls
+    views = {
+        'cart': View(9, scales=True),
+        'add_to_cart': View(8, 'post', args=lambda shop: [shop.products[9].pk], data={'quantity': 1}, json=True),
+        'update_cart': View(4, 'post', args=lambda shop: [shop.products[5].pk], data={'quantity': 3}, json=True),
+        'remove_from_cart': View(4, 'post', args=lambda shop: [shop.products[5].pk]),
+        'clear_cart': View(3, 'post'),
+        'checkout': View(11, scales=True),
+        'order_history': View(10, scales=True),
+        'order_detail': View(10, args=lambda shop: [shop.order.pk], scales=True),
+        'payment_success': View(16, args=lambda shop: [shop.order.pk], prepare=_paid_session,
+                                data=lambda shop: {'session_id': shop.session_id}),
+        'payment_cancel': View(18, args=lambda shop: [shop.order.pk]),
+        'stripe_webhook': View(1, 'post', login=None, data=_webhook_payload, headers=_webhook_signature,
+                               json=True, status=(200,)),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = FakeStripeServer().start()
+        cls.addClassCleanup(cls.stripe.stop)
+        settings = override_settings(STRIPE_API_BASE=cls.stripe.url, STRIPE_SECRET_KEY='sk_test_local', STRIPE_TIMEOUT=2)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        cls.addClassCleanup(payments.reset)
+        payments.reset()
@@ -0,0 +1,73 @@
+# orders/transitions.py
+"""
+Bulk order status changes.
+
+Saving orders one by one costs a handful of queries per order (the
+pre_save read, the UPDATE, the sales, stock and email signals).
+`bulk_transition` does the same work per chunk of CHUNK_SIZE orders
+instead: one conditional UPDATE per previous status, one UPDATE for
+`units_sold`, one for stock, and multi-row INSERTs for the status
+history, the stock ledger and the customer emails. The emails are queued
+unrendered; deliver_emails renders their templates.
+
+The UPDATE is conditional on the status read at the start of the chunk,
+so an order another request moved in the meantime (a payment confirmed
+by the webhook, say) is left alone and not counted.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from products.sales import apply_sales_change
+from . import outbox
+from .inventory import combined, commit_orders, orders_quantities, release_orders
+from .models import Order, OrderStatusChange
+
+CHUNK_SIZE = 500
+
+
+def bulk_transition(queryset, new_status, user=None, notify=True, chunk_size=CHUNK_SIZE):
+    """Move the orders of `queryset` to `new_status`. Returns how many changed."""
+    order_ids = list(queryset.exclude(status=new_status).order_by('pk').values_list('pk', flat=True))
+    changed = 0
+    for start in range(0, len(order_ids), chunk_size):
+        changed += _transition_chunk(order_ids[start:start + chunk_size], new_status, user, notify)
+    return changed
+
+
+def _transition_chunk(order_ids, new_status, user, notify):
+    now = timezone.now()
+    with transaction.atomic():
+        previous = dict(
+            Order.objects.filter(pk__in=order_ids).exclude(status=new_status).values_list('pk', 'status')
+        )
+        by_status = defaultdict(list)
+        for order_id, status in previous.items():
+            by_status[status].append(order_id)
+        for status, ids in by_status.items():
+            Order.objects.filter(pk__in=ids, status=status).update(status=new_status, updated_at=now)
+        orders = list(Order.objects.filter(pk__in=list(previous), status=new_status, updated_at=now).order_by('pk'))
+        if not orders:
+            return 0
+
+        changed = [order.pk for order in orders]
+        lines = orders_quantities(changed)
+        # What the post_save signals do for a single save
+        if new_status == 'cancelled':
+            apply_sales_change(combined(lines), sign=-1)
+            release_orders(changed, lines)
+        else:
+            restored = {order_id: lines[order_id] for order_id in changed
+                        if previous[order_id] == 'cancelled' and order_id in lines}
+            apply_sales_change(combined(restored))
+            if new_status != 'pending':
+                commit_orders(changed, lines)
+
+        OrderStatusChange.objects.bulk_create([
+            OrderStatusChange(order=order, old_status=previous[order.pk], new_status=new_status, changed_by=user)
+            for order in orders
+        ], batch_size=500)
+        if notify:
+            outbox.enqueue_many(order.status_email(previous[order.pk]) for order in orders)
+    return len(orders)
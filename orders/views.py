@@ -1,42 +1,28 @@
 # orders/views.py
 import stripe
 import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponse
 from django.contrib import messages
 from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.db.models import Prefetch, Sum
+from django.db.models.functions import Coalesce
 
 from products.models import Product
+from products.pagination import paginate
+from . import payments, webhooks
+from .cart import cart_changed, get_cart_data, get_cart_store
+from .checkout import order_totals, place_order
+from .inventory import InsufficientStock
 from .models import Order, OrderItem
 
+ORDER_HISTORY_PAGE_SIZE = 10
 
 
-def get_cart_data(request):
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total = 0
-    cart_count = 0
-    
-    for product_id, item_data in cart.items():
-        try:
-            product = Product.objects.get(id=product_id)
-            quantity = item_data['quantity']
-            item_total = product.price * quantity
-            
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total
-            })
-            
-            total += item_total
-            cart_count += quantity
-        except Product.DoesNotExist:
-            continue
-    
-    return cart_items, total, cart_count
-
 def cart_view(request):
     cart_items, total, cart_count = get_cart_data(request)
     
@@ -52,30 +38,21 @@ def add_to_cart(request, product_id):
         try:
             product = get_object_or_404(Product, id=product_id)
             data = json.loads(request.body)
-            quantity = int(data.get('quantity', 1))
-            
-            if 'cart' not in request.session:
-                request.session['cart'] = {}
+            try:
+                quantity = int(data.get('quantity', 1))
+            except (TypeError, ValueError):
+                quantity = 0
+            if quantity < 1:
+                return JsonResponse({'success': False, 'message': 'Quantity must be at least 1'})
             
-            cart = request.session['cart']
-            product_key = str(product_id)
-            
-            if product_key in cart:
-                cart[product_key]['quantity'] += quantity
-            else:
-                cart[product_key] = {
-                    'quantity': quantity,
-                    'name': product.name,
-                    'price': str(product.price)
-                }
-            
-            request.session.modified = True
-            cart_count = sum(item['quantity'] for item in cart.values())
+            store = get_cart_store(request)
+            store.add(product.id, quantity)
+            cart_changed(request)
             
             return JsonResponse({
                 'success': True, 
                 'message': f'{product.name} added to cart',
-                'cart_count': cart_count
+                'cart_count': store.count()
             })
             
         except Exception as e:
@@ -88,88 +65,62 @@ def update_cart(request, product_id):
         data = json.loads(request.body)
         quantity = int(data.get('quantity', 1))
         
-        cart = request.session.get('cart', {})
-        if str(product_id) in cart:
-            if quantity <= 0:
-                del cart[str(product_id)]
-            else:
-                cart[str(product_id)]['quantity'] = quantity
-            
-            request.session.modified = True
-            cart_count = sum(item['quantity'] for item in cart.values())
-            
-            return JsonResponse({'success': True, 'cart_count': cart_count})
+        store = get_cart_store(request)
+        if store.set(product_id, quantity):
+            cart_changed(request)
+            return JsonResponse({'success': True, 'cart_count': store.count()})
         
         return JsonResponse({'success': False, 'message': 'Product not in cart'})
 
 def remove_from_cart(request, product_id):
     if request.method == 'POST':
-        cart = request.session.get('cart', {})
-        if str(product_id) in cart:
-            del cart[str(product_id)]
-            request.session.modified = True
-            cart_count = sum(item['quantity'] for item in cart.values())
-            return JsonResponse({'success': True, 'cart_count': cart_count})
+        store = get_cart_store(request)
+        if store.remove(product_id):
+            cart_changed(request)
+            return JsonResponse({'success': True, 'cart_count': store.count()})
         
         return JsonResponse({'success': False, 'message': 'Product not in cart'})
 
 def clear_cart(request):
     if request.method == 'POST':
-        request.session['cart'] = {}
-        request.session.modified = True
+        get_cart_store(request).clear()
+        cart_changed(request)
         return JsonResponse({'success': True, 'cart_count': 0})
 
 @login_required
-def checkout_view(request):
-    cart_items, total, cart_count = get_cart_data(request)
+async def checkout_view(request):
+    # Async so the Stripe round trip does not hold a worker under ASGI;
+    # ORM work runs through the async ORM or sync_to_async
+    user = await request.auser()
+    cart_items, total, cart_count = await sync_to_async(get_cart_data)(request)
     
     if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('orders:cart')
     
-    # Updated for CZK - typical Czech shipping cost
-    shipping_cost = 250  # 250 CZK instead of 10.00 EUR/USD
-    tax_amount = 0  # Czech Republic has VAT, but we'll keep it simple for now
-    final_total = total  + shipping_cost + tax_amount
+    shipping_cost, tax_amount, final_total = order_totals(total)
     
     # Get user profile for pre-filling
     from accounts.models import UserProfile
-    try:
-        profile = UserProfile.objects.get(user=request.user)
-    except UserProfile.DoesNotExist:
-        profile = None
+    profile = await UserProfile.objects.filter(user=user).afirst()
     
     if request.method == 'POST':
-        # Create order first (with pending status)
-        order = Order.objects.create(
-            user=request.user,
-            full_name=request.POST.get('full_name'),
-            email=request.POST.get('email'),
-            address=request.POST.get('address'),
-            city=request.POST.get('city'),
-            postal_code=request.POST.get('postal_code'),
-            country=request.POST.get('country'),
-           
-            total_amount=total,
-            shipping_cost=shipping_cost,
-            tax_amount=tax_amount,
-            status='pending'  # Will be confirmed after payment
-        )
-        
-        # Create order items
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                quantity=item['quantity'],
-                price=item['product'].price
-            )
+        # Order, lines and sales counters in one transaction (pending until paid)
+        try:
+            order = await sync_to_async(place_order)(user, cart_items, total, {
+                field: request.POST.get(field)
+                for field in ('full_name', 'email', 'address', 'city', 'postal_code', 'country')
+            })
+        except InsufficientStock as e:
+            names = ', '.join(product.name for product in e.products) or 'some items'
+            messages.error(request, f'Sorry, there is not enough stock left for {names}. Please update your cart.')
+            return redirect('orders:cart')
         
         # Create Stripe Checkout Session with CZK
         try:
-            checkout_session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                line_items=[
+            checkout_session = await payments.create_checkout_session({
+                'payment_method_types': ['card'],
+                'line_items': [
                     {
                         'price_data': {
                             'currency': 'czk',  # Changed from 'usd' to 'czk'
@@ -181,31 +132,28 @@ def checkout_view(request):
                         'quantity': 1,
                     },
                 ],
-                mode='payment',
-                success_url=request.build_absolute_uri(
+                'mode': 'payment',
+                'success_url': request.build_absolute_uri(
                     f'/orders/payment-success/{order.id}/?session_id={{CHECKOUT_SESSION_ID}}'
                 ),
-                cancel_url=request.build_absolute_uri(
+                'cancel_url': request.build_absolute_uri(
                     f'/orders/payment-cancel/{order.id}/'
                 ),
-                customer_email=request.user.email,
-                metadata={
+                'customer_email': user.email,
+                # The session cannot be paid once the stock reservation lapses
+                'expires_at': int(order.stock_reserved_until.timestamp()),
+                'metadata': {
                     'order_id': order.id,
-                    'user_id': request.user.id
+                    'user_id': user.id
                 }
-            )
-            
-            # Store Stripe session ID in order (you might want to add this field to your Order model)
-            # If you don't have stripe_session_id field, add it to Order model or remove this line
-            order.stripe_session_id = checkout_session.id
-            order.save()
+            })
             
             # Redirect to Stripe Checkout
             return redirect(checkout_session.url)
             
         except Exception as e:
             messages.error(request, f'Payment error: {str(e)}')
-            order.delete()  # Delete the order if payment fails
+            await order.adelete()  # Delete the order if payment fails
             return redirect('orders:checkout')
     
     context = {
@@ -218,31 +166,38 @@ def checkout_view(request):
         'profile': profile,
         
     }
-    return render(request, 'orders/checkout.html', context)
+    # Context processors query the database, so render off the event loop
+    return await sync_to_async(render)(request, 'orders/checkout.html', context)
+
+
+def _clear_cart(request):
+    get_cart_store(request).clear()
+    cart_changed(request)
+
 
 @login_required
-def payment_success(request, order_id):
+async def payment_success(request, order_id):
     session_id = request.GET.get('session_id')
     
     if not session_id:
         messages.error(request, 'Invalid payment session.')
         return redirect('orders:order_history')
     
+    user = await request.auser()
     try:
+        order = await Order.objects.aget(id=order_id, user=user)
         # Retrieve the Stripe session
-        session = stripe.checkout.Session.retrieve(session_id)
-        order = Order.objects.get(id=order_id, user=request.user)
+        session = await payments.retrieve_checkout_session(session_id)
         
-        # Verify the payment was successful
-        if session.payment_status == 'paid':
+        # Verify the payment was successful, and was for this order
+        if session.payment_status == 'paid' and str((session.metadata or {}).get('order_id')) == str(order.id):
             # Update order status
             order.status = 'confirmed'
             order.stripe_payment_intent = session.payment_intent
-            order.save()
+            await order.asave()
             
             # Clear the cart
-            request.session['cart'] = {}
-            request.session.modified = True
+            await sync_to_async(_clear_cart)(request)
             
             messages.success(request, f'Payment successful! Order #{order.order_number} has been confirmed.')
         else:
@@ -262,8 +217,10 @@ def payment_success(request, order_id):
 def payment_cancel(request, order_id):
     try:
         order = Order.objects.get(id=order_id, user=request.user)
-        order.status = 'cancelled'
-        order.save()
+        # Only an unpaid order gives its reserved stock back
+        if order.status == 'pending':
+            order.status = 'cancelled'
+            order.save()
         messages.info(request, 'Payment was cancelled. You can try again anytime.')
     except Order.DoesNotExist:
         messages.error(request, 'Order not found.')
@@ -271,48 +228,53 @@ def payment_cancel(request, order_id):
     return redirect('orders:checkout')
 
 # Add Stripe webhook handler for additional security
+@csrf_exempt
+@require_POST
 def stripe_webhook(request):
     payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
-    event = None
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header
+        stripe.Webhook.construct_event(
+            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET or ''
         )
     except ValueError as e:
         # Invalid payload
         return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError as e:
+    except stripe.SignatureVerificationError as e:
         # Invalid signature
         return HttpResponse(status=400)
 
-    # Handle the checkout.session.completed event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        
-        # Fulfill the purchase
-        fulfill_order(session)
-
+    # Only store it: process_webhooks fulfils orders outside Stripe's timeout
+    webhooks.enqueue(payload)
     return HttpResponse(status=200)
 
 def fulfill_order(session):
-    order_id = session.metadata.get('order_id')
-    try:
-        order = Order.objects.get(id=order_id)
-        order.status = 'confirmed'
-        order.stripe_payment_intent = session.payment_intent
-        order.save()
-    except Order.DoesNotExist:
-        # Handle the error as appropriate for your application
-        pass
+    webhooks.fulfill_checkout_session(session)
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'orders/order_history.html', {'orders': orders})
+    # Keyset pages over the (user, -created_at) index: the 50th page costs what the first does
+    summary = request.GET.get('view') == 'summary'
+    orders = Order.objects.filter(user=request.user)
+    if summary:
+        # Counts and totals from one aggregate, no order lines loaded
+        orders = orders.annotate(item_count=Coalesce(Sum('items__quantity'), 0))
+    else:
+        orders = orders.prefetch_related(Prefetch(
+            'items', queryset=OrderItem.objects.select_related('product').only('order_id', 'product__name'),
+        ))
+    page = paginate(orders, 'newest', request.GET.get('cursor'), page_size=ORDER_HISTORY_PAGE_SIZE)
+    return render(request, 'orders/order_history.html', {
+        'orders': page.items,
+        'page': page,
+        'summary': summary,
+    })
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(
+        Order.objects.prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('product'))),
+        id=order_id, user=request.user,
+    )
     return render(request, 'orders/order_detail.html', {'order': order})
\ No newline at end of file
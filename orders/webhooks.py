@@ -0,0 +1,121 @@
+# orders/webhooks.py
+"""
+Stripe webhook inbox.
+
+The webhook view only verifies the signature and stores the event
+(`enqueue`), keyed by its id, so Stripe gets its 200 straight away and
+redeliveries of the same event are dropped by the unique index. The
+process_webhooks command works through the inbox in batches
+(`process_batch`).
+
+Batches are leased to one worker at a time (see orders/queues.py). Each
+event is handled in its own transaction together with marking it done. A handler that raises is retried with exponential backoff and
+given up on ('failed') after MAX_ATTEMPTS.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import queues
+from .models import Order, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+
+class LeaseLost(Exception):
+    """The event was leased to another worker while this one handled it."""
+
+
+def enqueue(payload):
+    """Store a verified event (the raw JSON body); a redelivered id is ignored."""
+    event = json.loads(payload)
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(event_id=event['id'], type=event.get('type', ''), payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def backoff(attempts):
+    return queues.backoff(attempts, BACKOFF_BASE, BACKOFF_MAX)
+
+
+def fulfill_checkout_session(session, orders=None):
+    """Confirm the order a paid checkout session belongs to. Safe to run twice."""
+    order_id = str((session.get('metadata') or {}).get('order_id') or '')
+    order = None
+    if order_id.isdigit():
+        order = (orders or {}).get(int(order_id)) or Order.objects.filter(pk=order_id).first()
+    if order is None:
+        logger.warning('Checkout session %s refers to no order', session.get('id'))
+        return
+    # Orders already past payment keep their status on a replay
+    if order.status in ('pending', 'cancelled'):
+        order.status = 'confirmed'
+        order.stripe_payment_intent = session.get('payment_intent')
+        order.save()
+
+
+def _order_ids(events):
+    ids = []
+    for event in events:
+        if event.type == 'checkout.session.completed':
+            order_id = str((event.payload['data']['object'].get('metadata') or {}).get('order_id') or '')
+            if order_id.isdigit():
+                ids.append(int(order_id))
+    return ids
+
+
+def handle(event, orders=None):
+    if event.type == 'checkout.session.completed':
+        fulfill_checkout_session(event.payload['data']['object'], orders)
+    # Other event types are acknowledged and ignored
+
+
+def claim(batch_size=BATCH_SIZE, now=None):
+    """Lease up to `batch_size` due events to this worker and return them."""
+    return queues.claim(WebhookEvent.objects.all(), batch_size, LEASE, now)
+
+
+def process_batch(batch_size=BATCH_SIZE, now=None):
+    """Handle one batch of due events. Returns (done, retried, failed)."""
+    events = claim(batch_size, now)
+    # One query for every order the batch touches
+    orders = Order.objects.in_bulk(_order_ids(events))
+    done = retried = failed = 0
+    for event in events:
+        attempts = event.attempts + 1
+        try:
+            with transaction.atomic():
+                handle(event, orders)
+                if not queues.finish(event, attempts, status='done', processed_at=timezone.now()):
+                    # Roll the handler back, the new lease holder runs it
+                    raise LeaseLost
+            done += 1
+        except LeaseLost:
+            logger.warning('Lost the lease on webhook event %s', event.event_id)
+        except Exception as error:
+            logger.exception('Webhook event %s failed (attempt %s)', event.event_id, attempts)
+            if queues.reschedule(event, attempts, error, MAX_ATTEMPTS, BACKOFF_BASE, BACKOFF_MAX):
+                failed += 1
+            else:
+                retried += 1
+    return done, retried, failed
+
+
+def process_all(batch_size=BATCH_SIZE):
+    """Process batches until nothing is due. Returns the (done, retried, failed) totals."""
+    totals = [0, 0, 0]
+    while True:
+        counts = process_batch(batch_size)
+        if not any(counts):
+            return tuple(totals)
+        totals = [total + count for total, count in zip(totals, counts)]
@@ -18,7 +18,10 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'is_featured', 'is_new', 'stock_quantity']
     list_filter = ['category', 'collection', 'is_featured', 'is_new', 'created_at']
     search_fields = ['name', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = [
+        'created_at', 'updated_at', 'rating_count', 'rating_sum', 'rating_average',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    ]
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description', 'image')
@@ -32,6 +35,13 @@ class ProductAdmin(admin.ModelAdmin):
         ('Inventory', {
             'fields': ('stock_quantity', 'is_featured', 'is_new')
         }),
+        ('Ratings', {
+            'fields': (
+                ('rating_count', 'rating_sum', 'rating_average'),
+                ('rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count'),
+            ),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at')
         }),
@@ -0,0 +1,175 @@
+# products/assets.py
+"""
+Content-hashed CSS/JS bundles for the storefront templates.
+
+Sources live under static/ (css/site.css for the rules every page shares,
+css/pages/ and js/pages/ for the rest). A bundle is minified, hashed and
+compressed once per process and served from /assets/<name>.<hash>.<ext>
+with immutable cache headers, so browsers fetch each bundle once per
+deploy instead of receiving it inside every HTML response.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+ASSET_URL = '/assets/'
+CONTENT_TYPES = {
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_lock = threading.Lock()
+_bundles = {}
+
+_STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+
+
+def minify_css(css):
+    strings = []
+
+    def keep(match):
+        strings.append(match.group(0))
+        return f'\0{len(strings) - 1}\0'
+
+    css = _STRING_RE.sub(keep, css)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda m: strings[int(m.group(1))], css)
+
+
+def _ends_in_template(line, inside):
+    """Whether `line` ends inside a backtick string, given whether it starts in one."""
+    quote = '`' if inside else None
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif line.startswith('//', i):
+            break
+        i += 1
+    # Single and double quoted strings end with the line, template literals do not
+    return quote == '`'
+
+
+def minify_js(js):
+    # Deliberately conservative: no renaming, no joining of lines (ASI).
+    # Lines inside a template literal are part of the string and kept as is.
+    kept = []
+    inside = False
+    for line in js.splitlines():
+        ends_inside = _ends_in_template(line, inside)
+        if not inside:
+            line = line.lstrip()
+        if not ends_inside:
+            line = line.rstrip()
+        if inside or ends_inside or (line and not line.startswith('//')):
+            kept.append(line)
+        inside = ends_inside
+    return '\n'.join(kept)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+class Bundle:
+    def __init__(self, name, content):
+        self.name = name
+        self.ext = os.path.splitext(name)[1]
+        self.content = content
+        self.digest = hashlib.sha256(content).hexdigest()[:12]
+        self.gzip = gzip.compress(content, compresslevel=9, mtime=0)
+        self.brotli = brotli.compress(content, quality=11) if brotli else None
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.ext]
+
+    @property
+    def hashed_name(self):
+        return f'{self.name[:-len(self.ext)]}.{self.digest}{self.ext}'
+
+    @property
+    def url(self):
+        return ASSET_URL + self.hashed_name
+
+    def encoded(self, accept_encoding):
+        """(body, content-encoding) for the best encoding the client accepts."""
+        accepted = {part.split(';')[0].strip() for part in accept_encoding.split(',')}
+        if self.brotli is not None and 'br' in accepted:
+            return self.brotli, 'br'
+        if 'gzip' in accepted:
+            return self.gzip, 'gzip'
+        return self.content, None
+
+
+def _source_path(name):
+    ext = os.path.splitext(name)[1]
+    if ext not in MINIFIERS:
+        raise ValueError(f'Unsupported asset type {name!r}')
+    path = finders.find(name)
+    if path is None:
+        raise ValueError(f'Asset {name!r} not found in the static directories')
+    return path
+
+
+def get_bundle(name):
+    """The built bundle for the static source `name`, rebuilt when the file changes under DEBUG."""
+    with _lock:
+        cached = _bundles.get(name)
+        if cached is not None and not settings.DEBUG:
+            return cached[1]
+        path = _source_path(name)
+        mtime = os.stat(path).st_mtime_ns
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding='utf-8') as source:
+                content = MINIFIERS[os.path.splitext(name)[1]](source.read())
+            cached = (mtime, Bundle(name, content.encode()))
+            _bundles[name] = cached
+        return cached[1]
+
+
+def parse_hashed_name(hashed_name):
+    """Split `css/site.<hash>.css` into ('css/site.css', '<hash>'), or None."""
+    stem, ext = os.path.splitext(hashed_name)
+    name, _, digest = stem.rpartition('.')
+    if not name or ext not in MINIFIERS:
+        return None
+    return name + ext, digest
+
+
+def find_by_hashed_name(hashed_name):
+    """(bundle, current) for a hashed URL path; current is False for an older hash."""
+    parsed = parse_hashed_name(hashed_name)
+    if parsed is None:
+        return None, False
+    name, digest = parsed
+    try:
+        bundle = get_bundle(name)
+    except ValueError:
+        return None, False
+    return bundle, bundle.digest == digest
+
+
+def reset():
+    with _lock:
+        _bundles.clear()
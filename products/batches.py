@@ -0,0 +1,23 @@
+# products/batches.py
+"""Splitting long row sets into batches for bulk writes and set-based UPDATEs."""
+import itertools
+
+
+def batched(iterable, size):
+    """Lists of up to `size` items of `iterable`."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def pk_batches(queryset, batch_size):
+    """The primary keys of `queryset` in lists of `batch_size`."""
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for pk in ids.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
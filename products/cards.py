@@ -0,0 +1,83 @@
+# products/cards.py
+"""
+Fragment cache for rendered product cards.
+
+A card only depends on its product, so the rendered HTML is cached under
+the product id, `updated_at` and the rating aggregate version. Saving a
+product or changing its reviews yields a new key; old entries simply age
+out. Listing pages fetch every card of the page with one get_many and
+render only the misses.
+"""
+import threading
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'products/product_card.html'
+# Bump when product_card.html changes so shared caches drop the old markup
+CARD_VERSION = 2
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+STATS_KEY = 'product-card-stats:{}'
+
+_lock = threading.Lock()
+_process_stats = {'hits': 0, 'misses': 0}
+
+
+def card_key(product):
+    return f'product-card:v{CARD_VERSION}:{product.pk}:{product.updated_at.timestamp()}:{product.rating_version}'
+
+
+def _record(hits, misses):
+    with _lock:
+        _process_stats['hits'] += hits
+        _process_stats['misses'] += misses
+    for name, delta in (('hits', hits), ('misses', misses)):
+        if delta:
+            key = STATS_KEY.format(name)
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                # Evicted between add and incr, lose this sample
+                pass
+
+
+def render_cards(products):
+    """Rendered card HTML for each product, in order."""
+    products = list(products)
+    keys = [card_key(product) for product in products]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    cards = []
+    for key, product in zip(keys, products):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {'product': product})
+            missing[key] = html
+        cards.append(mark_safe(html))
+
+    if missing:
+        cache.set_many(missing, timeout=CARD_CACHE_TIMEOUT)
+    _record(len(products) - len(missing), len(missing))
+    return cards
+
+
+def _with_rate(stats):
+    total = stats['hits'] + stats['misses']
+    return dict(stats, hit_rate=round(stats['hits'] / total, 4) if total else None)
+
+
+def stats():
+    """Hit/miss counters of this process and of the (possibly shared) cache backend."""
+    with _lock:
+        process = dict(_process_stats)
+    shared = {name: cache.get(STATS_KEY.format(name)) or 0 for name in ('hits', 'misses')}
+    return {'process': _with_rate(process), 'cache': _with_rate(shared)}
+
+
+def reset_stats():
+    with _lock:
+        _process_stats.update(hits=0, misses=0)
+    cache.delete_many([STATS_KEY.format(name) for name in ('hits', 'misses')])
@@ -1,20 +1,32 @@
-from .models import Category, Collection
+from .navigation import get_categories, get_collections
+
+
+def cart_count(request):
+    """Items in the cart, from the resolved cart when the view built one (orders.cart)."""
+    cart_data = getattr(request, '_cart_data', None)
+    if cart_data is not None:
+        return cart_data[2]
+    if not hasattr(request, '_cart_count'):
+        from orders.cart import get_cart_store
+        request._cart_count = get_cart_store(request).count()
+    return request._cart_count
+
+
+def wishlist_count(request):
+    """The user's wishlist size, counted at most once per request."""
+    if not hasattr(request, '_wishlist_count'):
+        count = 0
+        if request.user.is_authenticated:
+            from accounts.models import Wishlist
+            count = Wishlist.objects.filter(user=request.user).count()
+        request._wishlist_count = count
+    return request._wishlist_count
+
 
 def categories_collections(request):
-    cart_count = 0
-    wishlist_count = 0
-    
-    if 'cart' in request.session:
-        cart = request.session['cart']
-        cart_count = sum(item['quantity'] for item in cart.values())
-    
-    if request.user.is_authenticated:
-        from accounts.models import Wishlist
-        wishlist_count = Wishlist.objects.filter(user=request.user).count()
-    
     return {
-        'categories': Category.objects.all(),
-        'collections': Collection.objects.filter(is_active=True),
-        'cart_count': cart_count,
-        'wishlist_count': wishlist_count,
-    }
\ No newline at end of file
+        'categories': get_categories(),
+        'collections': get_collections(),
+        'cart_count': cart_count(request),
+        'wishlist_count': wishlist_count(request),
+    }
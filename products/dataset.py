@@ -0,0 +1,337 @@
+# products/dataset.py
+"""
+Deterministic synthetic shop data for scale testing (generate_dataset).
+
+Every section draws from its own random.Random seeded with the dataset
+seed and the section name, so the same options always produce the same
+rows. Rows are produced by generators and written with bulk_create in
+batches of `batch_size`, one transaction per batch, so memory stays flat
+however many rows are asked for; only the product prices and popularity
+weights are held for the whole run.
+
+Shapes that matter for the queries under test:
+
+* product popularity follows a Zipf curve, so a few products carry most
+  order lines (bestsellers, recommendations);
+* customers are Zipf-distributed too, so some have hundreds of orders
+  (order history) and most have a handful;
+* orders have 1-6 lines, mostly one or two, and cover `days` days with
+  order numbers continuing each day's OrderNumberCounter;
+* about one product in twelve is out of stock.
+
+bulk_create sends no signals, so the denormalized data is rebuilt at the
+end (ratings, units sold, search index, cache versions). Generated orders
+have no stock reservation (stock_state ''), like orders placed before
+reservations existed.
+"""
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Wishlist
+from orders.models import Order, OrderItem, OrderNumberCounter, Review, StockMovement
+from orders.numbers import format_number
+from . import facets, navigation, page_cache
+from .batches import batched
+from .models import Category, Collection, Product
+from .ratings import rebuild_rating_aggregates
+from .sales import rebuild_units_sold
+from .search import rebuild_index
+
+ADJECTIVES = [
+    'Amber', 'Velvet', 'Midnight', 'Golden', 'Wild', 'Silent', 'Royal', 'Smoked', 'Crystal', 'Desert',
+    'Ocean', 'Secret', 'Noble', 'Electric', 'Ivory', 'Crimson', 'Misty', 'Sacred', 'Urban', 'Sunlit',
+]
+NOTES = [
+    'Oud', 'Rose', 'Jasmine', 'Vetiver', 'Musk', 'Sandalwood', 'Iris', 'Neroli', 'Vanilla', 'Tobacco',
+    'Leather', 'Bergamot', 'Cedar', 'Patchouli', 'Tuberose', 'Saffron', 'Fig', 'Incense', 'Pepper', 'Lavender',
+]
+FORMS = ['Eau de Parfum', 'Eau de Toilette', 'Parfum', 'Extrait', 'Cologne']
+COMMENTS = [
+    'Lasts all day.', 'A little too sweet for me.', 'My signature scent now.', 'Lovely in the evening.',
+    'Smells expensive.', 'Fades after a few hours.', 'Got many compliments.', 'Not what I expected.',
+]
+
+ITEM_COUNTS = [1, 2, 3, 4, 5, 6]
+ITEM_COUNT_WEIGHTS = [50, 25, 12, 7, 4, 2]
+QUANTITIES = [1, 2, 3]
+QUANTITY_WEIGHTS = [85, 12, 3]
+STATUSES = ['delivered', 'shipped', 'processing', 'confirmed', 'pending', 'cancelled']
+STATUS_WEIGHTS = [62, 8, 4, 6, 8, 12]
+RATINGS = [1, 2, 3, 4, 5]
+RATING_WEIGHTS = [4, 6, 13, 33, 44]
+ZIPF_EXPONENT = 1.07
+CUSTOMER_ZIPF_EXPONENT = 0.8
+SHIPPING_COST = 250
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Cumulative weights for random.choices, rank 0 the most popular."""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values it is given."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Dataset:
+    def __init__(self, seed=1, categories=12, collections=8, products=1000, users=1000, orders=10000,
+                 reviews=5000, wishlists=5000, days=730, batch_size=5000, now=None, log=None):
+        self.seed = seed
+        self.counts = {
+            'categories': categories, 'collections': collections, 'products': products,
+            'users': users, 'orders': orders, 'reviews': reviews, 'wishlists': wishlists,
+        }
+        self.days = days
+        self.batch_size = batch_size
+        # UTC, so order numbers carry the same day as the allocator would give them
+        self.now = (now or timezone.now()).astimezone(dt_timezone.utc)
+        self.log = log or (lambda message: None)
+        self.prefix = f'ds{seed}'
+
+    def rng(self, section):
+        return random.Random(f'{self.seed}:{section}')
+
+    def _load(self, model, rows, label):
+        created = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+            if created % (self.batch_size * 20) < len(batch):
+                self.log(f'  {label}: {created}')
+        self.log(f'{label}: {created}')
+        return created
+
+    def validate(self):
+        """Raise ValueError for counts that cannot be generated, before anything is written."""
+        if self.counts['categories'] < 1:
+            raise ValueError('At least one category is needed.')
+        fit = self.counts['users'] * self.counts['products']
+        for section in ('reviews', 'wishlists'):
+            # Each user reviews and wishes for a product at most once
+            if fit and self.counts[section] > fit:
+                raise ValueError(f'At most {fit} {section} fit, one per user and product.')
+
+    def generate(self):
+        """Write the whole dataset; returns {section: rows created}."""
+        self.validate()
+        created = {}
+        with historical_timestamps(Product, Order, Review):
+            created['categories'], created['collections'] = self.catalog()
+            created['products'] = self.products()
+            created['users'] = self._load(User, self.user_rows(), 'users')
+            created['orders'], created['order_items'] = self.orders()
+            created['reviews'] = self._load(Review, self.review_rows(), 'reviews')
+            created['wishlists'] = self._load(Wishlist, self.wishlist_rows(), 'wishlists')
+        self.rebuild()
+        return created
+
+    def catalog(self):
+        rng = self.rng('catalog')
+        categories = Category.objects.bulk_create([
+            Category(name=f'{rng.choice(NOTES)} {self.prefix}-{n}', description='Generated category')
+            for n in range(self.counts['categories'])
+        ])
+        collections = Collection.objects.bulk_create([
+            Collection(name=f'{rng.choice(ADJECTIVES)} {self.prefix}-{n}', description='Generated collection',
+                       is_active=rng.random() < 0.8)
+            for n in range(self.counts['collections'])
+        ])
+        self.category_ids = [category.pk for category in categories]
+        self.collection_ids = [collection.pk for collection in collections]
+        self.log(f'categories: {len(categories)}, collections: {len(collections)}')
+        return len(categories), len(collections)
+
+    def _images(self):
+        try:
+            _, files = default_storage.listdir('products')
+        except OSError:
+            files = []
+        return [f'products/{name}' for name in sorted(files)] or ['products/placeholder.jpg']
+
+    def product_rows(self):
+        rng = self.rng('products')
+        images = self._images()
+        for n in range(self.counts['products']):
+            price = Decimal(max(150, round(rng.lognormvariate(7.4, 0.45), -1)))
+            created_at = self.now - timedelta(seconds=rng.random() * self.days * 86400)
+            yield Product(
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOTES)} {rng.choice(FORMS)} {n}',
+                description=f'Notes of {rng.choice(NOTES).lower()}, {rng.choice(NOTES).lower()} '
+                            f'and {rng.choice(NOTES).lower()}. Generated for scale testing.',
+                price=price,
+                original_price=price * Decimal('1.2') if rng.random() < 0.15 else None,
+                image=images[n % len(images)],
+                category_id=rng.choice(self.category_ids),
+                collection_id=rng.choice(self.collection_ids) if self.collection_ids and rng.random() < 0.4 else None,
+                is_new=rng.random() < 0.05,
+                is_featured=rng.random() < 0.02,
+                stock_quantity=0 if rng.random() < 0.08 else rng.randint(1, 120),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+
+    def products(self):
+        self.product_ids, self.prices = [], []
+        created = 0
+        for batch in batched(self.product_rows(), self.batch_size):
+            with transaction.atomic():
+                Product.objects.bulk_create(batch, batch_size=self.batch_size)
+                # The ledger starts with each product's opening stock
+                StockMovement.objects.bulk_create([
+                    StockMovement(product_id=product.pk, kind='adjust', quantity=product.stock_quantity)
+                    for product in batch if product.stock_quantity
+                ], batch_size=self.batch_size)
+            self.product_ids.extend(product.pk for product in batch)
+            self.prices.extend(product.price for product in batch)
+            created += len(batch)
+        # Popularity ranks are a shuffle of the products, not their age
+        self.popularity = list(range(len(self.product_ids)))
+        self.rng('popularity').shuffle(self.popularity)
+        self.product_weights = zipf_weights(len(self.product_ids))
+        self.log(f'products: {created}')
+        return created
+
+    def user_rows(self):
+        rng = self.rng('users')
+        password = make_password(None)  # unusable, and hashed once
+        for n in range(self.counts['users']):
+            joined = self.now - timedelta(seconds=rng.random() * self.days * 86400)
+            yield User(
+                username=f'{self.prefix}-user{n}', email=f'{self.prefix}-user{n}@example.com',
+                first_name=rng.choice(ADJECTIVES), password=password, date_joined=joined,
+            )
+
+    def _user_ids(self):
+        return list(User.objects.filter(username__startswith=f'{self.prefix}-user')
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def _number_counters(self):
+        return dict(OrderNumberCounter.objects.values_list('day', 'last'))
+
+    def _taken_numbers(self, start):
+        return set(Order.objects.filter(created_at__gte=start).values_list('order_number', flat=True))
+
+    def orders(self):
+        """Orders and their lines, one batch of each per transaction."""
+        rng = self.rng('orders')
+        user_ids = self._user_ids()
+        if not user_ids or not self.product_ids:
+            return 0, 0
+        # Loyal customers: a Zipf curve over a shuffled user list
+        customers = user_ids[:]
+        rng.shuffle(customers)
+        customer_weights = zipf_weights(len(customers), CUSTOMER_ZIPF_EXPONENT)
+        start = self.now - timedelta(days=self.days)
+        counters = self._number_counters()
+        taken = self._taken_numbers(start)
+
+        def rows():
+            for _ in range(self.counts['orders']):
+                created_at = start + timedelta(seconds=rng.random() * self.days * 86400)
+                day = created_at.date()
+                while True:
+                    counters[day] = counters.get(day, 0) + 1
+                    number = format_number(day, counters[day])
+                    if number not in taken:
+                        break
+                ranks = set(rng.choices(self.popularity, cum_weights=self.product_weights,
+                                        k=rng.choices(ITEM_COUNTS, ITEM_COUNT_WEIGHTS)[0]))
+                lines = [(rank, rng.choices(QUANTITIES, QUANTITY_WEIGHTS)[0]) for rank in sorted(ranks)]
+                total = sum(self.prices[rank] * quantity for rank, quantity in lines)
+                order = Order(
+                    user_id=rng.choices(customers, cum_weights=customer_weights)[0],
+                    order_number=number,
+                    full_name=f'Customer {rng.randrange(100000)}',
+                    email='customer@example.com',
+                    address=f'{rng.choice(NOTES)} Street {rng.randint(1, 200)}',
+                    city=rng.choice(['Praha', 'Brno', 'Ostrava', 'Plzeň', 'Liberec']),
+                    postal_code=f'{rng.randint(10000, 79999)}',
+                    country='CZ',
+                    status=rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+                    total_amount=total,
+                    shipping_cost=SHIPPING_COST,
+                    tax_amount=0,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+                order.lines = lines
+                yield order
+
+        orders = items = 0
+        for batch in batched(rows(), self.batch_size):
+            with transaction.atomic():
+                Order.objects.bulk_create(batch, batch_size=self.batch_size)
+                lines = [
+                    OrderItem(order_id=order.pk, product_id=self.product_ids[rank],
+                              quantity=quantity, price=self.prices[rank])
+                    for order in batch for rank, quantity in order.lines
+                ]
+                OrderItem.objects.bulk_create(lines, batch_size=self.batch_size)
+            orders += len(batch)
+            items += len(lines)
+            if orders % (self.batch_size * 20) < len(batch):
+                self.log(f'  orders: {orders}')
+        # The allocator carries on after the generated numbers
+        OrderNumberCounter.objects.bulk_create(
+            [OrderNumberCounter(day=day, last=last) for day, last in counters.items()],
+            update_conflicts=True, unique_fields=['day'], update_fields=['last'],
+        )
+        self.log(f'orders: {orders}, order items: {items}')
+        return orders, items
+
+    def _pairs(self, section, count):
+        """
+        `count` distinct (user, product) pairs: each user gets a run of
+        consecutive popularity ranks from a popular starting point, so no
+        set of pairs is needed to avoid duplicates.
+        """
+        user_ids = self._user_ids()
+        if not user_ids or not self.product_ids:
+            return
+        rng = self.rng(section)
+        starts = [rng.choices(range(len(self.popularity)), cum_weights=self.product_weights)[0] for _ in user_ids]
+        for n in range(count):
+            user_index, offset = n % len(user_ids), n // len(user_ids)
+            rank = self.popularity[(starts[user_index] + offset) % len(self.popularity)]
+            yield rng, user_ids[user_index], self.product_ids[rank]
+
+    def review_rows(self):
+        for rng, user_id, product_id in self._pairs('reviews', self.counts['reviews']):
+            created_at = self.now - timedelta(seconds=rng.random() * self.days * 86400)
+            yield Review(user_id=user_id, product_id=product_id, rating=rng.choices(RATINGS, RATING_WEIGHTS)[0],
+                         comment=rng.choice(COMMENTS), created_at=created_at, updated_at=created_at)
+
+    def wishlist_rows(self):
+        for _, user_id, product_id in self._pairs('wishlists', self.counts['wishlists']):
+            yield Wishlist(user_id=user_id, product_id=product_id)
+
+    def rebuild(self):
+        """What the skipped signals would have kept up to date."""
+        self.log('rebuilding rating aggregates, units sold and the search index')
+        rebuild_rating_aggregates()
+        rebuild_units_sold()
+        rebuild_index()
+        facets.invalidate()
+        navigation.invalidate()
+        page_cache.invalidate()
@@ -0,0 +1,238 @@
+# products/facets.py
+"""
+Facet engine for the product listing.
+
+Every facet value owns a bitset over product ids (a Python int, bit n set
+when product n has the value). Selecting values is an OR inside a facet and
+an AND across facets; the count shown next to a value is the popcount of
+"all other facet selections AND this value", so counts never need a
+GROUP BY over the product table.
+
+The index lives in process memory (a versions.VersionedValue). Product
+saves update it in place and bump the "facets" CacheVersion; other workers
+notice the new version and rebuild their copy from one SELECT.
+"""
+from django.db.models import F, Q
+
+from . import versions
+from .models import Product
+
+VERSION_KEY = 'facets'
+
+PRICE_BUCKETS = [
+    ('lt500', 'Under 500 Kč', None, 500),
+    ('500-1000', '500 – 1000 Kč', 500, 1000),
+    ('1000-2000', '1000 – 2000 Kč', 1000, 2000),
+    ('2000-4000', '2000 – 4000 Kč', 2000, 4000),
+    ('4000plus', '4000 Kč and more', 4000, None),
+]
+PRICE_BUCKET_KEYS = {bucket[0] for bucket in PRICE_BUCKETS}
+
+FLAG_FACETS = ['sale', 'stock', 'new']
+FACETS = ['category', 'collection', 'price'] + FLAG_FACETS
+
+FIELDS = ['id', 'category_id', 'collection_id', 'price', 'original_price', 'stock_quantity', 'is_new']
+
+
+def price_bucket(price):
+    for key, label, lower, upper in PRICE_BUCKETS:
+        if (lower is None or price >= lower) and (upper is None or price < upper):
+            return key
+    return None
+
+
+def product_facets(row):
+    """(facet, value) pairs for one product, `row` being a dict of FIELDS."""
+    pairs = [('category', str(row['category_id'])), ('price', price_bucket(row['price']))]
+    if row['collection_id']:
+        pairs.append(('collection', str(row['collection_id'])))
+    if row['original_price'] and row['original_price'] > row['price']:
+        pairs.append(('sale', '1'))
+    if row['stock_quantity'] > 0:
+        pairs.append(('stock', '1'))
+    if row['is_new']:
+        pairs.append(('new', '1'))
+    return pairs
+
+
+def facet_q(facet, values):
+    """The SQL equivalent of selecting `values` in `facet`."""
+    if facet == 'category':
+        return Q(category_id__in=values)
+    if facet == 'collection':
+        return Q(collection_id__in=values)
+    if facet == 'price':
+        q = Q()
+        for key, label, lower, upper in PRICE_BUCKETS:
+            if key in values:
+                bucket = Q()
+                if lower is not None:
+                    bucket &= Q(price__gte=lower)
+                if upper is not None:
+                    bucket &= Q(price__lt=upper)
+                q |= bucket
+        return q
+    if facet == 'sale':
+        return Q(original_price__gt=F('price'))
+    if facet == 'stock':
+        return Q(stock_quantity__gt=0)
+    if facet == 'new':
+        return Q(is_new=True)
+    raise ValueError(f'Unknown facet {facet!r}')
+
+
+def bits_from_ids(ids):
+    bits = 0
+    for pk in ids:
+        bits |= 1 << pk
+    return bits
+
+
+class FacetIndex:
+    def __init__(self):
+        self.all = 0
+        self.bits = {facet: {} for facet in FACETS}
+        self.members = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for row in Product.objects.values(*FIELDS).iterator(chunk_size=5000):
+            index.add(row)
+        return index
+
+    def add(self, row):
+        pk = row['id']
+        if pk in self.members:
+            self.remove(pk)
+        bit = 1 << pk
+        pairs = product_facets(row)
+        for facet, value in pairs:
+            self.bits[facet][value] = self.bits[facet].get(value, 0) | bit
+        self.all |= bit
+        self.members[pk] = pairs
+
+    def remove(self, pk):
+        pairs = self.members.pop(pk, None)
+        if pairs is None:
+            return
+        mask = ~(1 << pk)
+        for facet, value in pairs:
+            self.bits[facet][value] &= mask
+        self.all &= mask
+
+    def _selected(self, facet, values):
+        bits = 0
+        for value in values:
+            bits |= self.bits[facet].get(value, 0)
+        return bits
+
+    def matching(self, selection, base=None):
+        """Bitset of the products that satisfy every selected facet."""
+        bits = self.all if base is None else self.all & base
+        for facet, values in selection.items():
+            if values:
+                bits &= self._selected(facet, values)
+        return bits
+
+    def counts(self, selection, base=None):
+        """
+        {facet: {value: count}} where each count is the number of results
+        the listing would have if that value were also ticked.
+        """
+        result = {}
+        for facet in FACETS:
+            others = {name: values for name, values in selection.items() if name != facet}
+            scope = self.matching(others, base)
+            result[facet] = {
+                value: (scope & bits).bit_count()
+                for value, bits in self.bits[facet].items()
+            }
+        return result
+
+
+_index = versions.VersionedValue(VERSION_KEY, FacetIndex.build)
+
+
+def get_index():
+    return _index.get()
+
+
+def reset_index():
+    _index.reset()
+
+
+def product_changed(product):
+    row = {field: getattr(product, field) for field in FIELDS}
+    _index.apply_local_change(lambda index: index.add(row))
+
+
+def product_removed(product_id):
+    _index.apply_local_change(lambda index: index.remove(product_id))
+
+
+def invalidate():
+    """Force every worker to rebuild, e.g. after a bulk UPDATE that bypassed signals."""
+    _index.invalidate()
+
+
+def parse_selection(params, **fixed):
+    """Read the multi-select facet parameters from a QueryDict."""
+    selection = {}
+    for facet in FACETS:
+        values = [value for value in params.getlist(facet) if value]
+        if facet in fixed and fixed[facet]:
+            values.append(str(fixed[facet]))
+        if facet in ('category', 'collection'):
+            values = [value for value in values if value.isdigit()]
+        elif facet == 'price':
+            values = [value for value in values if value in PRICE_BUCKET_KEYS]
+        else:
+            values = ['1'] if '1' in values else []
+        if values:
+            selection[facet] = sorted(set(values))
+    return selection
+
+
+def filter_queryset(queryset, selection):
+    for facet, values in selection.items():
+        queryset = queryset.filter(facet_q(facet, values))
+    return queryset
+
+
+FACET_LABELS = {
+    'category': 'Categories',
+    'collection': 'Collections',
+    'price': 'Price',
+    'sale': 'On Sale',
+    'stock': 'In Stock',
+    'new': 'New Arrivals',
+}
+
+
+def facet_groups(counts, selection, categories, collections):
+    """Shape the counts for the listing template, one group per facet."""
+    choices = {
+        'category': [(str(category.id), category.name) for category in categories],
+        'collection': [(str(collection.id), collection.name) for collection in collections],
+        'price': [(key, label) for key, label, lower, upper in PRICE_BUCKETS],
+    }
+    groups = []
+    for facet in FACETS:
+        selected = selection.get(facet, [])
+        options = [
+            {
+                'value': value,
+                'label': label,
+                'count': counts[facet].get(value, 0),
+                'selected': value in selected,
+            }
+            for value, label in choices.get(facet, [('1', FACET_LABELS[facet])])
+        ]
+        groups.append({
+            'name': facet,
+            'label': FACET_LABELS[facet],
+            'options': options,
+            'selected_count': len(selected),
+        })
+    return groups
@@ -0,0 +1,195 @@
+# products/images.py
+"""
+Responsive derivatives for product, category and collection images.
+
+Every upload is resized to a few widths in WebP and JPEG, plus a tiny
+blurred JPEG inlined as a data URI so cards have something to show while
+the real image lazy-loads. What was generated is recorded on the row in
+`image_variants`, so templates build the srcset without touching storage.
+
+Saves only schedule the work: a small thread pool does the resizing after
+the transaction commits, so an admin upload returns immediately. Pillow
+releases the GIL while decoding, resizing and encoding, which is where the
+time goes.
+"""
+import base64
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = [160, 320, 480, 800, 1200]
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+QUALITY = 80
+PLACEHOLDER_WIDTH = 16
+DERIVED_DIR = 'derived'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def worker_count():
+    return getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+
+
+def derivative_name(name, width, fmt):
+    stem, _ = os.path.splitext(name)
+    return f'{DERIVED_DIR}/{stem}-{width}w.{fmt}'
+
+
+def target_widths(width):
+    """The WIDTHS narrower than the original, plus the original (capped) itself."""
+    widths = [w for w in WIDTHS if w < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def _flatten(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, FORMATS[fmt][0], quality=QUALITY, optimize=True, **options)
+    return buffer.getvalue()
+
+
+def placeholder(image):
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def generate(name, storage=default_storage):
+    """Write every derivative of the image stored as `name`; return its variants dict."""
+    with storage.open(name, 'rb') as source:
+        image = _flatten(Image.open(source))
+    width, height = image.size
+    widths = target_widths(width)
+    for target in widths:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.Resampling.LANCZOS,
+        )
+        for fmt in FORMATS:
+            path = derivative_name(name, target, fmt)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(_encode(resized, fmt)))
+    return {
+        'source': name,
+        'width': width,
+        'height': height,
+        'widths': widths,
+        'placeholder': placeholder(image),
+    }
+
+
+def delete_derivatives(variants, storage=default_storage):
+    for width in variants.get('widths', []):
+        for fmt in FORMATS:
+            path = derivative_name(variants['source'], width, fmt)
+            if storage.exists(path):
+                storage.delete(path)
+
+
+def needs_derivatives(obj):
+    if not obj.image or (obj.image_variants or {}).get('source') == obj.image.name:
+        return False
+    # Rows pointing at a file that was never uploaded have nothing to resize
+    return obj.image.storage.exists(obj.image.name)
+
+
+def record(model, pk, variants, previous=None):
+    """Store `variants` on the row, unless its image was replaced while they were being built."""
+    changes = {'image_variants': variants}
+    if any(field.name == 'updated_at' for field in model._meta.fields):
+        # Cached product cards are keyed by updated_at
+        changes['updated_at'] = timezone.now()
+    if not model.objects.filter(pk=pk, image=variants['source']).update(**changes):
+        delete_derivatives(variants)
+        return False
+    if previous and previous.get('source') and previous['source'] != variants['source']:
+        delete_derivatives(previous)
+    _after_update(model)
+    return True
+
+
+def process(model, pk):
+    """Generate derivatives for one row and record them."""
+    row = model.objects.filter(pk=pk).values('image', 'image_variants').first()
+    if row is None or not row['image']:
+        return None
+    previous = row['image_variants'] or {}
+    if previous.get('source') == row['image']:
+        return previous
+    variants = generate(row['image'])
+    return variants if record(model, pk, variants, previous) else None
+
+
+def _after_update(model):
+    from . import navigation, page_cache
+    from .models import Product
+
+    if model is not Product:
+        navigation.invalidate()
+    page_cache.invalidate()
+
+
+def _safe_process(model, pk):
+    try:
+        return process(model, pk)
+    except Exception:
+        logger.exception('Could not build image derivatives for %s %s', model.__name__, pk)
+        return None
+
+
+def _run(model, pk):
+    try:
+        return _safe_process(model, pk)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=worker_count(), thread_name_prefix='image-derivatives')
+        return _executor
+
+
+def schedule(model, pk):
+    """Build derivatives in the background pool, or inline when IMAGE_DERIVATIVE_WORKERS is 0."""
+    if worker_count() <= 0:
+        return _safe_process(model, pk)
+    return _get_executor().submit(_run, model, pk)
+
+
+def srcset(obj, fmt='webp'):
+    """`url 160w, url 320w, ...` for `obj.image`, or '' before its derivatives exist."""
+    variants = obj.image_variants or {}
+    if not obj.image or variants.get('source') != obj.image.name:
+        return ''
+    return ', '.join(
+        f'{default_storage.url(derivative_name(variants["source"], width, fmt))} {width}w'
+        for width in variants['widths']
+    )
@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from products.models import Category, Product
+from products.search import MAX_RESULTS, rebuild_index, search_products
+
+WORDS = [
+    'růže', 'jasmín', 'vanilka', 'santal', 'pižmo', 'oud', 'ambra', 'citrus', 'levandule', 'pačuli',
+    'bergamot', 'kardamom', 'skořice', 'tabák', 'kůže', 'cedr', 'vetiver', 'tonka', 'šafrán', 'ylang',
+    'fresh', 'noir', 'gold', 'royal', 'velvet', 'night', 'bloom', 'essence', 'intense', 'crystal',
+]
+FILLER_SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ne', 'to', 'vu', 'sé', 'dr', 'po', 'li', 'an', 'ze', 'bo']
+QUERIES = ['ruze', 'šafrán noir', 'vanil', 'oud royal', 'kuze tabak', 'crystal bloom', 'zzz-no-match']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare FTS5 search with the icontains filter on a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark needs SQLite with FTS5.')
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            # SQLite DDL is transactional, so the original index comes back too
+            pass
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        # A few thousand filler words keep the perfume terms selective, like real copy
+        filler = [''.join(rng.choices(FILLER_SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)]
+        category = Category.objects.create(name='Benchmark')
+        self.stdout.write(f"Creating {options['products']} products...")
+        batch = []
+        for i in range(options['products']):
+            name = ' '.join(rng.choices(WORDS, k=2)).title()
+            description = ' '.join(rng.choices(filler, k=55) + rng.choices(WORDS, k=3))
+            batch.append(Product(
+                name=f'{name} {i}', description=description, price=rng.randint(300, 5000),
+                image='products/benchmark.jpg', category=category,
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+        started = time.perf_counter()
+        rebuild_index()
+        self.stdout.write(f'Index built in {time.perf_counter() - started:.2f}s\n')
+
+        self.stdout.write(f"{'query':<16}{'icontains ms':>14}{'hits':>8}{'fts5 ms':>10}{'hits':>8}")
+        for query in QUERIES:
+            icontains = self._time(options['repeat'], lambda: list(
+                Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+                .values_list('pk', flat=True)
+            ))
+            fts = self._time(options['repeat'], lambda: list(
+                search_products(Product.objects.all(), query).values_list('pk', flat=True)
+            ))
+            icontains_hits = Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query)).count()
+            fts_hits = search_products(Product.objects.all(), query).count()
+            self.stdout.write(f'{query:<16}{icontains:>14.1f}{icontains_hits:>8}{fts:>10.1f}{fts_hits:>8}')
+        self.stdout.write(f'\nFTS5 results are capped at the {MAX_RESULTS} best matches.')
+
+    def _time(self, repeat, fn):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from products.assets import MINIFIERS, get_bundle
+
+SOURCE_DIRS = ['css', 'js']
+
+
+class Command(BaseCommand):
+    help = 'Build the hashed CSS/JS bundles and report their sizes, optionally writing them out for a web server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Directory to write <name>.<hash>.<ext> (+ .gz/.br) files into')
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        root = settings.STATICFILES_DIRS[0]
+        names = sorted(
+            os.path.relpath(os.path.join(dirpath, filename), root)
+            for source_dir in SOURCE_DIRS
+            for dirpath, dirnames, filenames in os.walk(os.path.join(root, source_dir))
+            for filename in filenames
+            if os.path.splitext(filename)[1] in MINIFIERS
+        )
+        totals = [0, 0, 0, 0]
+        for name in names:
+            bundle = get_bundle(name)
+            raw = os.path.getsize(os.path.join(root, name))
+            sizes = [raw, len(bundle.content), len(bundle.gzip), len(bundle.brotli) if bundle.brotli else 0]
+            totals = [total + size for total, size in zip(totals, sizes)]
+            self.stdout.write(f'{bundle.hashed_name:<60} {sizes[0]:>8} {sizes[1]:>8} {sizes[2]:>7} {sizes[3] or "-":>7}')
+            if options['output']:
+                self._write(options['output'], bundle)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(names)} bundles: {totals[0]} bytes source, {totals[1]} minified, {totals[2]} gzip'
+            + (f', {totals[3]} brotli' if totals[3] else '')
+        ))
+
+    def _write(self, output, bundle):
+        path = os.path.join(output, bundle.hashed_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for suffix, body in (('', bundle.content), ('.gz', bundle.gzip), ('.br', bundle.brotli)):
+            if body is not None:
+                with open(path + suffix, 'wb') as f:
+                    f.write(body)
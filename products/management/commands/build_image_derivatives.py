@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from products import images
+from products.models import Category, Collection, Product
+
+# The width a listing card actually downloads on a desktop screen
+CARD_WIDTH = 480
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive image derivatives for existing product, category and collection images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model in (Product, Category, Collection):
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).values_list('pk', 'image', 'image_variants')
+            for pk, name, variants in rows:
+                if (options['force'] or (variants or {}).get('source') != name) and default_storage.exists(name):
+                    jobs.append((model, pk, name, variants or {}))
+
+        # Threads only resize and encode; rows are updated from this thread
+        names = [name for model, pk, name, previous in jobs]
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                generated = list(pool.map(images.generate, names))
+        else:
+            generated = [images.generate(name) for name in names]
+
+        original = derived = built = 0
+        for (model, pk, name, previous), variants in zip(jobs, generated):
+            if not images.record(model, pk, variants, previous):
+                continue
+            built += 1
+            original += default_storage.size(name)
+            width = max([w for w in variants['widths'] if w <= CARD_WIDTH] or variants['widths'][:1])
+            derived += default_storage.size(images.derivative_name(name, width, 'webp'))
+
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {built} images'))
+        if original:
+            self.stdout.write(
+                f'Card-sized WebP: {derived / 1024:.0f} KiB vs {original / 1024:.0f} KiB originals '
+                f'({derived / original:.0%})'
+            )
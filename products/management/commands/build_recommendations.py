@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from products import page_cache
+from products.recommendations import TOP_N, rebuild, refresh
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "customers also bought" neighbours shown on product pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only refresh products from orders placed or cancelled since the last run')
+        parser.add_argument('--no-wishlists', action='store_true',
+                            help='Use order co-occurrence only')
+        parser.add_argument('--top', type=int, default=TOP_N)
+
+    def handle(self, *args, **options):
+        include_wishlists = not options['no_wishlists']
+        if options['incremental']:
+            refreshed, stored = refresh(include_wishlists=include_wishlists, n=options['top'])
+            message = f'Refreshed {refreshed} products ({stored} recommendations)'
+        else:
+            stored = rebuild(include_wishlists=include_wishlists, n=options['top'])
+            message = f'Stored {stored} recommendations'
+        if stored:
+            page_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,64 @@
+import time
+from datetime import datetime, time as day_start
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from products.dataset import Dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic shop (products, customers, orders, reviews, wishlists) '
+        'for scale testing, e.g. --products 100000 --orders 1000000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Same seed and options, same rows; different seeds can share a database')
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--collections', type=int, default=8)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--wishlists', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=730, help='How far back orders and reviews go')
+        parser.add_argument('--until', help='Last day of the data (YYYY-MM-DD), today by default')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"ds{options['seed']}-").exists():
+            raise CommandError(f"A dataset with seed {options['seed']} is already loaded; pick another --seed.")
+        now = None
+        if options['until']:
+            try:
+                until = datetime.strptime(options['until'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--until must be a date such as 2025-06-30.')
+            now = timezone.make_aware(datetime.combine(until.date(), day_start(23, 59)))
+
+        dataset = Dataset(
+            seed=options['seed'],
+            categories=options['categories'],
+            collections=options['collections'],
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            reviews=options['reviews'],
+            wishlists=options['wishlists'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            now=now,
+            log=self.stdout.write,
+        )
+        # Impossible counts fail here, not halfway through the load
+        try:
+            dataset.validate()
+        except ValueError as error:
+            raise CommandError(str(error))
+        start = time.perf_counter()
+        created = dataset.generate()
+        summary = ', '.join(f'{count} {section.replace("_", " ")}' for section, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {time.perf_counter() - start:.0f} s'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating count, sum, average and histogram on every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='product_ids',
+                            help='Only rebuild this product id (may be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates(
+            product_ids=options['product_ids'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} products'))
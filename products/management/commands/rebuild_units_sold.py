@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.sales import rebuild_units_sold
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized units_sold counter behind the bestseller sort'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_units_sold(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt units sold for {updated} products'))
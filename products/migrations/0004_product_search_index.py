@@ -0,0 +1,40 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'products_product_search'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('products', 'Product')
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+            f'USING fts5(name, description, tokenize="unicode61 remove_diacritics 2")'
+        )
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            list(Product.objects.values_list('pk', 'name', 'description')),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:44
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_units_sold(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    rows = (
+        OrderItem.objects.exclude(order__status='cancelled')
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+    )
+    for row in rows:
+        Product.objects.filter(pk=row['product_id']).update(units_sold=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_index'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='product_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_average', '-id'], name='product_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-units_sold', '-id'], name='product_bestseller_idx'),
+        ),
+        migrations.RunPython(backfill_units_sold, migrations.RunPython.noop),
+    ]
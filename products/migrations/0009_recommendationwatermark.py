@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+OLD_KEY = 'recommendations-last-order'
+
+
+def move_watermark(apps, schema_editor):
+    # The watermark used to be kept as a CacheVersion row
+    CacheVersion = apps.get_model('products', 'CacheVersion')
+    RecommendationWatermark = apps.get_model('products', 'RecommendationWatermark')
+    old = CacheVersion.objects.filter(key=OLD_KEY).first()
+    if old is not None:
+        RecommendationWatermark.objects.create(pk=1, last_order_id=old.version)
+        old.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.PositiveBigIntegerField(default=0)),
+                ('last_status_change_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(move_watermark, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', null=True, blank=True)
+    # Resized copies of `image`, written by products.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -17,6 +19,7 @@ class Collection(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='collections/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -29,14 +32,35 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=0) 
     original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     image = models.ImageField(upload_to='products/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     collection = models.ForeignKey(Collection, on_delete=models.SET_NULL, null=True, blank=True)
     is_new = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
     stock_quantity = models.IntegerField(default=0)
+    # Denormalized review aggregates, kept current by orders.signals
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    # Units on orders that were not cancelled, drives the bestseller sort
+    units_sold = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # One composite index per listing sort (see products.pagination.SORTS)
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_newest_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['-rating_average', '-id'], name='product_rating_idx'),
+            models.Index(fields=['-units_sold', '-id'], name='product_bestseller_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -50,7 +74,62 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        reviews = self.review_set.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 4.5  # Default rating
\ No newline at end of file
+        # None until the first review; "Top Rated" sorts these last
+        if self.rating_count:
+            return self.rating_average
+        return None
+
+    @property
+    def rating_version(self):
+        # Changes whenever the displayed average can change
+        return f"{self.rating_count}-{self.rating_sum}"
+
+    @property
+    def rating_histogram(self):
+        return {
+            1: self.rating_1_count,
+            2: self.rating_2_count,
+            3: self.rating_3_count,
+            4: self.rating_4_count,
+            5: self.rating_5_count,
+        }
+
+
+class ProductRecommendation(models.Model):
+    """Precomputed "customers also bought" neighbours, see products.recommendations."""
+    product = models.ForeignKey(Product, related_name='recommendations', on_delete=models.CASCADE)
+    recommended = models.ForeignKey(Product, related_name='recommended_by', on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ['product', 'recommended']
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='recommendation_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} -> {self.recommended} ({self.score:.3f})"
+
+
+class RecommendationWatermark(models.Model):
+    """How far products.recommendations.refresh() has read; a single row."""
+    last_order_id = models.PositiveBigIntegerField(default=0)
+    last_status_change_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"order {self.last_order_id}, status change {self.last_status_change_id}"
+
+
+class CacheVersion(models.Model):
+    """
+    Version stamps for process-local caches. Every worker compares its copy
+    against this row, so a bump here invalidates the cache across gunicorn
+    workers without a shared cache server.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
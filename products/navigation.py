@@ -0,0 +1,36 @@
+# products/navigation.py
+"""
+Process-wide cache of the catalog navigation (all categories and the
+active collections) that every page renders. It is versioned by the
+"catalog-nav" CacheVersion, bumped on Category and Collection changes.
+"""
+from . import versions
+from .models import Category, Collection
+
+VERSION_KEY = 'catalog-nav'
+
+
+def _load():
+    return {
+        'categories': list(Category.objects.all()),
+        'collections': list(Collection.objects.filter(is_active=True)),
+    }
+
+
+_navigation = versions.VersionedValue(VERSION_KEY, _load)
+
+
+def get_categories():
+    return _navigation.get()['categories']
+
+
+def get_collections():
+    return _navigation.get()['collections']
+
+
+def invalidate():
+    _navigation.invalidate()
+
+
+def reset():
+    _navigation.reset()
@@ -0,0 +1,103 @@
+# products/page_cache.py
+"""
+Full-page cache for anonymous catalog traffic.
+
+Anonymous visitors all see the same catalog HTML except for the cart and
+wishlist badges. Those are wrapped in {% personalized %} blocks: while a
+page is being recorded each block is rendered twice (count 0 and a
+sentinel count) and replaced by a placeholder. Serving a cached page is
+then a string substitution with the visitor's counts, with no ORM and no
+template work.
+
+Entries are keyed by the "pages" version stamp, bumped on Product,
+Category, Collection and Review changes, so one bump drops every page in
+every worker.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import versions
+
+VERSION_KEY = 'pages'
+SENTINEL = 9876543210
+PLACEHOLDER = '<!--page-hole:{}-->'
+
+_stamp = versions.VersionStamp(VERSION_KEY)
+
+
+def page_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+
+def invalidate():
+    _stamp.bump()
+
+
+def reset():
+    _stamp.reset()
+
+
+def cache_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:v{_stamp.get()}:{path}'
+
+
+def personal_values(request):
+    from .context_processors import cart_count, wishlist_count
+    return {'cart_count': cart_count(request), 'wishlist_count': wishlist_count(request)}
+
+
+def fill_holes(html, holes, values):
+    for number, (name, empty, filled) in enumerate(holes):
+        value = values.get(name) or 0
+        fragment = filled.replace(str(SENTINEL), str(value)) if value else empty
+        html = html.replace(PLACEHOLDER.format(number), fragment, 1)
+    return html
+
+
+def _cacheable(request):
+    return request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+
+
+def cache_anonymous_page(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view(request, *args, **kwargs)
+
+        key = cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            response = HttpResponse(
+                fill_holes(entry['html'], entry['holes'], personal_values(request)),
+                content_type=entry['content_type'],
+            )
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        request._page_cache_holes = []
+        response = view(request, *args, **kwargs)
+        holes = request._page_cache_holes
+        del request._page_cache_holes
+
+        if not holes or response.status_code != 200 or response.streaming:
+            return response
+        html = response.content.decode(response.charset)
+        # A page that handed out a CSRF token or set a cookie is not anonymous-safe
+        if response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            response.content = fill_holes(html, holes, personal_values(request))
+            return response
+
+        cache.set(key, {
+            'html': html,
+            'holes': holes,
+            'content_type': response['Content-Type'],
+        }, page_timeout())
+        response.content = fill_holes(html, holes, personal_values(request))
+        response['X-Page-Cache'] = 'miss'
+        return response
+    return wrapper
@@ -0,0 +1,125 @@
+# products/pagination.py
+"""
+Keyset (cursor) pagination for product listings.
+
+Each sort is a tuple of (field, descending) pairs ending in the primary key
+so the order is total. The cursor carries the sort key of the last product
+on the page; the next page is fetched with a WHERE on that key instead of
+an OFFSET, so page 500 costs the same as page 1 when an index matches the
+sort.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+PAGE_SIZE = 24
+CURSOR_SALT = 'products.pagination.cursor'
+
+SORTS = {
+    'newest': (('created_at', True), ('id', True)),
+    'price_asc': (('price', False), ('id', False)),
+    'price_desc': (('price', True), ('id', True)),
+    'rating': (('rating_average', True), ('id', True)),
+    'bestseller': (('units_sold', True), ('id', True)),
+    # Only available on search results, see products.search.search_products
+    'relevance': (('search_rank', False), ('id', False)),
+}
+
+SORT_CHOICES = [
+    ('newest', 'Newest'),
+    ('price_asc', 'Price: Low to High'),
+    ('price_desc', 'Price: High to Low'),
+    ('rating', 'Top Rated'),
+    ('bestseller', 'Bestsellers'),
+]
+DEFAULT_SORT = 'newest'
+
+
+class Page:
+    def __init__(self, items, sort, next_cursor):
+        self.items = items
+        self.sort = sort
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ['dt', value.isoformat()]
+    if isinstance(value, Decimal):
+        return ['dec', str(value)]
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        kind, raw = value
+        return parse_datetime(raw) if kind == 'dt' else Decimal(raw)
+    return value
+
+
+def encode_cursor(sort, obj):
+    values = [_encode_value(getattr(obj, field)) for field, _ in SORTS[sort]]
+    return signing.dumps([sort, values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, sort):
+    """Return the key values stored in `cursor`, or None if it is invalid or for another sort."""
+    if not cursor:
+        return None
+    try:
+        cursor_sort, values = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if cursor_sort != sort or len(values) != len(SORTS[sort]):
+        return None
+    return [_decode_value(value) for value in values]
+
+
+def _after(keys, values):
+    """Build the row-value comparison (a, b) > (x, y) as nested Q objects."""
+    condition = Q()
+    equal_so_far = Q()
+    for (field, descending), value in zip(keys, values):
+        lookup = f'{field}__lt' if descending else f'{field}__gt'
+        condition |= equal_so_far & Q(**{lookup: value})
+        equal_so_far &= Q(**{field: value})
+    return condition
+
+
+def resolve_sort(sort, searching=False):
+    if sort == 'relevance' and searching:
+        return sort
+    if sort in SORTS and sort != 'relevance':
+        return sort
+    return 'relevance' if searching else DEFAULT_SORT
+
+
+def paginate(queryset, sort, cursor=None, page_size=PAGE_SIZE):
+    keys = SORTS[sort]
+    ordering = [F(field).desc() if descending else F(field).asc() for field, descending in keys]
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor, sort)
+    if values is not None:
+        queryset = queryset.filter(_after(keys, values))
+
+    # One extra row tells us whether another page exists
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(sort, items[-1])
+    return Page(items, sort, next_cursor)
@@ -0,0 +1,84 @@
+# products/ratings.py
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .batches import pk_batches
+from .models import Product
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+def histogram_field(rating):
+    return f'rating_{rating}_count'
+
+
+def apply_rating_change(product_id, removed=None, added=None):
+    """
+    Apply one review change to the product's rating aggregates in a single
+    UPDATE. `removed` is the rating that no longer counts (deleted or edited
+    review), `added` the rating that now counts (new or edited review).
+    """
+    count_delta = 0
+    sum_delta = 0
+    updates = {}
+
+    if removed is not None:
+        removed = int(removed)
+        count_delta -= 1
+        sum_delta -= removed
+        updates[histogram_field(removed)] = F(histogram_field(removed)) - 1
+
+    if added is not None:
+        added = int(added)
+        count_delta += 1
+        sum_delta += added
+        field = histogram_field(added)
+        if field in updates:
+            del updates[field]  # Same star bucket, nothing to move
+        else:
+            updates[field] = F(field) + 1
+
+    if not count_delta and not sum_delta and not updates:
+        return 0
+
+    new_count = F('rating_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    updates['rating_count'] = new_count
+    updates['rating_sum'] = new_sum
+    # Every right-hand side sees the pre-update row, so the average is
+    # derived from the new totals in the same statement.
+    updates['rating_average'] = Coalesce(
+        Cast(new_sum, FloatField()) / NullIf(new_count, 0),
+        Value(0.0),
+    )
+    return Product.objects.filter(pk=product_id).update(**updates)
+
+
+def rebuild_rating_aggregates(product_ids=None, batch_size=1000):
+    """
+    Recompute rating aggregates from the review table: one UPDATE with
+    correlated subqueries per batch of products, so the database does the
+    counting instead of a CASE per row built in Python.
+    """
+    from orders.models import Review
+
+    def per_product(aggregate):
+        rows = Review.objects.filter(product=OuterRef('pk')).values('product').annotate(value=aggregate).values('value')
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    updated = 0
+    for batch in pk_batches(products, batch_size):
+        updated += Product.objects.filter(pk__in=batch).update(
+            rating_count=per_product(Count('id')),
+            rating_sum=per_product(Sum('rating')),
+            **{histogram_field(r): per_product(Count('id', filter=Q(rating=r))) for r in RATING_VALUES},
+        )
+        # The average needs the new totals, which the first UPDATE's right-hand sides cannot see
+        Product.objects.filter(pk__in=batch).update(rating_average=Coalesce(
+            Cast('rating_sum', FloatField()) / NullIf('rating_count', 0), Value(0.0),
+        ))
+    return updated
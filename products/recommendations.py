@@ -0,0 +1,216 @@
+# products/recommendations.py
+"""
+Item-to-item "customers also bought" recommendations.
+
+Orders (and, blended in at a lower weight, wishlists) are treated as
+baskets. Co-occurrence counts between every pair of products in a basket
+are computed with vectorised NumPy over the (basket, product) incidence
+arrays -- the equivalent of the sparse product A.T @ A -- then normalised
+to cosine similarity and cut down to the top N neighbours per product,
+which are stored in ProductRecommendation.
+
+`rebuild()` recomputes everything. `refresh()` only looks at what changed
+since the last run, tracked in RecommendationWatermark: orders placed, and
+orders cancelled or un-cancelled (their OrderStatusChange rows). It
+recomputes the neighbours of the products in those orders. Deleted orders
+and the slow drift in popularity elsewhere wait for the next `rebuild()`.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Product, ProductRecommendation, RecommendationWatermark
+
+TOP_N = 12
+WISHLIST_WEIGHT = 0.3
+
+
+def _dedupe(baskets, items):
+    order = np.lexsort((items, baskets))
+    baskets, items = baskets[order], items[order]
+    keep = np.ones(len(baskets), dtype=bool)
+    keep[1:] = (baskets[1:] != baskets[:-1]) | (items[1:] != items[:-1])
+    return baskets[keep], items[keep]
+
+
+def cooccurrence(baskets, items, targets=None):
+    """
+    Count how many baskets contain each ordered pair (a, b), a != b.
+    `baskets` and `items` are parallel id arrays; with `targets` only pairs
+    whose `a` is in targets are produced. Returns (a, b, count) arrays.
+    """
+    baskets, items = _dedupe(np.asarray(baskets, dtype=np.int64), np.asarray(items, dtype=np.int64))
+    empty = np.empty(0, dtype=np.int64)
+    if not len(items):
+        return empty, empty, empty
+
+    starts = np.flatnonzero(np.r_[True, baskets[1:] != baskets[:-1]])
+    sizes = np.diff(np.r_[starts, len(baskets)])
+    entry_start = np.repeat(starts, sizes)
+    entry_size = np.repeat(sizes, sizes)
+
+    left = np.arange(len(items)) if targets is None else np.flatnonzero(np.isin(items, targets))
+    pair_counts = entry_size[left]
+    total = int(pair_counts.sum())
+    # Pair every entry with every entry of its own basket
+    offsets = np.arange(total) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+    right = np.repeat(entry_start[left], pair_counts) + offsets
+    left = np.repeat(left, pair_counts)
+
+    a, b = items[left], items[right]
+    distinct = a != b
+    width = int(items.max()) + 1
+    keys, counts = np.unique(a[distinct] * width + b[distinct], return_counts=True)
+    return keys // width, keys % width, counts
+
+
+def basket_frequency(baskets, items):
+    """Number of baskets containing each item, as {item: count} arrays."""
+    baskets, items = _dedupe(np.asarray(baskets, dtype=np.int64), np.asarray(items, dtype=np.int64))
+    return np.unique(items, return_counts=True)
+
+
+def cosine_scores(a, b, counts, freq_items, freq_counts):
+    # freq_items is sorted (np.unique) and contains every a and b
+    fa = freq_counts[np.searchsorted(freq_items, a)].astype(np.float64)
+    fb = freq_counts[np.searchsorted(freq_items, b)].astype(np.float64)
+    return counts / np.sqrt(fa * fb)
+
+
+def blend(*scored):
+    """Sum several (a, b, score) triples into one, pair by pair."""
+    a = np.concatenate([s[0] for s in scored])
+    b = np.concatenate([s[1] for s in scored])
+    score = np.concatenate([s[2] for s in scored])
+    if not len(a):
+        return a, b, score
+    width = int(max(a.max(), b.max())) + 1
+    keys, inverse = np.unique(a * width + b, return_inverse=True)
+    return keys // width, keys % width, np.bincount(inverse, weights=score)
+
+
+def top_n(a, b, score, n=TOP_N):
+    order = np.lexsort((b, -score, a))
+    a, b, score = a[order], b[order], score[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]]) if len(a) else np.empty(0, dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(a)])
+    rank = np.arange(len(a)) - np.repeat(starts, sizes)
+    keep = rank < n
+    return a[keep], b[keep], score[keep], rank[keep]
+
+
+def _order_baskets(queryset):
+    rows = np.array(list(queryset.values_list('order_id', 'product_id')), dtype=np.int64).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1]
+
+
+def _wishlist_baskets(queryset):
+    rows = np.array(list(queryset.values_list('user_id', 'product_id')), dtype=np.int64).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1]
+
+
+def _scored(baskets, items, freq_baskets, freq_items, targets=None, weight=1.0):
+    a, b, counts = cooccurrence(baskets, items, targets)
+    f_items, f_counts = basket_frequency(freq_baskets, freq_items)
+    return a, b, weight * cosine_scores(a, b, counts, f_items, f_counts)
+
+
+def compute(targets=None, include_wishlists=True, n=TOP_N):
+    """Neighbour arrays (product, recommended, score, rank) for `targets` or every product."""
+    from accounts.models import Wishlist
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.exclude(order__status='cancelled')
+    wishlists = Wishlist.objects.all()
+    if targets is not None:
+        # Only baskets that contain a target can contribute to its neighbours
+        target_ids = targets.tolist()
+        items_scope = items.filter(order__in=items.filter(product_id__in=target_ids).values('order_id'))
+        wishlist_scope = wishlists.filter(user__in=wishlists.filter(product_id__in=target_ids).values('user_id'))
+    else:
+        items_scope, wishlist_scope = items, wishlists
+
+    all_baskets, all_items = _order_baskets(items)
+    baskets, basket_items = _order_baskets(items_scope) if targets is not None else (all_baskets, all_items)
+    scored = [_scored(baskets, basket_items, all_baskets, all_items, targets)]
+
+    if include_wishlists:
+        all_users, all_wished = _wishlist_baskets(wishlists)
+        users, wished = _wishlist_baskets(wishlist_scope) if targets is not None else (all_users, all_wished)
+        scored.append(_scored(users, wished, all_users, all_wished, targets, weight=WISHLIST_WEIGHT))
+
+    return top_n(*blend(*scored), n=n)
+
+
+def _store(product, recommended, score, rank, targets=None, batch_size=5000):
+    with transaction.atomic():
+        if targets is None:
+            ProductRecommendation.objects.all().delete()
+        else:
+            for start in range(0, len(targets), 500):
+                ProductRecommendation.objects.filter(product_id__in=targets[start:start + 500]).delete()
+        rows = [
+            ProductRecommendation(product_id=p, recommended_id=r, score=s, rank=k)
+            for p, r, s, k in zip(product.tolist(), recommended.tolist(), score.tolist(), rank.tolist())
+        ]
+        ProductRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def _last_ids():
+    from orders.models import Order, OrderStatusChange
+
+    return (
+        Order.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+        OrderStatusChange.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+    )
+
+
+def _set_watermark(last_order, last_status_change):
+    RecommendationWatermark.objects.update_or_create(
+        pk=1, defaults={'last_order_id': last_order, 'last_status_change_id': last_status_change},
+    )
+
+
+def rebuild(include_wishlists=True, n=TOP_N):
+    """Recompute the neighbours of every product. Returns the number of rows stored."""
+    last_ids = _last_ids()
+    stored = _store(*compute(include_wishlists=include_wishlists, n=n))
+    _set_watermark(*last_ids)
+    return stored
+
+
+def refresh(include_wishlists=True, n=TOP_N):
+    """
+    Recompute only the products in orders placed, cancelled or restored
+    since the last run. Returns (products refreshed, rows stored).
+    """
+    from orders.models import OrderItem, OrderStatusChange
+
+    watermark = RecommendationWatermark.objects.filter(pk=1).first() or RecommendationWatermark()
+    last_order, last_status_change = _last_ids()
+    if last_order <= watermark.last_order_id and last_status_change <= watermark.last_status_change_id:
+        return 0, 0
+    new_items = OrderItem.objects.filter(
+        order_id__gt=watermark.last_order_id, order_id__lte=last_order,
+    ).exclude(order__status='cancelled')
+    # A cancelled order stops counting, a restored one counts again
+    cancellations = OrderStatusChange.objects.filter(
+        id__gt=watermark.last_status_change_id, id__lte=last_status_change,
+    ).filter(Q(old_status='cancelled') | Q(new_status='cancelled'))
+    changed_items = OrderItem.objects.filter(order__in=cancellations.values('order_id'))
+    # Both ends of every added or removed pair are in these orders, so their
+    # lists are the ones that changed. Popularity drift elsewhere waits for rebuild().
+    targets = sorted(
+        set(new_items.values_list('product_id', flat=True)) | set(changed_items.values_list('product_id', flat=True))
+    )
+    stored = 0
+    if targets:
+        stored = _store(*compute(targets=np.array(targets, dtype=np.int64), include_wishlists=include_wishlists, n=n), targets=targets)
+    _set_watermark(last_order, last_status_change)
+    return len(targets), stored
+
+
+def recommended_for(product, limit=4):
+    """Precomputed neighbours of `product`, best first, in one indexed query."""
+    return Product.objects.filter(recommended_by__product=product).order_by('recommended_by__rank')[:limit]
@@ -0,0 +1,36 @@
+# products/sales.py
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .batches import pk_batches
+from .models import Product
+
+
+def apply_sales_change(quantities, sign=1):
+    """Move `units_sold` by `sign` * quantity for each {product_id: quantity}, in one UPDATE."""
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    delta = Case(
+        *[When(pk=product_id, then=Value(sign * quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    Product.objects.filter(pk__in=list(quantities)).update(units_sold=F('units_sold') + delta)
+
+
+def rebuild_units_sold(batch_size=1000):
+    """Recompute `units_sold` from the order lines of orders that were not cancelled."""
+    from orders.models import OrderItem
+
+    sold = (
+        OrderItem.objects.filter(product=OuterRef('pk')).exclude(order__status='cancelled')
+        .values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    # One correlated UPDATE per batch of products
+    updated = 0
+    for batch in pk_batches(Product.objects.all(), batch_size):
+        updated += Product.objects.filter(pk__in=batch).update(
+            units_sold=Coalesce(Subquery(sold, output_field=IntegerField()), 0),
+        )
+    return updated
@@ -0,0 +1,136 @@
+# products/search.py
+"""
+Full-text search over the catalog.
+
+On SQLite the products are mirrored into an FTS5 virtual table whose
+`unicode61 remove_diacritics 2` tokenizer folds Czech diacritics, so
+"ruze" finds "Růže". Results are ranked with bm25 and a name match weighs
+more than a description match. Other databases, or an SQLite build without
+FTS5, fall back to the plain icontains filter.
+
+Every match is returned, so the listing filters see all of them. Only the
+best MAX_RESULTS are ranked; the rest follow them in id order.
+"""
+import re
+
+from django.db import connection
+from django.db.models import CharField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf, StrIndex
+
+from .models import Product
+
+SEARCH_TABLE = 'products_product_search'
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_RESULTS = 1000
+
+CREATE_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+    f'USING fts5(name, description, tokenize="unicode61 remove_diacritics 2")'
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_available = {}
+
+
+def index_available():
+    if connection.vendor != 'sqlite':
+        return False
+    # Introspect once per database file rather than on every search/save
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        _available[name] = SEARCH_TABLE in connection.introspection.table_names()
+    return _available[name]
+
+
+def build_match_expression(query):
+    """Turn free text into an FTS5 expression of quoted prefix terms."""
+    tokens = _TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_product_ids(query, limit=MAX_RESULTS):
+    """Return matching product ids, best match first."""
+    expression = build_match_expression(query)
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'ORDER BY bm25({SEARCH_TABLE}, %s, %s) LIMIT %s',
+            [expression, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_products(queryset, query):
+    """Filter a Product queryset by `query`, ordered by relevance."""
+    if not index_available():
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query)
+        )
+
+    ids = search_product_ids(query)
+    if not ids:
+        # Still sortable by relevance
+        return queryset.none().annotate(search_rank=Value(0))
+    # The match set stays a subquery on the FTS table, so the category and
+    # facet filters applied later see every match, not just the ranked ones
+    matches = RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [build_match_expression(query)],
+    )
+    # Position of ",<id>," inside the ranked id list. One INSTR per row is far
+    # cheaper than a CASE with a branch per hit.
+    ranked = ',' + ','.join(str(pk) for pk in ids) + ','
+    position = StrIndex(Value(ranked), Concat(Value(','), Cast('pk', CharField()), Value(',')))
+    ranking = Coalesce(NullIf(position, Value(0)), Value(len(ranked)))
+    return queryset.filter(pk__in=matches).annotate(search_rank=ranking).order_by('search_rank', 'pk')
+
+
+def index_product(product):
+    if not index_available():
+        return
+    with connection.cursor() as cursor:
+        # FTS5 has no upsert, replace the row by hand
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            [product.pk, product.name, product.description],
+        )
+
+
+def unindex_product(product_id):
+    if not index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_index(batch_size=2000):
+    """Drop and refill the search table from the product table."""
+    if connection.vendor != 'sqlite':
+        return 0
+    indexed = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        cursor.execute(CREATE_TABLE_SQL)
+        rows = Product.objects.order_by('pk').values_list('pk', 'name', 'description')
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (%s, %s, %s)', batch
+                )
+                indexed += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (%s, %s, %s)', batch
+            )
+            indexed += len(batch)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    _available[connection.settings_dict['NAME']] = True
+    return indexed
@@ -0,0 +1,216 @@
+# products/serving.py
+"""
+Static and media file serving for the app server.
+
+`django.conf.urls.static` reads whole files through Python, ignores Range
+and sends no validators, which makes video seeking impossible and every
+revisit a full download. `serve_file` answers conditional requests with
+304 from a stat() alone, serves single byte ranges, picks precompressed
+.br/.gz siblings, and either hands the file to the WSGI server's
+sendfile() or offloads it to the front proxy (X-Accel-Redirect /
+X-Sendfile) per FILE_SERVING_OFFLOAD.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+STATIC_CACHE_CONTROL = 'public, max-age=3600'
+# Uploads get a fresh name when replaced, so they can be cached longer
+MEDIA_CACHE_CONTROL = 'public, max-age=86400'
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+# Media types that gain nothing from compression
+INCOMPRESSIBLE = ('image/', 'video/', 'audio/', 'font/woff')
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    A file positioned at `start` that reads at most `length` bytes.
+
+    It keeps `fileno()`, so a WSGI server's file_wrapper can still use
+    sendfile(): the kernel copies from the current offset for the response's
+    Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def etag_for(stat, encoding=None):
+    tag = f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to ignore the
+    header (malformed or multi-range: the full file is a valid answer), or
+    False when it cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or not size:
+        return None if match is None else False
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def range_applies(request, etag, mtime):
+    """If-Range: only honour Range when the client's copy is still current."""
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+def _variant(path, content_type, request):
+    """The best precompressed sibling the client accepts, as (path, encoding)."""
+    if content_type.startswith(INCOMPRESSIBLE) or 'Range' in request.headers:
+        return path, None
+    accepted = {part.split(';')[0].strip() for part in request.headers.get('Accept-Encoding', '').split(',')}
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def offload_mode():
+    return getattr(settings, 'FILE_SERVING_OFFLOAD', None)
+
+
+def _offload(response, path, request):
+    if offload_mode() == 'x-accel-redirect':
+        prefix = getattr(settings, 'FILE_SERVING_ACCEL_PREFIX', '/internal')
+        response['X-Accel-Redirect'] = prefix + request.path
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _with_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def serve_file(request, path, cache_control):
+    """Serve the file at absolute `path`, which must already be inside a served root."""
+    if request.method not in ('GET', 'HEAD'):
+        response = HttpResponse(status=405)
+        response['Allow'] = 'GET, HEAD'
+        return response
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404('File not found')
+    if not os.path.isfile(path):
+        raise Http404('File not found')
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    # With an offloading proxy, ranges and precompressed files are its job
+    offload = offload_mode() and request.method == 'GET'
+    body_path, encoding = (path, None) if offload else _variant(path, content_type, request)
+    if encoding:
+        stat = os.stat(body_path)
+    etag = etag_for(stat, encoding)
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+    if not content_type.startswith(INCOMPRESSIBLE):
+        headers['Vary'] = 'Accept-Encoding'
+
+    if not_modified(request, etag, stat.st_mtime):
+        return _with_headers(HttpResponseNotModified(), headers)
+    if offload:
+        return _with_headers(_offload(HttpResponse(content_type=content_type), path, request), headers)
+
+    size = stat.st_size
+    status, start, length = 200, 0, size
+    if 'Range' in request.headers and range_applies(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            status, length = 206, end - start + 1
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    if request.method == 'HEAD':
+        response = HttpResponse(status=status, content_type=content_type)
+    else:
+        response = FileResponse(FileRange(open(body_path, 'rb'), start, length), status=status, content_type=content_type)
+    headers['Content-Length'] = str(length)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return _with_headers(response, headers)
+
+
+def serve_static(request, path):
+    from django.contrib.staticfiles import finders
+
+    if '..' in path.split('/'):
+        raise Http404('File not found')
+    found = finders.find(path.lstrip('/'))
+    if not found:
+        raise Http404('File not found')
+    return serve_file(request, found, STATIC_CACHE_CONTROL)
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    return serve_file(request, full_path, MEDIA_CACHE_CONTROL)
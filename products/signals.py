@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from . import facets, images, navigation, page_cache
+from .models import Category, Collection, Product
+from .search import index_product, unindex_product
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def update_facet_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Only touch the in-memory index once the row is really there
+        transaction.on_commit(lambda: facets.product_changed(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_facet_index(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: facets.product_removed(product_id))
+
+
+@receiver(post_delete, sender=Collection)
+def invalidate_facets_on_collection_delete(sender, instance, **kwargs):
+    # Products are detached with a bulk SET NULL that sends no signals
+    transaction.on_commit(facets.invalidate)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+def invalidate_navigation(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(navigation.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+def invalidate_page_cache(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(page_cache.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Collection)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_derivatives(instance):
+        pk = instance.pk
+        transaction.on_commit(lambda: images.schedule(sender, pk))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Collection)
+def delete_image_derivatives(sender, instance, **kwargs):
+    variants = instance.image_variants or {}
+    if variants.get('source'):
+        transaction.on_commit(lambda: images.delete_derivatives(variants))
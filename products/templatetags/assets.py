@@ -0,0 +1,11 @@
+from django import template
+
+from products.assets import get_bundle
+
+register = template.Library()
+
+
+@register.simple_tag
+def asset(name):
+    """URL of the hashed bundle built from the static source `name`."""
+    return get_bundle(name).url
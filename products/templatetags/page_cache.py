@@ -0,0 +1,40 @@
+from django import template
+
+from products.page_cache import PLACEHOLDER, SENTINEL
+
+register = template.Library()
+
+
+class PersonalizedNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        request = context.get('request')
+        holes = getattr(request, '_page_cache_holes', None)
+        if holes is None:
+            return self.nodelist.render(context)
+        # Recording a cacheable page: keep both shapes of the fragment and
+        # leave a placeholder for products.page_cache.fill_holes
+        with context.push(**{self.name: 0}):
+            empty = self.nodelist.render(context)
+        with context.push(**{self.name: SENTINEL}):
+            filled = self.nodelist.render(context)
+        holes.append((self.name, empty, filled))
+        return PLACEHOLDER.format(len(holes) - 1)
+
+
+@register.tag
+def personalized(parser, token):
+    """
+    {% personalized cart_count %}...{% endpersonalized %} marks a fragment
+    that depends on one per-visitor number, so cached pages can fill it in.
+    """
+    try:
+        tag_name, name = token.split_contents()
+    except ValueError:
+        raise template.TemplateSyntaxError(f'{token.contents.split()[0]} takes exactly one variable name')
+    nodelist = parser.parse(('endpersonalized',))
+    parser.delete_first_token()
+    return PersonalizedNode(name, nodelist)
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from products.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_cards(products):
+    """Render a run of product cards through the card fragment cache."""
+    return mark_safe('\n'.join(render_cards(products)))
@@ -0,0 +1,31 @@
+from django import template
+
+from products import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(obj, fmt='webp'):
+    """The srcset attribute value for `obj.image` in `fmt` ('webp' or 'jpeg')."""
+    return images.srcset(obj, fmt)
+
+
+@register.inclusion_tag('products/responsive_image.html')
+def responsive_image(obj, alt='', sizes='100vw', loading='lazy'):
+    """
+    A <picture> with WebP and JPEG srcsets and a blurred placeholder, or a
+    plain <img> while the derivatives are still being generated.
+    """
+    variants = obj.image_variants or {}
+    ready = bool(obj.image) and variants.get('source') == obj.image.name
+    return {
+        'image': obj.image,
+        'alt': alt,
+        'sizes': sizes,
+        'loading': loading,
+        'ready': ready,
+        'webp': images.srcset(obj, 'webp') if ready else '',
+        'jpeg': images.srcset(obj, 'jpeg') if ready else '',
+        'variants': variants,
+    }
@@ -0,0 +1,214 @@
+# products/testing.py
+"""
+Per-view query and render-time budgets for the test suites.
+
+Each app's tests.py has a QueryBudgetTests class listing a `View` per URL
+name in its urls.py. The test seeds a small but realistic shop (several
+products per category, reviews, a customer with orders, cart and
+wishlist), requests every view with cold caches and fails when a view
+runs more SQL queries than its budget or spends longer than its budget
+rendering templates, so an N+1 loop in a template shows up as a failure.
+Stripe runs against orders.fake_stripe. Order mail is only queued as
+OutgoingEmail rows in the outbox; nothing runs deliver_emails, so no SMTP
+connection is opened and nothing leaves the machine.
+"""
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.template.base import Template
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import cards, facets, navigation, page_cache
+from .models import Category, Collection, Product
+
+RENDER_BUDGET_MS = 300
+
+CUSTOMER_DETAILS = {
+    'full_name': 'Budget Customer', 'email': 'customer@example.com', 'address': 'Main 1',
+    'city': 'Praha', 'postal_code': '11000', 'country': 'CZ',
+}
+
+
+class View:
+    """
+    How to request one URL name and what it may cost. `args`, `data` and
+    `headers` may be callables taking the seeded shop; `prepare(test, shop)`
+    runs before the request; `login` is 'customer', 'staff' or None;
+    `scales` views list seeded rows, so their query count must not grow
+    with them.
+    """
+
+    def __init__(self, queries, method='get', args=(), data=None, headers=None, login='customer', json=False,
+                 render_ms=RENDER_BUDGET_MS, status=(200, 302), prepare=None, scales=False):
+        self.queries = queries
+        self.method = method
+        self.args = args
+        self.data = data
+        self.headers = headers
+        self.login = login
+        self.json = json
+        self.render_ms = render_ms
+        self.status = status
+        self.prepare = prepare
+        self.scales = scales
+
+
+class Shop:
+    """The seeded data, handed to `View` callables."""
+
+
+def seed_shop(products_per_category=6):
+    from accounts.models import Wishlist
+    from orders.cart import DatabaseCartStore
+    from orders.checkout import place_order
+    from orders.models import Review
+
+    shop = Shop()
+    shop.customer = User.objects.create_user('customer', 'customer@example.com', 'pw')
+    shop.staff = User.objects.create_superuser('staff', 'staff@example.com', 'pw')
+    reviewers = [User.objects.create_user(f'reviewer{n}') for n in range(3)]
+    shop.collection = Collection.objects.create(name='Evening')
+    shop.categories = [Category.objects.create(name=name) for name in ('Floral', 'Woody', 'Citrus')]
+    shop.products = [
+        Product.objects.create(
+            name=f'{category.name} {n}', description='Budget seed', price=300 + 50 * n,
+            image='products/seed.jpg', category=category, collection=shop.collection if n % 2 else None,
+            stock_quantity=50, is_featured=n == 0, is_new=n == 1,
+        )
+        for category in shop.categories
+        for n in range(products_per_category)
+    ]
+    shop.product = shop.products[0]
+    for product in shop.products[:4]:
+        for rating, reviewer in enumerate(reviewers, start=3):
+            Review.objects.create(product=product, user=reviewer, rating=rating, comment='Lovely')
+    for product in shop.products[:3]:
+        Wishlist.objects.create(user=shop.customer, product=product)
+    shop.orders = [
+        place_order(shop.customer, [
+            {'product': product, 'quantity': 2, 'total': product.price * 2}
+            for product in shop.products[start:start + 3]
+        ], sum(product.price * 2 for product in shop.products[start:start + 3]), CUSTOMER_DETAILS)
+        for start in range(0, 12, 3)
+    ]
+    shop.order = shop.orders[0]
+    cart = DatabaseCartStore(user=shop.customer)
+    for product in shop.products[5:8]:
+        cart.add(product.id, 1)
+    return shop
+
+
+def grow_shop(shop, rows=10):
+    """Add `rows` more of every list the seeded pages show: products, reviews, wishlist, cart, orders and lines."""
+    from accounts.models import Wishlist
+    from orders.cart import DatabaseCartStore
+    from orders.checkout import place_order
+    from orders.models import OrderItem, Review
+
+    extra = [
+        Product.objects.create(
+            name=f'{category.name} extra {n}', description='Grown', price=400 + n, image='products/seed.jpg',
+            category=category, collection=shop.collection, stock_quantity=50,
+        )
+        for category in shop.categories
+        for n in range(rows)
+    ]
+    for n in range(rows):
+        reviewer = User.objects.create_user(f'grown-reviewer{n}')
+        Review.objects.create(product=shop.product, user=reviewer, rating=n % 5 + 1, comment='More')
+    cart = DatabaseCartStore(user=shop.customer)
+    for product in extra[:rows]:
+        Wishlist.objects.create(user=shop.customer, product=product)
+        cart.add(product.id, 1)
+        place_order(shop.customer, [{'product': product, 'quantity': 1, 'total': product.price}], product.price,
+                    CUSTOMER_DETAILS)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=shop.order, product=product, quantity=1, price=product.price) for product in extra[rows:2 * rows]
+    ])
+
+
+def reset_caches():
+    cache.clear()
+    navigation.reset()
+    page_cache.reset()
+    facets.reset_index()
+    cards.reset_stats()
+
+
+class QueryBudgetMixin:
+    """Mix into a TestCase; set `urlconf` (an app's urls module) and `views`."""
+
+    urlconf = None
+    views = {}
+
+    def setUp(self):
+        super().setUp()
+        reset_caches()
+        self.shop = seed_shop()
+
+    def _resolve(self, value):
+        return value(self.shop) if callable(value) else value
+
+    def measure(self, name, view):
+        """Request the view once; returns (response, queries, render milliseconds)."""
+        self.client.logout()
+        if view.login:
+            self.client.force_login(getattr(self.shop, view.login))
+        if view.prepare:
+            view.prepare(self, self.shop)
+        url = reverse(f'{self.urlconf.app_name}:{name}', args=self._resolve(view.args))
+        data = self._resolve(view.data)
+        extra = {'content_type': 'application/json'} if view.json else {}
+        if view.headers:
+            extra['headers'] = self._resolve(view.headers)
+
+        rendering = [0.0, 0]  # seconds, nesting depth
+        render = Template.render
+
+        def timed_render(template, context):
+            # Includes render inside their parent, count the outermost only
+            rendering[1] += 1
+            start = time.perf_counter()
+            try:
+                return render(template, context)
+            finally:
+                rendering[1] -= 1
+                if not rendering[1]:
+                    rendering[0] += time.perf_counter() - start
+
+        with mock.patch.object(Template, 'render', timed_render), \
+                CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, view.method)(url, data, **extra)
+        return response, len(queries), rendering[0] * 1000
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in self.urlconf.urlpatterns if pattern.name}
+        self.assertEqual(names, set(self.views))
+
+    def test_views_stay_within_budget(self):
+        for name, view in self.views.items():
+            with self.subTest(view=name), transaction.atomic():
+                reset_caches()
+                response, queries, render_ms = self.measure(name, view)
+                # Each view starts from the same seeded shop
+                transaction.set_rollback(True)
+                self.assertIn(response.status_code, view.status)
+                self.assertLessEqual(queries, view.queries, f'{name} ran {queries} queries')
+                self.assertLessEqual(render_ms, view.render_ms, f'{name} took {render_ms:.0f} ms to render')
+
+    def test_list_views_do_not_grow_with_rows(self):
+        for name, view in self.views.items():
+            if not view.scales:
+                continue
+            with self.subTest(view=name), transaction.atomic():
+                reset_caches()
+                _, few, _ = self.measure(name, view)
+                grow_shop(self.shop)
+                reset_caches()
+                _, many, _ = self.measure(name, view)
+                transaction.set_rollback(True)
+                self.assertEqual(few, many, f'{name} ran {few} queries, then {many} with more rows')
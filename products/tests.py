@@ -1,3 +1,846 @@
-from django.test import TestCase
+import pstats
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from golden_fragrance import profiling
+from orders.models import Order, OrderItem, OrderNumberCounter, Review
+from . import assets, cards, facets, images, navigation, page_cache, recommendations, urls, versions
+from .dataset import Dataset
+from .models import Category, Collection, Product
+from .pagination import SORTS, paginate
+from .search import rebuild_index, search_products
+from .testing import QueryBudgetMixin, View, reset_caches
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Oriental')
+        self.product = Product.objects.create(
+            name='Oud Royal', description='Smoky oud', price=1200,
+            image='products/oud.jpg', category=self.category,
+        )
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+
+    def assertAggregates(self, count, total, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, count)
+        self.assertEqual(self.product.rating_sum, total)
+        self.assertEqual(self.product.rating_histogram, histogram)
+        self.assertAlmostEqual(self.product.rating_average, total / count if count else 0)
+
+    def test_create_update_delete_keep_aggregates_current(self):
+        review = Review.objects.create(user=self.alice, product=self.product, rating=5, comment='')
+        Review.objects.create(user=self.bob, product=self.product, rating=2, comment='')
+        self.assertAggregates(2, 7, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        review.rating = 3
+        review.save()
+        self.assertAggregates(2, 5, {1: 0, 2: 1, 3: 1, 4: 0, 5: 0})
+
+        review.delete()
+        self.assertAggregates(1, 2, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+    def test_add_review_view_updates_aggregates(self):
+        self.client.force_login(self.alice)
+        url = reverse('products:add_review', args=[self.product.id])
+        self.client.post(url, {'rating': '4', 'comment': 'Lovely'})
+        self.client.post(url, {'rating': '1', 'comment': 'Changed my mind'})
+        self.assertAggregates(1, 1, {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rebuild_command_repairs_drift(self):
+        Review.objects.create(user=self.alice, product=self.product, rating=4, comment='')
+        Product.objects.filter(pk=self.product.pk).update(rating_count=9, rating_sum=0, rating_4_count=0)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.assertAggregates(1, 4, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+
+    def test_unrated_product_shows_no_rating(self):
+        self.assertIsNone(self.product.average_rating)
+        response = self.client.get(reverse('products:product_detail', args=[self.product.id]))
+        self.assertContains(response, '(No ratings yet)')
+        self.assertNotContains(response, 'star filled')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Floral')
+        self.in_description = Product.objects.create(
+            name='Garden Party', description='Svěží tóny růže a jasmínu',
+            price=900, image='products/garden.jpg', category=category,
+        )
+        self.in_name = Product.objects.create(
+            name='Růžová Zahrada', description='Jemná kytice',
+            price=1100, image='products/zahrada.jpg', category=category,
+        )
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query))
+
+    def test_diacritics_are_folded(self):
+        self.assertEqual(set(self.search('ruz')), {self.in_description, self.in_name})
+        self.assertEqual(self.search('JASMINU'), [self.in_description])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search('ruz')[0], self.in_name)
+
+    def test_index_follows_product_changes(self):
+        self.in_name.name = 'Levandule'
+        self.in_name.save()
+        self.assertEqual(self.search('levandule'), [self.in_name])
+        self.in_name.delete()
+        self.assertEqual(self.search('levandule'), [])
+
+    def test_rebuild_index(self):
+        Product.objects.filter(pk=self.in_name.pk).update(name='Tabák')
+        self.assertEqual(self.search('tabak'), [])
+        self.assertEqual(rebuild_index(), 2)
+        self.assertEqual(self.search('tabak'), [self.in_name])
+
+    def test_product_list_uses_search(self):
+        response = self.client.get(reverse('products:product_list'), {'q': 'zahrada'})
+        self.assertEqual(list(response.context['products']), [self.in_name])
+
+    @override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+    def test_filters_see_matches_beyond_the_ranked_ones(self):
+        reset_caches()
+        crowded = Category.objects.create(name='Oud')
+        other = Category.objects.create(name='Woody')
+        Product.objects.bulk_create(
+            Product(name=f'Oud {i}', description='Smoky', price=900, image='products/oud.jpg',
+                    category=crowded if i < 1005 else other)
+            for i in range(1008)
+        )
+        rebuild_index()
+        response = self.client.get(reverse('products:search_by_category', args=[other.id]), {'q': 'oud'})
+        self.assertEqual([product.name for product in response.context['products']], ['Oud 1005', 'Oud 1006', 'Oud 1007'])
+        self.assertEqual(response.context['result_count'], 3)
+        self.assertEqual(len(self.search('oud')), 1008)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Fresh')
+        self.collection = Collection.objects.create(name='Summer')
+        # Repeated prices and ratings make the id tie-breaker matter
+        for i in range(30):
+            Product.objects.create(
+                name=f'Perfume {i}', description='Citrus', price=500 + (i % 4) * 100,
+                image='products/p.jpg', category=self.category,
+                collection=self.collection if i % 2 else None,
+                rating_average=i % 3, units_sold=i % 5,
+            )
+
+    def walk(self, sort, page_size=7):
+        seen, cursor = [], None
+        while True:
+            page = paginate(Product.objects.all(), sort, cursor, page_size=page_size)
+            seen.extend(product.pk for product in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_every_sort_visits_each_product_once_in_order(self):
+        for sort, keys in SORTS.items():
+            if sort == 'relevance':
+                continue
+            with self.subTest(sort=sort):
+                ordering = [f'-{field}' if descending else field for field, descending in keys]
+                expected = list(Product.objects.order_by(*ordering).values_list('pk', flat=True))
+                self.assertEqual(self.walk(sort), expected)
+
+    def test_deep_page_costs_one_query(self):
+        cursor = paginate(Product.objects.all(), 'price_asc', page_size=25).next_cursor
+        with self.assertNumQueries(1):
+            page = paginate(Product.objects.all(), 'price_asc', cursor, page_size=25)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next)
+
+    def test_tampered_cursor_starts_from_first_page(self):
+        first = paginate(Product.objects.all(), 'newest', page_size=5)
+        page = paginate(Product.objects.all(), 'newest', first.next_cursor + 'x', page_size=5)
+        self.assertEqual(page.items, first.items)
+
+    def test_load_more_endpoint(self):
+        response = self.client.get(reverse('products:product_list'), {'sort': 'price_desc'})
+        self.assertEqual(len(response.context['products']), 24)
+        cursor = response.context['page'].next_cursor
+
+        data = self.client.get(reverse('products:product_list_more'), {'sort': 'price_desc', 'cursor': cursor}).json()
+        self.assertEqual(data['count'], 6)
+        self.assertFalse(data['has_next'])
+        self.assertIn('product-card', data['html'])
+
+    def test_collection_listing_is_paginated(self):
+        response = self.client.get(reverse('products:search_by_collection', args=[self.collection.id]))
+        self.assertEqual(len(response.context['products']), 15)
+
+
+class UnitsSoldTests(TestCase):
+    def test_units_sold_follow_orders(self):
+        category = Category.objects.create(name='Woody')
+        product = Product.objects.create(
+            name='Cedar', description='Woody', price=800, image='products/c.jpg', category=category,
+        )
+        user = User.objects.create_user('carol', password='pw')
+        order = Order.objects.create(
+            user=user, full_name='Carol', email='carol@example.com', address='Main 1',
+            city='Praha', postal_code='11000', country='CZ', total_amount=1600,
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=2, price=800)
+        product.refresh_from_db()
+        self.assertEqual(product.units_sold, 2)
+
+        order.status = 'cancelled'
+        order.save()
+        product.refresh_from_db()
+        self.assertEqual(product.units_sold, 0)
+
+        order.status = 'pending'
+        order.save()
+        order.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.units_sold, 0)
+
+
+@override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        facets.reset_index()
+        self.floral = Category.objects.create(name='Floral')
+        self.woody = Category.objects.create(name='Woody')
+        self.summer = Collection.objects.create(name='Summer')
+        self.rose = self.make('Rose', self.floral, 450, stock=3, collection=self.summer)
+        self.lily = self.make('Lily', self.floral, 1500, original_price=1800, is_new=True)
+        self.cedar = self.make('Cedar', self.woody, 1200, stock=1, original_price=1500)
+        self.oud = self.make('Oud', self.woody, 5000, stock=2, collection=self.summer)
+
+    def make(self, name, category, price, stock=0, **extra):
+        return Product.objects.create(
+            name=name, description=name, price=price, image='products/p.jpg',
+            category=category, stock_quantity=stock, **extra,
+        )
+
+    def counts(self, **selection):
+        return facets.get_index().counts(selection)
+
+    def test_counts_without_selection(self):
+        counts = self.counts()
+        self.assertEqual(counts['category'], {str(self.floral.id): 2, str(self.woody.id): 2})
+        self.assertEqual(counts['price'], {'lt500': 1, '1000-2000': 2, '4000plus': 1})
+        self.assertEqual(counts['sale'], {'1': 2})
+        self.assertEqual(counts['stock'], {'1': 3})
+        self.assertEqual(counts['new'], {'1': 1})
+
+    def test_counts_are_disjunctive_within_a_facet(self):
+        counts = self.counts(category=[str(self.floral.id)], stock=['1'])
+        # Ticking woody as well would add cedar and oud
+        self.assertEqual(counts['category'], {str(self.floral.id): 1, str(self.woody.id): 2})
+        self.assertEqual(counts['stock'], {'1': 1})
+        self.assertEqual(counts['sale'], {'1': 0})
+
+    def test_bitsets_agree_with_sql_filter(self):
+        selection = {'category': [str(self.floral.id), str(self.woody.id)], 'price': ['1000-2000', '4000plus'], 'stock': ['1']}
+        index = facets.get_index()
+        expected = set(facets.filter_queryset(Product.objects.all(), selection).values_list('pk', flat=True))
+        self.assertEqual(expected, {self.cedar.pk, self.oud.pk})
+        self.assertEqual(index.matching(selection).bit_count(), len(expected))
+
+    def test_product_save_updates_index(self):
+        facets.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rose.stock_quantity = 0
+            self.rose.save()
+        self.assertEqual(self.counts()['stock'], {'1': 2})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oud.delete()
+        self.assertEqual(self.counts()['stock'], {'1': 1})
+
+    def test_other_worker_change_triggers_rebuild(self):
+        facets.get_index()
+        # Another process changed a product and bumped the version
+        Product.objects.filter(pk=self.lily.pk).update(stock_quantity=5)
+        versions.bump(facets.VERSION_KEY)
+        self.assertEqual(self.counts()['stock'], {'1': 4})
+
+    def test_listing_multi_select(self):
+        response = self.client.get(reverse('products:product_list'), {
+            'category': [self.floral.id, self.woody.id], 'sale': '1',
+        })
+        self.assertEqual({p.pk for p in response.context['products']}, {self.lily.pk, self.cedar.pk})
+        self.assertEqual(response.context['result_count'], 2)
+        self.assertContains(response, 'On Sale')
+
+
+class NavigationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        navigation.reset()
+        self.category = Category.objects.create(name='Citrus')
+        Collection.objects.create(name='Winter')
+        self.user = User.objects.create_user('dave', password='pw')
+
+    def test_navigation_is_loaded_once_per_version(self):
+        self.client.get(reverse('products:category_list'))
+        with self.assertNumQueries(0):
+            self.assertEqual([c.name for c in navigation.get_categories()], ['Citrus'])
+            self.assertEqual([c.name for c in navigation.get_collections()], ['Winter'])
+
+    @override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+    def test_category_change_bumps_version(self):
+        navigation.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Aquatic')
+        self.assertEqual([c.name for c in navigation.get_categories()], ['Citrus', 'Aquatic'])
+
+    @override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+    def test_bump_from_another_worker_is_seen(self):
+        navigation.get_collections()
+        Collection.objects.filter(name='Winter').update(is_active=False)
+        versions.bump(navigation.VERSION_KEY)
+        self.assertEqual(navigation.get_collections(), [])
+
+    def test_category_missing_from_the_cache_is_read_from_the_db(self):
+        navigation.get_categories()
+        category = Category.objects.create(name='Aquatic')
+        response = self.client.get(reverse('products:search_by_category', args=[category.id]))
+        self.assertEqual(response.context['category'], category)
+        response = self.client.get(reverse('products:search_by_category', args=[category.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_wishlist_count_is_memoized_per_request(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('products:category_list'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('products:category_list'))
+        wishlist_queries = [q for q in queries.captured_queries if 'accounts_wishlist' in q['sql']]
+        self.assertEqual(len(wishlist_queries), 1)
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cards.reset_stats()
+        category = Category.objects.create(name='Gourmand')
+        self.products = [
+            Product.objects.create(
+                name=f'Vanilla {i}', description='Sweet', price=700, image='products/v.jpg', category=category,
+            )
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user('erin', password='pw')
+
+    def test_second_render_is_all_hits(self):
+        first = cards.render_cards(self.products)
+        with self.assertNumQueries(0):
+            second = cards.render_cards(self.products)
+        self.assertEqual(first, second)
+        self.assertEqual(cards.stats()['process'], {'hits': 3, 'misses': 3, 'hit_rate': 0.5})
+
+    def test_product_save_and_review_change_invalidate_only_that_card(self):
+        cards.render_cards(self.products)
+        self.products[0].name = 'Vanilla Noir'
+        self.products[0].save()
+        Review.objects.create(user=self.user, product=self.products[1], rating=2, comment='')
+        self.products[1].refresh_from_db()
+        cards.reset_stats()
+
+        rendered = cards.render_cards(self.products)
+        self.assertIn('Vanilla Noir', rendered[0])
+        self.assertIn('(2.0)', rendered[1])
+        self.assertEqual(cards.stats()['process']['misses'], 2)
+
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse('products:card_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertIn('hit_rate', self.client.get(url).json()['cache'])
+
+
+@override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Amber')
+        self.product = Product.objects.create(
+            name='Amber Night', description='Warm', price=1500, image='products/a.jpg', category=self.category,
+        )
+        self.url = reverse('products:product_detail', args=[self.product.id])
+
+    def test_second_anonymous_visit_skips_orm_and_templates(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(1):  # the version stamp check
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertIsNone(response.context)
+        self.assertContains(response, 'Amber Night')
+
+    def test_cart_badge_is_filled_per_visitor(self):
+        self.client.get(self.url)
+        self.client.post(
+            reverse('orders:add_to_cart', args=[self.product.id]),
+            data='{"quantity": 3}', content_type='application/json',
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, '<span class="cart-badge">3</span>', html=True)
+        self.assertNotContains(response, str(page_cache.SENTINEL))
+        self.assertNotContains(response, 'page-hole')
+
+        other_visitor = self.client_class()
+        self.assertNotContains(other_visitor.get(self.url), 'cart-badge">3<')
+
+    def test_product_change_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Amber Dawn'
+            self.product.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Amber Dawn')
+
+    def test_review_change_invalidates(self):
+        self.client.get(self.url)
+        user = User.objects.create_user('fred', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=user, product=self.product, rating=1, comment='Too sweet')
+        self.assertContains(self.client.get(self.url), 'Too sweet')
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(User.objects.create_user('gina', password='pw'))
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertIsNotNone(response.context)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Citrus')
+        self.products = [
+            Product.objects.create(
+                name=f'Citrus {n}', description='Fresh', price=500, image='products/c.jpg', category=category,
+            )
+            for n in range(5)
+        ]
+        self.user = User.objects.create_user('hana', password='pw')
+
+    def order(self, *products, status='pending'):
+        order = Order.objects.create(
+            user=self.user, full_name='Hana', email='hana@example.com', address='Main 1',
+            city='Praha', postal_code='11000', country='CZ', total_amount=500, status=status,
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=500)
+        return order
+
+    def test_cooccurrence_counts_pairs_per_basket(self):
+        a, b, counts = recommendations.cooccurrence([1, 1, 1, 2, 2, 2], [10, 20, 30, 10, 20, 20])
+        pairs = dict(zip(zip(a.tolist(), b.tolist()), counts.tolist()))
+        self.assertEqual(pairs, {(10, 20): 2, (20, 10): 2, (10, 30): 1, (30, 10): 1, (20, 30): 1, (30, 20): 1})
+
+    def test_rebuild_ranks_frequent_pairs_first(self):
+        p0, p1, p2, p3, p4 = self.products
+        self.order(p0, p1)
+        self.order(p0, p1)
+        self.order(p0, p2)
+        self.order(p0, p3, status='cancelled')
+        recommendations.rebuild(include_wishlists=False)
+        self.assertEqual(list(recommendations.recommended_for(p0)), [p1, p2])
+
+        # Top-N and the product page read the stored neighbours in one query
+        recommendations.rebuild(include_wishlists=False, n=1)
+        self.assertEqual(list(recommendations.recommended_for(p0)), [p1])
+        with self.assertNumQueries(1):
+            list(recommendations.recommended_for(p0))
+        response = self.client.get(reverse('products:product_detail', args=[p0.id]))
+        self.assertEqual(list(response.context['related_products']), [p1])
+
+    def test_refresh_only_touches_new_orders(self):
+        p0, p1, p2, p3, p4 = self.products
+        self.order(p0, p1)
+        recommendations.rebuild(include_wishlists=False)
+        self.assertEqual(recommendations.refresh(include_wishlists=False), (0, 0))
+
+        self.order(p3, p4)
+        refreshed, stored = recommendations.refresh(include_wishlists=False)
+        self.assertEqual(refreshed, 2)
+        self.assertEqual(list(recommendations.recommended_for(p3)), [p4])
+        self.assertEqual(list(recommendations.recommended_for(p0)), [p1])
+
+    def test_refresh_drops_cancelled_orders(self):
+        p0, p1, p2, p3, p4 = self.products
+        self.order(p0, p1)
+        order = self.order(p0, p2)
+        recommendations.rebuild(include_wishlists=False)
+        self.assertEqual(list(recommendations.recommended_for(p2)), [p0])
+
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(recommendations.refresh(include_wishlists=False)[0], 2)
+        self.assertEqual(list(recommendations.recommended_for(p0)), [p1])
+        self.assertEqual(list(recommendations.recommended_for(p2)), [])
+        self.assertEqual(recommendations.refresh(include_wishlists=False), (0, 0))
+
+    def test_wishlists_are_blended_in(self):
+        from accounts.models import Wishlist
+
+        p0, p1, p2, p3, p4 = self.products
+        self.order(p0, p1)
+        Wishlist.objects.create(user=self.user, product=p0)
+        Wishlist.objects.create(user=self.user, product=p4)
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual(list(recommendations.recommended_for(p0)), [p1, p4])
+        call_command('build_recommendations', '--no-wishlists', stdout=StringIO())
+        self.assertEqual(list(recommendations.recommended_for(p0)), [p1])
+
+
+def png_upload(name, size):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGBA', size, (200, 120, 40, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_DERIVATIVE_WORKERS=0, CACHE_VERSION_CHECK_INTERVAL=0)
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.category = Category.objects.create(name='Musk')
+
+    def make(self, name='bottle.png', size=(1000, 500)):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name='Musk', description='Soft', price=900, category=self.category, image=png_upload(name, size),
+            )
+        product.refresh_from_db()
+        return product
+
+    def test_upload_builds_derivatives_and_placeholder(self):
+        product = self.make()
+        variants = product.image_variants
+        self.assertEqual(variants['widths'], [160, 320, 480, 800, 1000])
+        self.assertEqual((variants['width'], variants['height']), (1000, 500))
+        self.assertTrue(variants['placeholder'].startswith('data:image/jpeg;base64,'))
+        for width in variants['widths']:
+            for fmt in images.FORMATS:
+                self.assertTrue(default_storage.exists(images.derivative_name(product.image.name, width, fmt)))
+        self.assertIn('-320w.webp 320w', images.srcset(product))
+
+        response = self.client.get(reverse('products:product_detail', args=[product.id]))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '-480w.jpeg 480w')
+
+    def test_small_images_are_not_upscaled(self):
+        self.assertEqual(self.make(size=(300, 300)).image_variants['widths'], [160, 300])
+
+    def test_replacing_the_image_drops_old_derivatives(self):
+        product = self.make()
+        old = images.derivative_name(product.image.name, 160, 'webp')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = png_upload('other.png', (400, 400))
+            product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['widths'], [160, 320, 400])
+        self.assertFalse(default_storage.exists(old))
+
+    def test_backfill_command(self):
+        product = self.make()
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+        out = StringIO()
+        call_command('build_image_derivatives', '--workers', '1', stdout=out)
+        self.assertIn('Built derivatives for 1 images', out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+
+
+class AssetBundleTests(TestCase):
+    def test_minify_css_keeps_strings(self):
+        css = '/* note */\n.a  >  .b {\n  content: "a ;  b";\n  color: red;\n}\n'
+        self.assertEqual(assets.minify_css(css), '.a>.b{content:"a ;  b";color:red}')
+
+    def test_minify_js_leaves_template_literals_alone(self):
+        js = (
+            '  // note\n'
+            '  const url = "http://x"; // trailing\n'
+            '  card.innerHTML = `\n'
+            '    <p>${name}</p>\n'
+            '\n'
+            '    // not a comment\n'
+            '  `;\n'
+            '  done();\n'
+        )
+        self.assertEqual(assets.minify_js(js), (
+            'const url = "http://x"; // trailing\n'
+            'card.innerHTML = `\n'
+            '    <p>${name}</p>\n'
+            '\n'
+            '    // not a comment\n'
+            '  `;\n'
+            'done();'
+        ))
+
+    def test_pages_link_hashed_bundles(self):
+        response = self.client.get(reverse('products:category_list'))
+        bundle = assets.get_bundle('css/site.css')
+        self.assertContains(response, f'href="{bundle.url}"')
+        self.assertNotContains(response, '<style>')
+
+    def test_bundles_are_precompressed_and_immutable(self):
+        bundle = assets.get_bundle('css/site.css')
+        response = self.client.get(bundle.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Cache-Control'], assets.IMMUTABLE)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response.content, bundle.gzip)
+
+        plain = self.client.get(bundle.url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain.content, bundle.content)
+
+        self.assertEqual(self.client.get(bundle.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        stale = self.client.get(bundle.url.replace(bundle.digest, '0' * 12))
+        self.assertEqual(stale['Cache-Control'], 'no-cache')
+        self.assertEqual(self.client.get('/assets/css/missing.0123456789ab.css').status_code, 404)
+
+
+class FileServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.body = bytes(range(256)) * 40
+        with open(f'{self.media_root}/clip.mp4', 'wb') as f:
+            f.write(self.body)
+        self.url = '/media/clip.mp4'
+
+    def test_full_response_has_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(self.body)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.body)}')
+        self.assertEqual(b''.join(response.streaming_content), self.body[100:200])
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(suffix.streaming_content), self.body[-10:])
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.body)}-').status_code, 416)
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_precompressed_variant(self):
+        import gzip
+
+        with open(f'{self.media_root}/app.js', 'w') as f:
+            f.write('console.log(1);\n')
+        with open(f'{self.media_root}/app.js.gz', 'wb') as f:
+            f.write(gzip.compress(b'console.log(1);\n'))
+        response = self.client.get('/media/app.js', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'console.log(1);\n')
+        self.assertFalse(self.client.get('/media/app.js').has_header('Content-Encoding'))
+
+    @override_settings(FILE_SERVING_OFFLOAD='x-accel-redirect')
+    def test_offload_to_proxy(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response['X-Accel-Redirect'], '/internal/media/clip.mp4')
+        self.assertEqual(response.content, b'')
+
+    def test_paths_outside_the_root(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/static/videos/from.mp4', HTTP_RANGE='bytes=0-0').status_code, 206)
+
+
+
+class DatasetTests(TestCase):
+    options = dict(categories=3, collections=2, products=40, users=15, orders=120, reviews=60, wishlists=30,
+                   batch_size=25, now=timezone.make_aware(datetime(2026, 6, 30, 12)))
+
+    def generate(self, seed=1):
+        """Generate, read the rows back and roll them away."""
+        with transaction.atomic():
+            created = Dataset(seed=seed, **self.options).generate()
+            rows = list(
+                Order.objects.order_by('pk')
+                .values_list('order_number', 'user__username', 'status', 'total_amount', 'created_at')
+            )
+            lines = list(OrderItem.objects.order_by('pk').values_list('product__name', 'quantity', 'price'))
+            transaction.set_rollback(True)
+        return created, rows, lines
+
+    def test_same_seed_same_rows(self):
+        created, rows, lines = self.generate()
+        self.assertEqual(created['orders'], 120)
+        self.assertGreaterEqual(created['order_items'], 120)
+        self.assertEqual(self.generate(), (created, rows, lines))
+        self.assertNotEqual(self.generate(seed=2)[1], rows)
+
+    def test_rows_are_consistent(self):
+        created = Dataset(seed=3, **self.options).generate()
+        self.assertEqual(Review.objects.count(), 60)
+        # Denormalized counters were rebuilt after the bulk inserts
+        sold = OrderItem.objects.exclude(order__status='cancelled').aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(Product.objects.aggregate(total=Sum('units_sold'))['total'], sold)
+        self.assertEqual(Product.objects.aggregate(total=Sum('rating_count'))['total'], 60)
+        for order in Order.objects.all()[:20]:
+            self.assertTrue(order.order_number.startswith(f"GF{order.created_at:%Y%m%d}"))
+            self.assertEqual(order.total_amount, sum(item.total_price for item in order.items.all()))
+        # The allocator carries on after the generated numbers of each day
+        self.assertEqual(created['categories'], 3)
+        for counter in OrderNumberCounter.objects.all():
+            self.assertEqual(Order.objects.filter(order_number__startswith=f'GF{counter.day:%Y%m%d}').count(), counter.last)
+
+    def test_impossible_counts_fail_before_writing(self):
+        with self.assertRaisesMessage(CommandError, 'At most 600 reviews fit'):
+            call_command('generate_dataset', '--products', '40', '--users', '15', '--reviews', '601',
+                         '--orders', '10', stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+
+@override_settings(REQUEST_PROFILING=True, REQUEST_PROFILE_RATE=0, REQUEST_PROFILE_SLOW_MS=None,
+                   CACHE_VERSION_CHECK_INTERVAL=0)
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Chypre')
+        self.product = Product.objects.create(
+            name='Mousse', description='Oakmoss', price=700, image='products/m.jpg', category=category,
+        )
+        self.user = User.objects.create_user('ivo', password='pw', is_staff=True)
+        self.client.force_login(self.user)
+        self.profiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles)
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response.headers['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_header_reports_queries_templates_and_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('products:product_detail', args=[self.product.pk]))
+        timing = self.server_timing(response)
+        self.assertEqual(timing['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(timing['tpl']['dur']), 0)
+        self.assertLessEqual(float(timing['view']['dur']), float(timing['total']['dur']))
+        self.assertNotIn('profile', timing)
+
+    def test_header_is_for_staff_and_internal_ips_only(self):
+        customer = User.objects.create_user('eva', password='pw')
+        self.client.force_login(customer)
+        with override_settings(REQUEST_PROFILE_RATE=1, REQUEST_PROFILE_DIR=self.profiles):
+            response = self.client.get(reverse('products:product_list'))
+        self.assertNotIn('Server-Timing', response.headers)
+        # Still profiled, just not told
+        self.assertEqual(len(list(Path(self.profiles).iterdir())), 1)
+        with override_settings(INTERNAL_IPS=['127.0.0.1']):
+            self.assertIn('Server-Timing', self.client.get(reverse('products:product_list')).headers)
+        with override_settings(REQUEST_PROFILING_HEADER=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('products:product_list')).headers)
+
+    def test_oldest_profiles_are_deleted_beyond_the_cap(self):
+        for n in range(3):
+            (Path(self.profiles) / f'20000101-00000{n}-1ms-GET-old.prof').write_text('')
+        with override_settings(REQUEST_PROFILE_RATE=1, REQUEST_PROFILE_DIR=self.profiles, REQUEST_PROFILE_MAX_FILES=2):
+            response = self.client.get(reverse('products:product_list'))
+        name = self.server_timing(response)['profile']['desc'].strip('"')
+        self.assertEqual(sorted(path.name for path in Path(self.profiles).iterdir()),
+                         ['20000101-000002-1ms-GET-old.prof', name])
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_off_leaves_responses_alone(self):
+        response = self.client.get(reverse('products:product_list'))
+        self.assertNotIn('Server-Timing', response.headers)
+
+    async def test_async_views_count_queries_run_in_threads(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('orders:checkout'))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(self.server_timing(response)['db']['desc'], '"0 queries"')
+
+    def test_sampled_requests_are_written_as_cprofile(self):
+        with override_settings(REQUEST_PROFILE_RATE=1, REQUEST_PROFILE_DIR=self.profiles):
+            response = self.client.get(reverse('products:product_list'))
+        name = self.server_timing(response)['profile']['desc'].strip('"')
+        self.assertRegex(name, r'-GET-products-\w+\.prof$')
+        stats = pstats.Stats(str(Path(self.profiles) / name))
+        self.assertTrue(any(function == 'product_list' for _, _, function in stats.stats))
+
+    def test_slow_requests_are_written_as_stack_samples(self):
+        render = profiling._render
+
+        def slow_render(template, context):
+            time.sleep(0.05)
+            return render(template, context)
+
+        with override_settings(REQUEST_PROFILE_SLOW_MS=20, REQUEST_PROFILE_DIR=self.profiles), \
+                mock.patch.object(profiling, '_render', slow_render):
+            response = self.client.get(reverse('products:product_list'))
+        name = self.server_timing(response)['profile']['desc'].strip('"')
+        stacks = (Path(self.profiles) / name).read_text().splitlines()
+        self.assertTrue(stacks)
+        self.assertTrue(any('product_list (views.py' in stack and 'slow_render' in stack for stack in stacks))
+        self.assertTrue(all(stack.rsplit(' ', 1)[1].isdigit() for stack in stacks))
+
+    def test_fast_requests_leave_no_samples(self):
+        with override_settings(REQUEST_PROFILE_SLOW_MS=60000, REQUEST_PROFILE_DIR=self.profiles):
+            response = self.client.get(reverse('products:product_list'))
+        self.assertNotIn('profile', self.server_timing(response))
+        self.assertEqual(list(Path(self.profiles).iterdir()), [])
+
+
+@override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = urls
+    views = {
+        'product_list': View(13, scales=True),
+        'product_list_more': View(1, data={'sort': 'newest'}, scales=True),
+        'card_cache_stats': View(2, login='staff'),
+        'category_list': View(12, scales=True),
+        'collection_list': View(10, scales=True),
+        'product_detail': View(12, args=lambda shop: [shop.product.pk], scales=True),
+        'search_by_collection': View(14, args=lambda shop: [shop.collection.pk], scales=True),
+        'search_by_category': View(14, args=lambda shop: [shop.categories[0].pk], scales=True),
+        'add_review': View(8, 'post', args=lambda shop: [shop.product.pk], data={'rating': 5, 'comment': 'Great'}),
+    }
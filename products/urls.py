@@ -6,6 +6,8 @@ app_name = 'products'
 
 urlpatterns = [
     path('', views.product_list, name='product_list'),
+    path('load-more/', views.product_list_more, name='product_list_more'),
+    path('card-cache-stats/', views.card_cache_stats, name='card_cache_stats'),
     path('categories/', views.category_list, name='category_list'),
     path('collections/', views.collection_list, name='collection_list'),
     path('product/<int:product_id>/', views.product_detail, name='product_detail'),
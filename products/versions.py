@@ -0,0 +1,102 @@
+# products/versions.py
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import CacheVersion
+
+
+def current(key):
+    version = CacheVersion.objects.filter(key=key).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump(key):
+    """Increment the version of `key` and return the new value."""
+    if not CacheVersion.objects.filter(key=key).update(version=F('version') + 1):
+        CacheVersion.objects.get_or_create(key=key)
+        CacheVersion.objects.filter(key=key).update(version=F('version') + 1)
+    return current(key)
+
+
+def check_interval():
+    return getattr(settings, 'CACHE_VERSION_CHECK_INTERVAL', 1.0)
+
+
+class VersionStamp:
+    """
+    A worker's view of the CacheVersion row `key`, re-read at most once per
+    CACHE_VERSION_CHECK_INTERVAL seconds. Handy as a cache key prefix.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._version is None or now - self._checked_at >= check_interval():
+                self._version = current(self.key)
+                self._checked_at = now
+            return self._version
+
+    def bump(self):
+        version = bump(self.key)
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
+        return version
+
+
+class VersionedValue:
+    """
+    A process-wide value rebuilt by `loader` whenever the CacheVersion row
+    `key` moves. The row is read at most once per CACHE_VERSION_CHECK_INTERVAL
+    seconds, so a busy worker pays one tiny query per interval rather than
+    one per request, and a bump from any worker reaches all of them.
+    """
+
+    def __init__(self, key, loader):
+        self.key = key
+        self.loader = loader
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._value is None or now - self._checked_at >= check_interval():
+                version = current(self.key)
+                self._checked_at = now
+                if self._value is None or version != self._version:
+                    self._value = self.loader()
+                    self._version = version
+            return self._value
+
+    def apply_local_change(self, change):
+        """Patch our copy in place with `change(value)` and tell the other workers."""
+        with self._lock:
+            if self._value is not None:
+                change(self._value)
+            version = bump(self.key)
+            # Only trust our copy if nobody else bumped in between
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def invalidate(self):
+        bump(self.key)
+        with self._lock:
+            self.reset()
@@ -1,15 +1,28 @@
 # products/views.py
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Prefetch
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from .models import Product, Category, Collection
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, QueryDict
+from django.views.decorators.http import require_safe
+from .models import Category, Collection, Product
+from .assets import IMMUTABLE, find_by_hashed_name
+from .cards import render_cards, stats as card_stats
+from .facets import bits_from_ids, facet_groups, filter_queryset, get_index, parse_selection
+from .navigation import get_categories, get_collections
+from .page_cache import cache_anonymous_page
+from .pagination import SORT_CHOICES, paginate, resolve_sort
+from .recommendations import recommended_for
+from .search import search_products
 # Remove this line: from .models import Review
 from orders.models import Review  # Import Review from orders app
 
+@cache_anonymous_page
 def home(request):
     featured_products = Product.objects.filter(is_featured=True)[:4]
-    categories = Category.objects.all()[:3]
+    categories = get_categories()[:3]
     
     context = {
         'featured_products': featured_products,
@@ -19,108 +32,171 @@ def home(request):
     }
     return render(request, 'home.html', context)
 
-def product_list(request):
-    products = Product.objects.all()
-    
-    # Filter by search query
-    query = request.GET.get('q')
+def _listing(request, products, with_facets=True, **fixed_filters):
+    """
+    Apply the search and facet filters from the query string and return one
+    keyset page plus the context shared by every listing view.
+    """
+    base = None
+    # Filter by search query, best matches first
+    query = request.GET.get('q', '')
     if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query)
-        )
+        products = search_products(products, query)
+        base = bits_from_ids(products.order_by().values_list('pk', flat=True))
     
-    # Filter by category
-    category_id = request.GET.get('category')
-    if category_id:
-        products = products.filter(category_id=category_id)
+    # Multi-select facets; category/collection pages pin their own value
+    selection = parse_selection(request.GET, **fixed_filters)
+    products = filter_queryset(products, selection)
     
-    # Filter by collection
-    collection_id = request.GET.get('collection')
-    if collection_id:
-        products = products.filter(collection_id=collection_id)
+    sort = resolve_sort(request.GET.get('sort'), searching=bool(query))
+    page = paginate(products, sort, request.GET.get('cursor'))
     
-    categories = Category.objects.all()
-    collections = Collection.objects.filter(is_active=True)
+    # Query string the "load more" endpoint needs to continue this listing
+    params = QueryDict(mutable=True)
+    if query:
+        params['q'] = query
+    for facet, values in selection.items():
+        params.setlist(facet, values)
+    params['sort'] = sort
     
+    sort_choices = SORT_CHOICES + ([('relevance', 'Relevance')] if query else [])
     context = {
-        'products': products,
-        'categories': categories,
-        'collections': collections,
-        'search_query': query or '',
-        'selected_category': category_id or '',
-        'selected_collection': collection_id or '',
+        'products': page.items,
+        'page': page,
+        'sort': sort,
+        'sort_choices': sort_choices,
+        'listing_query': params.urlencode(),
+        'search_query': query,
     }
+    if with_facets:
+        index = get_index()
+        context['facet_groups'] = facet_groups(
+            index.counts(selection, base), selection,
+            get_categories(), get_collections(),
+        )
+        context['result_count'] = index.matching(selection, base).bit_count()
+    return page, context
+
+@cache_anonymous_page
+def product_list(request):
+    page, context = _listing(request, Product.objects.all())
     return render(request, 'products/product_list.html', context)
 
+def product_list_more(request):
+    """JSON "load more" endpoint: the next page of cards after `cursor`."""
+    page, context = _listing(request, Product.objects.all(), with_facets=False)
+    html = '\n'.join(render_cards(page.items))
+    return JsonResponse({
+        'html': html,
+        'count': len(page),
+        'has_next': page.has_next,
+        'next_cursor': page.next_cursor,
+    })
+
+@staff_member_required
+def card_cache_stats(request):
+    """Hit/miss counters of the product card fragment cache."""
+    return JsonResponse(card_stats())
+
+@cache_anonymous_page
 def product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
-    
+    reviews = Prefetch('review_set', queryset=Review.objects.select_related('user'), to_attr='reviews')
+    product = get_object_or_404(
+        Product.objects.select_related('category', 'collection').prefetch_related(reviews), id=product_id,
+    )
+    related_products = list(recommended_for(product))
+    if not related_products:
+        # No order history yet, fall back to the same category
+        related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
+
     context = {
         'product': product,
         'related_products': related_products,
     }
     return render(request, 'products/product_detail.html', context)
 
+@cache_anonymous_page
 def category_list(request):
-    categories = Category.objects.all()
-    return render(request, 'products/category_list.html', {'categories': categories})
+    return render(request, 'products/category_list.html', {'categories': get_categories()})
 
+@cache_anonymous_page
 def collection_list(request):
-    collections = Collection.objects.filter(is_active=True)
-    return render(request, 'products/collection_list.html', {'collections': collections})
+    return render(request, 'products/collection_list.html', {'collections': get_collections()})
 
+@cache_anonymous_page
 def search_by_collection(request, collection_id):
-    collection = get_object_or_404(Collection, id=collection_id)
-    products = Product.objects.filter(collection=collection)
-    
-    context = {
-        'products': products,
-        'collection': collection,
-        'collections': Collection.objects.filter(is_active=True),
-        'categories': Category.objects.all(),
-        'selected_collection': str(collection_id),
-    }
+    # Active collections come from the navigation cache, inactive ones from the DB
+    collection = next((c for c in get_collections() if c.id == collection_id), None)
+    if collection is None:
+        collection = get_object_or_404(Collection, id=collection_id)
+    page, context = _listing(request, Product.objects.all(), collection=collection_id)
+    context['collection'] = collection
     return render(request, 'products/product_list.html', context)
 
+@cache_anonymous_page
 def search_by_category(request, category_id):
-    category = get_object_or_404(Category, id=category_id)
-    products = Product.objects.filter(category=category)
-    
-    context = {
-        'products': products,
-        'category': category,
-        'collections': Collection.objects.filter(is_active=True),
-        'categories': Category.objects.all(),
-        'selected_category': str(category_id),
-    }
+    # A category newer than this process's navigation cache comes from the DB
+    category = next((c for c in get_categories() if c.id == category_id), None)
+    if category is None:
+        category = get_object_or_404(Category, id=category_id)
+    page, context = _listing(request, Product.objects.all(), category=category_id)
+    context['category'] = category
     return render(request, 'products/product_list.html', context)
 
 @login_required
 def add_review(request, product_id):
     if request.method == 'POST':
         product = get_object_or_404(Product, id=product_id)
-        rating = request.POST.get('rating')
+        try:
+            rating = int(request.POST.get('rating'))
+        except (TypeError, ValueError):
+            rating = None
         comment = request.POST.get('comment')
         
-        # Check if user already reviewed this product
-        existing_review = Review.objects.filter(user=request.user, product=product).first()
+        if rating not in dict(Review.RATING_CHOICES):
+            messages.error(request, 'Please choose a rating between 1 and 5.')
+            return redirect('products:product_detail', product_id=product_id)
         
-        if existing_review:
-            existing_review.rating = rating
-            existing_review.comment = comment
-            existing_review.save()
-            messages.success(request, 'Review updated successfully!')
-        else:
-            Review.objects.create(
-                user=request.user,
-                product=product,
-                rating=rating,
-                comment=comment
-            )
-            messages.success(request, 'Review added successfully!')
+        # Review row and product rating aggregates change together
+        with transaction.atomic():
+            # Check if user already reviewed this product
+            existing_review = Review.objects.select_for_update().filter(user=request.user, product=product).first()
+            
+            if existing_review:
+                existing_review.rating = rating
+                existing_review.comment = comment
+                existing_review.save()
+                messages.success(request, 'Review updated successfully!')
+            else:
+                Review.objects.create(
+                    user=request.user,
+                    product=product,
+                    rating=rating,
+                    comment=comment
+                )
+                messages.success(request, 'Review added successfully!')
         
         return redirect('products:product_detail', product_id=product_id)
     
-    return redirect('products:product_detail', product_id=product_id)
\ No newline at end of file
+    return redirect('products:product_detail', product_id=product_id)
+
+@require_safe
+def serve_asset(request, path):
+    """A hashed CSS/JS bundle, precompressed, cacheable forever."""
+    bundle, current = find_by_hashed_name(path)
+    if bundle is None:
+        raise Http404('Unknown asset')
+    etag = f'"{bundle.digest}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        body, encoding = bundle.encoded(request.headers.get('Accept-Encoding', ''))
+        response = HttpResponse(body, content_type=bundle.content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    # A page cached before a deploy may still ask for the previous hash:
+    # give it today's bundle, but don't let it be cached under the old URL
+    response['Cache-Control'] = IMMUTABLE if current else 'no-cache'
+    response['Vary'] = 'Accept-Encoding'
+    return response
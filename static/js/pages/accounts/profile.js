@@ -0,0 +1,59 @@
+// Show/hide profile sections
+function showSection(sectionId) {
+    // Hide all sections
+    document.querySelectorAll('.profile-section').forEach(section => {
+        section.classList.remove('active');
+    });
+
+    // Show selected section
+    document.getElementById(sectionId).classList.add('active');
+
+    // Update sidebar active state
+    document.querySelectorAll('.sidebar-item').forEach(item => {
+        item.classList.remove('active');
+    });
+    event.currentTarget.classList.add('active');
+}
+
+// Header scroll effect
+window.addEventListener('scroll', function() {
+    const header = document.getElementById('header');
+    if (window.scrollY > 50) {
+        header.classList.add('scrolled');
+    } else {
+        header.classList.remove('scrolled');
+    }
+});
+
+// Mobile menu functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileMenuButton = document.querySelector('.mobile-menu-button');
+    const nav = document.querySelector('nav');
+
+    mobileMenuButton.addEventListener('click', function() {
+        nav.style.display = nav.style.display === 'flex' ? 'none' : 'flex';
+        if (nav.style.display === 'flex') {
+            nav.style.flexDirection = 'column';
+            nav.style.position = 'absolute';
+            nav.style.top = '100%';
+            nav.style.left = '0';
+            nav.style.right = '0';
+            nav.style.background = 'var(--card)';
+            nav.style.padding = '1rem';
+            nav.style.boxShadow = '0 10px 30px rgba(0, 0, 0, 0.1)';
+            nav.style.borderRadius = '1rem';
+            nav.style.margin = '0 1rem';
+            nav.style.gap = '1rem';
+        }
+    });
+
+    // Auto-hide messages after 5 seconds
+    setTimeout(function() {
+        const messages = document.querySelector('.messages');
+        if (messages) {
+            messages.style.opacity = '0';
+            messages.style.transition = 'opacity 0.5s ease';
+            setTimeout(() => messages.remove(), 500);
+        }
+    }, 5000);
+});
@@ -0,0 +1,56 @@
+// Mobile menu functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileMenuButton = document.querySelector('.mobile-menu-button');
+    const nav = document.querySelector('nav');
+
+    mobileMenuButton.addEventListener('click', function() {
+        nav.style.display = nav.style.display === 'flex' ? 'none' : 'flex';
+        if (nav.style.display === 'flex') {
+            nav.style.flexDirection = 'column';
+            nav.style.position = 'absolute';
+            nav.style.top = '100%';
+            nav.style.left = '0';
+            nav.style.right = '0';
+            nav.style.background = 'var(--card)';
+            nav.style.padding = '1rem';
+            nav.style.boxShadow = '0 10px 30px rgba(0, 0, 0, 0.1)';
+            nav.style.borderRadius = '1rem';
+            nav.style.margin = '0 1rem';
+            nav.style.gap = '1rem';
+        }
+    });
+
+    // Password confirmation validation
+    const password1 = document.querySelector('input[name="password1"]');
+    const password2 = document.querySelector('input[name="password2"]');
+
+    function validatePassword() {
+        if (password1.value !== password2.value && password2.value !== '') {
+            password2.style.borderColor = 'var(--destructive)';
+            password2.style.boxShadow = '0 0 0 3px rgba(212, 24, 61, 0.1)';
+        } else {
+            password2.style.borderColor = 'var(--border)';
+            password2.style.boxShadow = 'none';
+        }
+    }
+
+    if (password1 && password2) {
+        password1.addEventListener('input', validatePassword);
+        password2.addEventListener('input', validatePassword);
+    }
+
+    // Real-time email validation
+    const emailInput = document.querySelector('input[name="email"]');
+    if (emailInput) {
+        emailInput.addEventListener('blur', function() {
+            const email = this.value;
+            if (email && !email.includes('@')) {
+                this.style.borderColor = 'var(--destructive)';
+                this.style.boxShadow = '0 0 0 3px rgba(212, 24, 61, 0.1)';
+            } else {
+                this.style.borderColor = 'var(--border)';
+                this.style.boxShadow = 'none';
+            }
+        });
+    }
+});
@@ -0,0 +1,169 @@
+// Remove from wishlist
+function removeFromWishlist(productId) {
+    if (confirm('Are you sure you want to remove this item from your wishlist?')) {
+        fetch(`/accounts/remove-from-wishlist/${productId}/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCookie('csrftoken'),
+                'Content-Type': 'application/json',
+            },
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Remove item from DOM
+                document.getElementById(`wishlist-item-${productId}`).remove();
+
+                // Show success message
+                showNotification(data.message, 'success');
+
+                // Update wishlist count in header
+                updateWishlistCount();
+
+                // If wishlist is empty, reload to show empty state
+                const remainingItems = document.querySelectorAll('.wishlist-item').length;
+                if (remainingItems === 0) {
+                    location.reload();
+                }
+            } else {
+                showNotification(data.message, 'error');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showNotification('Error removing item from wishlist', 'error');
+        });
+    }
+}
+
+// Add to cart from wishlist
+function addToCartFromWishlist(productId) {
+    fetch(`/orders/add-to-cart/${productId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({quantity: 1})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('Product added to cart!', 'success');
+            // Update cart badge
+            if (document.querySelector('.cart-badge')) {
+                document.querySelector('.cart-badge').textContent = data.cart_count;
+            }
+        } else {
+            showNotification('Error: ' + data.message, 'error');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showNotification('Error adding product to cart', 'error');
+    });
+}
+
+// Clear entire wishlist
+function clearWishlist() {
+    if (confirm('Are you sure you want to clear your entire wishlist?')) {
+        // This would require a new view - for now, we'll remove items one by one
+        const wishlistItems = document.querySelectorAll('.wishlist-item');
+        if (wishlistItems.length === 0) return;
+
+        showNotification('Clearing wishlist...', 'info');
+
+        // Remove all items (in a real app, you'd have a clear-wishlist endpoint)
+        wishlistItems.forEach(item => {
+            const productId = item.id.split('-')[2];
+            removeFromWishlist(productId);
+        });
+    }
+}
+
+// Update wishlist count in header
+function updateWishlistCount() {
+    // This would typically come from an API response
+    // For now, we'll count the remaining items
+    const remainingItems = document.querySelectorAll('.wishlist-item').length;
+    const wishlistBadge = document.querySelector('.header-actions .fa-heart').parentElement.querySelector('.cart-badge');
+
+    if (wishlistBadge) {
+        if (remainingItems > 0) {
+            wishlistBadge.textContent = remainingItems;
+        } else {
+            wishlistBadge.remove();
+        }
+    }
+}
+
+// Utility functions
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+function showNotification(message, type = 'info') {
+    // Create notification element
+    const notification = document.createElement('div');
+    notification.style.cssText = `
+        position: fixed;
+        top: 100px;
+        right: 20px;
+        padding: 1rem 1.5rem;
+        border-radius: 0.5rem;
+        color: white;
+        font-weight: 500;
+        z-index: 10000;
+        max-width: 300px;
+        box-shadow: 0 10px 25px rgba(0,0,0,0.2);
+        transform: translateX(400px);
+        transition: transform 0.3s ease;
+    `;
+
+    if (type === 'success') {
+        notification.style.background = 'var(--primary)';
+    } else if (type === 'error') {
+        notification.style.background = 'var(--destructive)';
+    } else {
+        notification.style.background = 'var(--muted-foreground)';
+    }
+
+    notification.textContent = message;
+    document.body.appendChild(notification);
+
+    // Animate in
+    setTimeout(() => {
+        notification.style.transform = 'translateX(0)';
+    }, 100);
+
+    // Remove after 3 seconds
+    setTimeout(() => {
+        notification.style.transform = 'translateX(400px)';
+        setTimeout(() => {
+            if (document.body.contains(notification)) {
+                document.body.removeChild(notification);
+            }
+        }, 300);
+    }, 3000);
+}
+
+// Header scroll effect
+window.addEventListener('scroll', function() {
+    const header = document.getElementById('header');
+    if (window.scrollY > 50) {
+        header.classList.add('scrolled');
+    } else {
+        header.classList.remove('scrolled');
+    }
+});
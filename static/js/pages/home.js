@@ -0,0 +1,330 @@
+// Mobile Menu Functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileMenuButton = document.querySelector('.mobile-menu-button');
+    const mobileMenu = document.createElement('div');
+    mobileMenu.className = 'mobile-menu';
+
+    // Create mobile menu content
+    mobileMenu.innerHTML = document.getElementById('mobile-menu-template').innerHTML;
+
+    // Add mobile menu to body
+    document.body.appendChild(mobileMenu);
+
+    // Mobile menu toggle functionality
+    mobileMenuButton.addEventListener('click', function() {
+        mobileMenu.classList.add('active');
+        document.body.style.overflow = 'hidden'; // Prevent background scroll
+    });
+
+    // Close mobile menu
+    const closeButton = mobileMenu.querySelector('.mobile-menu-close');
+    closeButton.addEventListener('click', function() {
+        mobileMenu.classList.remove('active');
+        document.body.style.overflow = ''; // Restore scroll
+    });
+
+    // Close menu when clicking on links
+    const mobileNavLinks = mobileMenu.querySelectorAll('.mobile-nav-link');
+    mobileNavLinks.forEach(link => {
+        link.addEventListener('click', function() {
+            mobileMenu.classList.remove('active');
+            document.body.style.overflow = '';
+        });
+    });
+
+    // Close menu when clicking outside
+    mobileMenu.addEventListener('click', function(e) {
+        if (e.target === mobileMenu) {
+            mobileMenu.classList.remove('active');
+            document.body.style.overflow = '';
+        }
+    });
+
+    // Simple and robust slideshow functionality
+    console.log('Initializing hero section...');
+
+    // Get elements
+    const video = document.getElementById('hero-video');
+    const slideshow = document.getElementById('hero-slideshow');
+    const skipBtn = document.getElementById('skip-video');
+    const prevBtn = document.getElementById('prev-slide');
+    const nextBtn = document.getElementById('next-slide');
+    const dots = document.querySelectorAll('.dot');
+    const slides = document.querySelectorAll('.slide');
+
+    let currentSlide = 0;
+    let slideInterval;
+    let slideshowActive = false;
+
+    // Initialize slideshow (start with video)
+    initSlideshow();
+
+    // Skip video button
+    skipBtn.addEventListener('click', function() {
+        console.log('Skip video clicked');
+        startSlideshow();
+    });
+
+    // Video ended - start slideshow
+    if (video) {
+        video.addEventListener('ended', function() {
+            console.log('Video ended');
+            startSlideshow();
+        });
+
+        // If video fails to load, start slideshow after 5 seconds
+        setTimeout(() => {
+            if (!slideshowActive) {
+                console.log('Video timeout - starting slideshow');
+                startSlideshow();
+            }
+        }, 9000);
+    } else {
+        // No video found, start slideshow immediately
+        console.log('No video found, starting slideshow immediately');
+        startSlideshow();
+    }
+
+    // Navigation buttons
+    if (prevBtn) {
+        prevBtn.addEventListener('click', function() {
+            console.log('Previous button clicked');
+            navigateSlideshow(-1);
+        });
+    }
+
+    if (nextBtn) {
+        nextBtn.addEventListener('click', function() {
+            console.log('Next button clicked');
+            navigateSlideshow(1);
+        });
+    }
+
+    // Dot navigation
+    dots.forEach((dot, index) => {
+        dot.addEventListener('click', function() {
+            console.log('Dot clicked:', index);
+            goToSlide(index);
+        });
+    });
+
+    function initSlideshow() {
+        console.log('Initializing slideshow with', slides.length, 'slides');
+
+        // Show first slide
+        if (slides.length > 0) {
+            slides[0].classList.add('active');
+        }
+
+        // Activate first dot
+        if (dots.length > 0) {
+            dots[0].classList.add('active');
+        }
+    }
+
+    function startSlideshow() {
+        if (slideshowActive) return;
+
+        console.log('Starting slideshow');
+        slideshowActive = true;
+
+        // Hide video and show slideshow
+        if (video) {
+            video.style.display = 'none';
+        }
+        if (slideshow) {
+            slideshow.classList.add('active');
+        }
+
+        // Hide skip button
+        skipBtn.style.display = 'none';
+
+        // Start automatic slides
+        startAutoSlide();
+    }
+
+    function navigateSlideshow(direction) {
+        if (!slideshowActive) {
+            startSlideshow();
+        }
+
+        const newIndex = (currentSlide + direction + slides.length) % slides.length;
+        goToSlide(newIndex);
+
+        // Restart auto slide timer
+        restartAutoSlide();
+    }
+
+    function goToSlide(index) {
+        if (index < 0 || index >= slides.length) return;
+
+        console.log('Going to slide:', index);
+
+        // Remove active class from all slides and dots
+        slides.forEach(slide => slide.classList.remove('active'));
+        dots.forEach(dot => dot.classList.remove('active'));
+
+        // Add active class to current slide and dot
+        slides[index].classList.add('active');
+        dots[index].classList.add('active');
+
+        currentSlide = index;
+    }
+
+    function startAutoSlide() {
+        stopAutoSlide();
+        slideInterval = setInterval(() => {
+            navigateSlideshow(1);
+        }, 8000); // Change every 4 seconds
+    }
+
+    function stopAutoSlide() {
+        if (slideInterval) {
+            clearInterval(slideInterval);
+            slideInterval = null;
+        }
+    }
+
+    function restartAutoSlide() {
+        stopAutoSlide();
+        startAutoSlide();
+    }
+
+    // Pause on hover
+    if (slideshow) {
+        slideshow.addEventListener('mouseenter', stopAutoSlide);
+        slideshow.addEventListener('mouseleave', startAutoSlide);
+    }
+
+    // Header scroll effect
+    window.addEventListener('scroll', function() {
+        const header = document.getElementById('header');
+        const scrolled = window.scrollY > 50;
+
+        if (scrolled) {
+            header.classList.add('scrolled');
+        } else {
+            header.classList.remove('scrolled');
+        }
+    });
+
+    // Debug function
+    window.debugSlideshow = function() {
+        console.log('Current slide:', currentSlide);
+        console.log('Slideshow active:', slideshowActive);
+        console.log('Video:', video ? 'found' : 'not found');
+        console.log('Slides:', slides.length);
+        console.log('Dots:', dots.length);
+        startSlideshow();
+    };
+});
+
+// Your existing cart and notification functions remain the same
+function addToCart(productId) {
+    fetch(`/orders/add-to-cart/${productId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({quantity: 1})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update cart badge
+            const cartBadge = document.querySelector('.cart-badge');
+            if (cartBadge) {
+                cartBadge.textContent = data.cart_count;
+            }
+
+            // Show success message
+            showNotification('Product added to cart!', 'success');
+        } else {
+            showNotification('Error adding product to cart: ' + data.message, 'error');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showNotification('Error adding product to cart', 'error');
+    });
+}
+
+function addToWishlist(productId) {
+    fetch(`/accounts/add-to-wishlist/${productId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('Added to wishlist!', 'success');
+        }
+    })
+    .catch(error => {
+        showNotification('did not add ', 'failed');
+    });
+}
+
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+function showNotification(message, type = 'info') {
+    // Create notification element
+    const notification = document.createElement('div');
+    notification.style.cssText = `
+        position: fixed;
+        top: 100px;
+        right: 20px;
+        padding: 1rem 1.5rem;
+        border-radius: 0.5rem;
+        color: white;
+        font-weight: 500;
+        z-index: 10000;
+        max-width: 300px;
+        box-shadow: 0 10px 25px rgba(0,0,0,0.2);
+        transform: translateX(400px);
+        transition: transform 0.3s ease;
+    `;
+
+    if (type === 'success') {
+        notification.style.background = 'var(--primary)';
+    } else if (type === 'error') {
+        notification.style.background = 'var(--destructive)';
+    } else {
+        notification.style.background = 'var(--muted-foreground)';
+    }
+
+    notification.textContent = message;
+    document.body.appendChild(notification);
+
+    // Animate in
+    setTimeout(() => {
+        notification.style.transform = 'translateX(0)';
+    }, 100);
+
+    // Remove after 3 seconds
+    setTimeout(() => {
+        notification.style.transform = 'translateX(400px)';
+        setTimeout(() => {
+            if (document.body.contains(notification)) {
+                document.body.removeChild(notification);
+            }
+        }, 300);
+    }, 3000);
+}
@@ -0,0 +1,229 @@
+// Products data
+const products = [
+    {
+        id: 1,
+        name: "Midnight Oud",
+        price: 129,
+        originalPrice: 159,
+        image: "https://images.unsplash.com/photo-1585386959984-a4155224a1ad?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=1974&q=80",
+        rating: 4.8,
+        isNew: true,
+    },
+    {
+        id: 2,
+        name: "Golden Amber",
+        price: 149,
+        originalPrice: null,
+        image: "https://images.unsplash.com/photo-1590736969955-71ac4460e341?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2070&q=80",
+        rating: 4.9,
+        isNew: false,
+    },
+    {
+        id: 3,
+        name: "Royal Rose",
+        price: 119,
+        originalPrice: 139,
+        image: "https://images.unsplash.com/photo-1547887535-1ed88af04c25?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2069&q=80",
+        rating: 4.7,
+        isNew: false,
+    },
+    {
+        id: 4,
+        name: "Ocean Breeze",
+        price: 99,
+        originalPrice: null,
+        image: "https://images.unsplash.com/photo-1592945403244-b3fbafd7f539?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2080&q=80",
+        rating: 4.6,
+        isNew: true,
+    },
+];
+
+// Categories data
+const categories = [
+    {
+        id: 1,
+        name: "For Him",
+        description: "Bold and sophisticated scents",
+        image: "https://images.unsplash.com/photo-1590736969955-71ac4460e341?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2070&q=80",
+        itemCount: 124,
+    },
+    {
+        id: 2,
+        name: "For Her",
+        description: "Elegant and enchanting fragrances",
+        image: "https://images.unsplash.com/photo-1592945403244-b3fbafd7f539?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2080&q=80",
+        itemCount: 156,
+    },
+    {
+        id: 3,
+        name: "Unisex",
+        description: "Versatile scents for everyone",
+        image: "https://images.unsplash.com/photo-1615634376657-5f73d4bd1e3c?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=2070&q=80",
+        itemCount: 87,
+    },
+
+];
+
+// Render products
+function renderProducts() {
+    const productsGrid = document.getElementById('products-grid');
+
+    products.forEach((product, index) => {
+        const productCard = document.createElement('div');
+        productCard.className = 'product-card';
+        productCard.style.animationDelay = `${index * 0.1}s`;
+
+        const stars = Array(5).fill(0).map((_, i) => 
+            i < Math.floor(product.rating) 
+                ? '<i class="fas fa-star star filled"></i>' 
+                : '<i class="fas fa-star star"></i>'
+        ).join('');
+
+        productCard.innerHTML = `
+            <div class="product-image">
+                <img src="${product.image}" alt="${product.name}">
+                <div class="image-overlay"></div>
+                <div class="product-badges">
+                    ${product.isNew ? '<span class="badge badge-primary">New</span>' : ''}
+                    ${product.originalPrice ? '<span class="badge badge-destructive">Sale</span>' : ''}
+                </div>
+                <button class="favorite-button">
+                    <i class="fas fa-heart"></i>
+                </button>
+                <div class="quick-add">
+                    <button class="quick-add-btn">
+                        <i class="fas fa-shopping-bag"></i>
+                        Quick Add
+                    </button>
+                </div>
+            </div>
+            <div class="product-info">
+                <div class="product-rating">
+                    ${stars}
+                    <span class="rating-text">(${product.rating})</span>
+                </div>
+                <h3 class="product-name">${product.name}</h3>
+                <div class="product-price">
+                    <span class="current-price">$${product.price}</span>
+                    ${product.originalPrice ? `<span class="original-price">$${product.originalPrice}</span>` : ''}
+                </div>
+                <button class="add-to-cart-btn">Add to Cart</button>
+            </div>
+        `;
+
+        productsGrid.appendChild(productCard);
+    });
+}
+
+// Render categories
+function renderCategories() {
+    const categoriesGrid = document.getElementById('categories-grid');
+
+    categories.forEach(category => {
+        const categoryCard = document.createElement('div');
+        categoryCard.className = 'category-card';
+
+        categoryCard.innerHTML = `
+            <div class="category-image">
+                <img src="${category.image}" alt="${category.name}">
+                <div class="category-overlay"></div>
+                <div class="category-info">
+                    <h3 class="category-name">${category.name}</h3>
+                    <p class="category-count">${category.itemCount} items</p>
+                </div>
+            </div>
+        `;
+
+        categoriesGrid.appendChild(categoryCard);
+    });
+}
+
+// Header scroll effect
+window.addEventListener('scroll', function() {
+    const header = document.getElementById('header');
+    if (window.scrollY > 50) {
+        header.classList.add('scrolled');
+    } else {
+        header.classList.remove('scrolled');
+    }
+});
+
+// Animate product cards on scroll
+function animateOnScroll() {
+    const productCards = document.querySelectorAll('.product-card');
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.classList.add('animate');
+            }
+        });
+    }, { threshold: 0.1 });
+
+    productCards.forEach(card => observer.observe(card));
+}
+
+// Add to cart functionality
+function setupCart() {
+    const cartBadge = document.querySelector('.cart-badge');
+    const addToCartButtons = document.querySelectorAll('.add-to-cart-btn, .quick-add-btn');
+    let cartCount = 3;
+
+    addToCartButtons.forEach(button => {
+        button.addEventListener('click', function() {
+            cartCount++;
+            cartBadge.textContent = cartCount;
+
+            // Animation effect
+            this.style.transform = 'scale(0.95)';
+            setTimeout(() => {
+                this.style.transform = 'scale(1)';
+            }, 150);
+        });
+    });
+}
+
+// Video loop control
+function setupVideoLoop() {
+    const video = document.querySelector('.hero-video');
+    if (!video) return;
+
+    video.addEventListener('timeupdate', function() {
+        // Check if we're in the last second of the video
+        if (video.duration - video.currentTime <= 1.0) {
+            // Jump back 2 seconds before the end for smooth transition
+            video.currentTime = Math.max(0, video.duration - 8.0);
+        }
+    });
+
+    // Ensure video starts from beginning
+    video.addEventListener('loadedmetadata', function() {
+        video.currentTime = 0;
+    });
+}
+
+// Navigation animation
+function setupNavigation() {
+    const navLinks = document.querySelectorAll('.nav-link');
+
+    navLinks.forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+
+            // Remove active class from all links
+            navLinks.forEach(l => l.classList.remove('active'));
+
+            // Add active class to clicked link
+            this.classList.add('active');
+        });
+    });
+}
+
+// Initialize everything when DOM is loaded
+document.addEventListener('DOMContentLoaded', function() {
+    setupVideoLoop();
+    setupNavigation();
+    renderProducts();
+    renderCategories();
+    animateOnScroll();
+    setupCart();
+});
@@ -0,0 +1,15 @@
+// Header scroll effect - Exact copy from order_history.html
+window.addEventListener('scroll', function() {
+    const header = document.getElementById('header');
+    if (window.scrollY > 50) {
+        header.classList.add('scrolled');
+    } else {
+        header.classList.remove('scrolled');
+    }
+});
+
+// Add any additional JavaScript for order details here
+document.addEventListener('DOMContentLoaded', function() {
+    // You can add order-specific JavaScript here
+    console.log('Order detail page loaded');
+});
@@ -0,0 +1,170 @@
+function increaseQuantity() {
+            const input = document.getElementById('quantity');
+            const max = parseInt(input.getAttribute('max'));
+            if (parseInt(input.value) < max) {
+                input.value = parseInt(input.value) + 1;
+            }
+        }
+
+        function decreaseQuantity() {
+            const input = document.getElementById('quantity');
+            if (parseInt(input.value) > 1) {
+                input.value = parseInt(input.value) - 1;
+            }
+        }
+
+      function addToCart(productId) {
+    const quantity = document.getElementById('quantity').value;
+
+    fetch(`/orders/add-to-cart/${productId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({quantity: quantity})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update cart badge
+            document.querySelector('.cart-badge').textContent = data.cart_count;
+
+            // Show custom success message
+            showCustomAlert('🛒 Product added to cart!', 'success');
+
+            // Quick refresh after delay
+            setTimeout(() => {
+                location.reload();
+            }, 800);
+        } else {
+            showCustomAlert('❌ ' + data.message, 'error');
+        }
+    })
+    .catch(error => {
+        showCustomAlert('❌ Network error. Please try again.', 'error');
+    });
+}
+
+// Custom alert function (reuse from wishlist or create specific one)
+function showCustomAlert(message, type = 'success') {
+    // Remove any existing alerts
+    const existingAlert = document.querySelector('.custom-alert');
+    if (existingAlert) {
+        existingAlert.remove();
+    }
+
+    // Create alert element
+    const alertDiv = document.createElement('div');
+    alertDiv.className = 'custom-alert';
+    alertDiv.innerHTML = `
+        <div class="alert-content">
+            <span class="alert-icon">${type === 'success' ? '✅' : '❌'}</span>
+            <span class="alert-message">${message}</span>
+            <button class="alert-close" onclick="this.parentElement.parentElement.remove()">×</button>
+        </div>
+    `;
+
+    // Add styles if not already added
+    if (!document.querySelector('#alert-styles')) {
+        const style = document.createElement('style');
+        style.id = 'alert-styles';
+        style.textContent = `
+            .custom-alert {
+                position: fixed;
+                top: 20px;
+                right: 20px;
+                background: ${type === 'success' ? '#4CAF50' : '#f44336'};
+                color: white;
+                padding: 0;
+                border-radius: 8px;
+                z-index: 10000;
+                box-shadow: 0 4px 12px rgba(0,0,0,0.15);
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                animation: alertSlideIn 0.3s ease-out;
+                border-left: 4px solid ${type === 'success' ? '#45a049' : '#d32f2f'};
+            }
+            .alert-content {
+                display: flex;
+                align-items: center;
+                padding: 15px 20px;
+                gap: 12px;
+            }
+            .alert-icon {
+                font-size: 1.2em;
+            }
+            .alert-message {
+                flex: 1;
+                font-size: 14px;
+            }
+            .alert-close {
+                background: none;
+                border: none;
+                color: white;
+                font-size: 18px;
+                cursor: pointer;
+                padding: 0;
+                width: 24px;
+                height: 24px;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                border-radius: 50%;
+                transition: background-color 0.2s;
+            }
+            .alert-close:hover {
+                background: rgba(255,255,255,0.2);
+            }
+            @keyframes alertSlideIn {
+                from { transform: translateX(100%); opacity: 0; }
+                to { transform: translateX(0); opacity: 1; }
+            }
+            @keyframes alertSlideOut {
+                from { transform: translateX(0); opacity: 1; }
+                to { transform: translateX(100%); opacity: 0; }
+            }
+        `;
+        document.head.appendChild(style);
+    }
+
+    document.body.appendChild(alertDiv);
+
+    // Auto remove after 3 seconds
+    setTimeout(() => {
+        if (alertDiv.parentNode) {
+            alertDiv.style.animation = 'alertSlideOut 0.3s ease-in';
+            setTimeout(() => alertDiv.remove(), 300);
+        }
+    }, 3000);
+}
+
+        function addToWishlist(productId) {
+            fetch(`/accounts/add-to-wishlist/${productId}/`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'Content-Type': 'application/json',
+                },
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    alert('Product added to wishlist!');
+                }
+            });
+        }
+
+        function getCookie(name) {
+            let cookieValue = null;
+            if (document.cookie && document.cookie !== '') {
+                const cookies = document.cookie.split(';');
+                for (let i = 0; i < cookies.length; i++) {
+                    const cookie = cookies[i].trim();
+                    if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                        cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                        break;
+                    }
+                }
+            }
+            return cookieValue;
+        }
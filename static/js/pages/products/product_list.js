@@ -0,0 +1,212 @@
+// Mobile Menu Functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileMenuButton = document.querySelector('.mobile-menu-button');
+    const mobileMenu = document.createElement('div');
+    mobileMenu.className = 'mobile-menu';
+
+    // Create mobile menu content
+    mobileMenu.innerHTML = document.getElementById('mobile-menu-template').innerHTML;
+
+    // Add mobile menu to body
+    document.body.appendChild(mobileMenu);
+
+    // Mobile menu toggle functionality
+    mobileMenuButton.addEventListener('click', function() {
+        mobileMenu.classList.add('active');
+        document.body.style.overflow = 'hidden'; // Prevent background scroll
+    });
+
+    // Close mobile menu
+    const closeButton = mobileMenu.querySelector('.mobile-menu-close');
+    closeButton.addEventListener('click', function() {
+        mobileMenu.classList.remove('active');
+        document.body.style.overflow = ''; // Restore scroll
+    });
+
+    // Close menu when clicking on links
+    const mobileNavLinks = mobileMenu.querySelectorAll('.mobile-nav-link');
+    mobileNavLinks.forEach(link => {
+        link.addEventListener('click', function() {
+            mobileMenu.classList.remove('active');
+            document.body.style.overflow = '';
+        });
+    });
+
+    // Close menu when clicking outside
+    mobileMenu.addEventListener('click', function(e) {
+        if (e.target === mobileMenu) {
+            mobileMenu.classList.remove('active');
+            document.body.style.overflow = '';
+        }
+    });
+
+    // Header scroll effect
+    window.addEventListener('scroll', function() {
+        const header = document.getElementById('header');
+        if (window.scrollY > 50) {
+            header.classList.add('scrolled');
+        } else {
+            header.classList.remove('scrolled');
+        }
+    });
+
+    // Animate product cards on scroll
+    function animateOnScroll() {
+        const productCards = document.querySelectorAll('.product-card');
+        const observer = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    entry.target.classList.add('animate');
+                }
+            });
+        }, { threshold: 0.1 });
+
+        productCards.forEach(card => observer.observe(card));
+    }
+
+    // Initialize animations
+    animateOnScroll();
+});
+
+// Add to cart function
+function addToCart(productId) {
+    fetch(`/orders/add-to-cart/${productId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update cart badge
+            document.querySelector('.cart-badge').textContent = data.cart_count;
+
+            // Show success message
+            alert('Product added to cart!');
+        }
+    });
+}
+
+// Add to wishlist function
+function showCustomAlert(message, type = 'success') {
+    // Create alert element
+    const alertDiv = document.createElement('div');
+    alertDiv.textContent = message;
+    alertDiv.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        padding: 15px 20px;
+        background: ${type === 'success' ? '#4CAF50' : '#f44336'};
+        color: white;
+        border-radius: 5px;
+        z-index: 10000;
+        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+        font-family: Arial, sans-serif;
+        max-width: 300px;
+        animation: slideIn 0.3s ease-out;
+    `;
+
+    // Add to page
+    document.body.appendChild(alertDiv);
+
+    // Remove after 3 seconds
+    setTimeout(() => {
+        alertDiv.style.animation = 'slideOut 0.3s ease-in';
+        setTimeout(() => {
+            if (alertDiv.parentNode) {
+                alertDiv.parentNode.removeChild(alertDiv);
+            }
+        }, 300);
+    }, 3000);
+}
+
+// Add CSS animations
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideIn {
+        from { transform: translateX(100%); opacity: 0; }
+        to { transform: translateX(0); opacity: 1; }
+    }
+    @keyframes slideOut {
+        from { transform: translateX(0); opacity: 1; }
+        to { transform: translateX(100%); opacity: 0; }
+    }
+`;
+document.head.appendChild(style);
+
+// Updated function
+function addToWishlist(productId) {
+    fetch(`/accounts/add-to-wishlist/${productId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showCustomAlert('✅ Added to your wishlist!');
+        }
+    })
+    .catch(error => {
+        showCustomAlert('❌ Failed to add to wishlist', 'error');
+    });
+}
+
+// Sort selector keeps the current filters and starts again from page one
+function changeSort(sort) {
+    const url = new URL(window.location.href);
+    url.searchParams.set('sort', sort);
+    url.searchParams.delete('cursor');
+    window.location = url.toString();
+}
+
+// Load more: fetch the next keyset page and append its cards
+const loadMoreButton = document.getElementById('load-more');
+if (loadMoreButton) {
+    loadMoreButton.addEventListener('click', function(e) {
+        e.preventDefault();
+        if (loadMoreButton.dataset.loading) return;
+        loadMoreButton.dataset.loading = '1';
+        const url = loadMoreButton.dataset.url + '&cursor=' + encodeURIComponent(loadMoreButton.dataset.cursor);
+        fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+        .then(response => response.json())
+        .then(data => {
+            const grid = document.getElementById('products-grid');
+            grid.insertAdjacentHTML('beforeend', data.html);
+            requestAnimationFrame(() => {
+                grid.querySelectorAll('.product-card:not(.animate)').forEach(card => card.classList.add('animate'));
+            });
+            if (data.has_next) {
+                loadMoreButton.dataset.cursor = data.next_cursor;
+                delete loadMoreButton.dataset.loading;
+            } else {
+                loadMoreButton.parentNode.remove();
+            }
+        })
+        .catch(error => {
+            delete loadMoreButton.dataset.loading;
+            showCustomAlert('❌ Failed to load more products', 'error');
+        });
+    });
+}
+
+// Get CSRF token
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}